@@ -4,7 +4,10 @@ import SearchFilter from './Modals/SearchFilter';
 import { useNavigate } from 'react-router-dom';
 
 // Import API functions
-import { barangAPI, kelasAPI, absenAPI } from '../../services/api';
+import { peminjamanAPI } from '../../services/api';
+
+// Batas per_page maksimum /peminjaman/available-items
+const CATALOG_PER_PAGE = 500;
 
 const MahasiswaDashboard = () => {
     const navigate = useNavigate();
@@ -21,26 +24,65 @@ const MahasiswaDashboard = () => {
         fetchAllItems();
     }, []);
 
+    // Gabungkan satu halaman absen katalog ke hasil sebelumnya. Grup
+    // semester/jurusan yang terpotong batas halaman muncul lagi di halaman
+    // berikutnya, jadi lembar dan jumlahnya digabung per grup.
+    const mergeAbsenPage = (absen, next) => {
+        next.semesters.forEach(nextSemester => {
+            const semester = absen.semesters.find(s => s.semester === nextSemester.semester);
+            if (!semester) {
+                absen.semesters.push(nextSemester);
+                return;
+            }
+            semester.total += nextSemester.total;
+            semester.tersedia += nextSemester.tersedia;
+            semester.available = semester.available || nextSemester.available;
+            nextSemester.jurusan.forEach(nextGroup => {
+                const group = semester.jurusan.find(g => g.jurusan === nextGroup.jurusan);
+                if (!group) {
+                    semester.jurusan.push(nextGroup);
+                    return;
+                }
+                group.total += nextGroup.total;
+                group.tersedia += nextGroup.tersedia;
+                group.available = group.available || nextGroup.available;
+                group.sheets.push(...nextGroup.sheets);
+            });
+        });
+    };
+
+    // Katalog lengkap: halaman berikutnya hanya diambil untuk section
+    // (barang/kelas/absen) yang lebih dari CATALOG_PER_PAGE
+    const fetchCatalog = async () => {
+        const { data: catalog } = await peminjamanAPI.getAvailableItems({ per_page: CATALOG_PER_PAGE });
+        const sections = ['barang', 'kelas', 'absen'];
+        const lastPage = Math.max(...sections.map(section => catalog[section].total_pages));
+
+        for (let page = 2; page <= lastPage; page++) {
+            const params = { per_page: CATALOG_PER_PAGE };
+            sections.forEach(section => {
+                params[`${section}_page`] = Math.min(page, Math.max(catalog[section].total_pages, 1));
+            });
+            const { data: next } = await peminjamanAPI.getAvailableItems(params);
+            if (page <= catalog.barang.total_pages) catalog.barang.items.push(...next.barang.items);
+            if (page <= catalog.kelas.total_pages) catalog.kelas.items.push(...next.kelas.items);
+            if (page <= catalog.absen.total_pages) mergeAbsenPage(catalog.absen, next.absen);
+        }
+        return catalog;
+    };
+
     const fetchAllItems = async () => {
         try {
             setLoading(true);
             setError('');
 
-            // Fetch data dari semua API endpoints
-            const [barangResponse, kelasResponse, absenResponse] = await Promise.all([
-                barangAPI.getAll(), // Get available barang
-                kelasAPI.getAll(),  // Get available kelas
-                absenAPI.getAll(1, 100)      // Get all absen
-            ]);
-
-            console.log('🔄 API Responses:', {
-                barang: barangResponse.data,
-                kelas: kelasResponse.data,
-                absen: absenResponse.data
-            });
+            // Katalog: barang tersedia, kelas, dan absen yang sudah dikelompokkan server
+            const catalog = await fetchCatalog();
+
+            console.log('🔄 API Response:', catalog);
 
             // Transform barang data
-            const barangItems = (barangResponse.data.items || barangResponse.data).map(barang => ({
+            const barangItems = catalog.barang.items.map(barang => ({
                 id: barang.id,
                 type: 'inventaris',
                 name: barang.nama,
@@ -54,7 +96,7 @@ const MahasiswaDashboard = () => {
             }));
 
             // Transform kelas data
-            const kelasItems = (kelasResponse.data.data || kelasResponse.data).map(kelas => ({
+            const kelasItems = catalog.kelas.items.map(kelas => ({
                 id: kelas.id,
                 type: 'ruangan',
                 name: `${kelas.nama_kelas} - ${kelas.gedung}`,
@@ -69,8 +111,8 @@ const MahasiswaDashboard = () => {
                 isTimeBasedBooking: true // Mark as time-based booking
             }));
 
-            // Transform absen data - Group by semester & jurusan
-            const absenGrouped = groupAbsenBySemester(absenResponse.data);
+            // Transform absen groups (semester -> jurusan) dari server
+            const absenGrouped = mapAbsenGroups(catalog.absen);
 
             // Combine all items
             const allItems = [
@@ -90,45 +132,26 @@ const MahasiswaDashboard = () => {
         }
     };
 
-    // Group absen by semester and jurusan
-    const groupAbsenBySemester = (absenData) => {
-        const grouped = absenData.reduce((acc, absen) => {
-            const key = `${absen.jurusan}-semester-${absen.semester}`;
-            
-            if (!acc[key]) {
-                acc[key] = {
-                    id: `absen-${absen.jurusan.toLowerCase()}-${absen.semester}`,
-                    type: 'absen-group',
-                    name: `Absen ${absen.jurusan} Semester ${absen.semester}`,
-                    jurusan: absen.jurusan,
-                    semester: absen.semester,
-                    courses: [],
-                    currentStock: 0,
-                    maxStock: 0
-                };
-            }
-
-            acc[key].courses.push({
-                id: absen.id,
-                name: absen.nama_matakuliah,
-                kelas: absen.kelas,
-                dosen: absen.dosen,
-                status: absen.status
-            });
-
-            acc[key].maxStock++;
-
-            return acc;
-        }, {});
-
-        // Convert to array and calculate availability
-        return Object.values(grouped).map(group => {
-            const tersediaCount = group.courses.filter(c => c.status === 'tersedia').length;
-            return {
-                ...group,
-                currentStock: group.maxStock - tersediaCount
-            };
-        });
+    // Ratakan grup absen katalog (bentuknya sama dengan /absen/grouped) menjadi item per jurusan & semester
+    const mapAbsenGroups = (groupedData) => {
+        return groupedData.semesters.flatMap(semesterGroup =>
+            semesterGroup.jurusan.map(group => ({
+                id: `absen-${(group.jurusan || '-').toLowerCase()}-${semesterGroup.semester}`,
+                type: 'absen-group',
+                name: `Absen ${group.jurusan || '-'} Semester ${semesterGroup.semester ?? '-'}`,
+                jurusan: group.jurusan,
+                semester: semesterGroup.semester,
+                courses: group.sheets.map(sheet => ({
+                    id: sheet.id,
+                    name: sheet.nama_matakuliah || '-',
+                    kelas: sheet.kelas,
+                    dosen: sheet.dosen,
+                    status: sheet.status
+                })),
+                maxStock: group.total,
+                currentStock: group.total - group.tersedia
+            }))
+        );
     };
 
     // Filter items berdasarkan search dan filter
@@ -78,7 +78,7 @@ export const peminjamanAPI = {
     },
 
     // Available items
-    getAvailableItems: () => api.get('/peminjaman/available-items'),
+    getAvailableItems: (params = {}) => api.get('/peminjaman/available-items', { params }),
 };
 
 // FIXED - Add proper parameter handling
@@ -113,6 +113,7 @@ export const absenAPI = {
         if (jurusan) params.jurusan = jurusan;
         return api.get('/absen/', { params });
     },
+    getGrouped: () => api.get('/absen/grouped'),
     getDetail: (id) => api.get(`/absen/${id}`),
     searchByMatakuliah: (params = {}) => api.get('/absen/search/matakuliah', { params }),
     getByDosen: (name, params = {}) => api.get(`/absen/dosen/${name}`, { params }),
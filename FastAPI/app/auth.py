@@ -1,12 +1,22 @@
+from collections import Counter, OrderedDict
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from dataclasses import dataclass
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import List, Optional
+import asyncio
+import multiprocessing
+import os
+import threading
+import time
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from fastapi import HTTPException, status, Depends
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
-from sqlalchemy.orm import Session
-from app.database import get_db
-from app.models import User
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
+from app.database import SessionLocal
+from app.models import User, RoleEnum
 import re
 
 # Security Configuration
@@ -14,34 +24,144 @@ SECRET_KEY = "your-secret-key-here-make-it-strong-in-production"  # Ganti dengan
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
-# Password hashing
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# Cache principal (user yang sudah terautentikasi) supaya tidak query users tiap request
+PRINCIPAL_CACHE_TTL_SECONDS = int(os.getenv("PRINCIPAL_CACHE_TTL_SECONDS", "60"))
+PRINCIPAL_CACHE_SIZE = int(os.getenv("PRINCIPAL_CACHE_SIZE", "1024"))
+# Mode claims-only: percaya role di token sampai expired, tanpa query sama sekali
+AUTH_TRUST_TOKEN_CLAIMS = os.getenv("AUTH_TRUST_TOKEN_CLAIMS", "false").lower() in ("1", "true", "yes")
+
+# Password hashing - cost bcrypt bisa dituning lewat env, hash lama di-rehash saat login
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+HASH_WORKERS = int(os.getenv("HASH_WORKERS", str(os.cpu_count() or 2)))
+# Process pool terpisah untuk import massal, supaya tidak mengantri di depan login
+IMPORT_HASH_PROCESSES = int(os.getenv("IMPORT_HASH_PROCESSES", str(os.cpu_count() or 2)))
+pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto", bcrypt__rounds=BCRYPT_ROUNDS)
+
+class HashingPool:
+    """
+    Thread pool khusus bcrypt dengan jumlah worker terbatas, supaya lonjakan
+    login tidak menghabiskan threadpool request. Mencatat metrik antrian.
+    """
+    
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="bcrypt")
+        self._lock = threading.Lock()
+        self.in_flight = 0
+        self.completed = 0
+        self.total_seconds = 0.0
+    
+    def _timed(self, fn, *args):
+        start = time.perf_counter()
+        try:
+            return fn(*args)
+        finally:
+            elapsed = time.perf_counter() - start
+            with self._lock:
+                self.in_flight -= 1
+                self.completed += 1
+                self.total_seconds += elapsed
+    
+    def submit(self, fn, *args):
+        """Jalankan fn di pool hashing, return Future"""
+        with self._lock:
+            self.in_flight += 1
+        return self._executor.submit(self._timed, fn, *args)
+    
+    async def run(self, fn, *args):
+        """Versi async dari submit untuk route async def"""
+        return await asyncio.wrap_future(self.submit(fn, *args))
+    
+    def stats(self) -> dict:
+        """Metrik pool: queue_depth = job yang menunggu worker kosong"""
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "in_flight": self.in_flight,
+                "queue_depth": max(0, self.in_flight - self.max_workers),
+                "completed": self.completed,
+                "avg_hash_ms": round(self.total_seconds / self.completed * 1000, 2) if self.completed else None,
+                "bcrypt_rounds": BCRYPT_ROUNDS
+            }
+
+hashing_pool = HashingPool(HASH_WORKERS)
 
 # OAuth2 scheme
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
 
 def verify_password(plain_password: str, hashed_password: str) -> bool:
     """Verify a password against its hash"""
-    return pwd_context.verify(plain_password, hashed_password)
+    return hashing_pool.submit(pwd_context.verify, plain_password, hashed_password).result()
 
 def get_password_hash(password: str) -> str:
     """Hash a password"""
-    return pwd_context.hash(password)
+    return hashing_pool.submit(pwd_context.hash, password).result()
+
+async def get_password_hash_async(password: str) -> str:
+    """Hash a password tanpa memblok event loop"""
+    return await hashing_pool.run(pwd_context.hash, password)
+
+async def verify_and_update_password(plain_password: str, hashed_password: str) -> tuple:
+    """
+    Verify password dan buat hash baru jika cost/scheme hash lama sudah tidak sesuai
+    
+    Returns:
+        tuple: (valid, new_hash) - new_hash None jika tidak perlu rehash
+    """
+    return await hashing_pool.run(pwd_context.verify_and_update, plain_password, hashed_password)
+
+def hash_password_chunk(passwords: List[str]) -> List[str]:
+    """Hash sekumpulan password, dijalankan di worker import_hashing_pool"""
+    return [pwd_context.hash(password) for password in passwords]
+
+# Dibuat saat import pertama (bukan saat modul di-import), ditutup di lifespan app.
+# Worker di-spawn, bukan fork: proses server sudah punya thread (threadpool, engine)
+# yang lock-nya bisa ikut tersalin dalam keadaan terkunci.
+_import_hashing_pool: Optional[ProcessPoolExecutor] = None
+_import_hashing_pool_lock = threading.Lock()
+
+def get_import_hashing_pool() -> ProcessPoolExecutor:
+    """Process pool hashing untuk import massal, dibuat lazily"""
+    global _import_hashing_pool
+    with _import_hashing_pool_lock:
+        if _import_hashing_pool is None:
+            _import_hashing_pool = ProcessPoolExecutor(
+                max_workers=IMPORT_HASH_PROCESSES, mp_context=multiprocessing.get_context("spawn")
+            )
+        return _import_hashing_pool
+
+def shutdown_import_hashing_pool():
+    """Hentikan proses import_hashing_pool jika pernah dibuat"""
+    global _import_hashing_pool
+    with _import_hashing_pool_lock:
+        if _import_hashing_pool is not None:
+            _import_hashing_pool.shutdown()
+            _import_hashing_pool = None
+
+def hash_passwords_parallel(passwords: List[str]) -> List[str]:
+    """Hash banyak password sekaligus, dibagi rata ke semua proses import_hashing_pool"""
+    if not passwords:
+        return []
+    size = -(-len(passwords) // IMPORT_HASH_PROCESSES)
+    chunks = [passwords[i:i + size] for i in range(0, len(passwords), size)]
+    pool = get_import_hashing_pool()
+    return [hashed for chunk in pool.map(hash_password_chunk, chunks) for hashed in chunk]
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     """Create JWT access token"""
     to_encode = data.copy()
+    now = datetime.utcnow()
     if expires_delta:
-        expire = datetime.utcnow() + expires_delta
+        expire = now + expires_delta
     else:
-        expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
+        expire = now + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     
-    to_encode.update({"exp": expire})
+    to_encode.update({"exp": expire, "iat": now})
     encoded_jwt = jwt.encode(to_encode, SECRET_KEY, algorithm=ALGORITHM)
     return encoded_jwt
 
-def verify_token(token: str):
-    """Verify and decode JWT token"""
+def decode_token(token: str) -> dict:
+    """Verify and decode JWT token, return seluruh claims"""
     try:
         payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
         nim: str = payload.get("sub")
@@ -51,7 +171,7 @@ def verify_token(token: str):
                 detail="Could not validate credentials",
                 headers={"WWW-Authenticate": "Bearer"},
             )
-        return nim
+        return payload
     except JWTError:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -59,6 +179,155 @@ def verify_token(token: str):
             headers={"WWW-Authenticate": "Bearer"},
         )
 
+def verify_token(token: str):
+    """Verify and decode JWT token, return NIM (sub)"""
+    return decode_token(token)["sub"]
+
+@dataclass(frozen=True)
+class Principal:
+    """
+    Snapshot read-only dari user yang terautentikasi. Dipakai sebagai
+    current_user sehingga bisa di-cache lintas request tanpa terikat Session.
+    """
+    id: int
+    nim: str
+    name: str
+    role: RoleEnum
+    created_at: Optional[datetime] = None
+
+    @classmethod
+    def from_user(cls, user: User) -> "Principal":
+        return cls(id=user.id, nim=user.nim, name=user.name, role=user.role, created_at=user.created_at)
+
+    @classmethod
+    def from_claims(cls, payload: dict) -> Optional["Principal"]:
+        """Principal dari claims token, None jika token lama tanpa uid/role"""
+        if payload.get("uid") is None or payload.get("role") not in RoleEnum.__members__:
+            return None
+        return cls(
+            id=payload["uid"],
+            nim=payload["sub"],
+            name=payload.get("name"),
+            role=RoleEnum(payload["role"])
+        )
+
+class PrincipalCache:
+    """Cache LRU + TTL principal per (NIM, iat token)"""
+
+    def __init__(self, max_size: int = PRINCIPAL_CACHE_SIZE, ttl_seconds: float = PRINCIPAL_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, nim: str, iat) -> Optional[Principal]:
+        """Ambil principal dari cache, None jika belum ada atau sudah kadaluarsa"""
+        key = (nim, iat)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry:
+                del self._entries[key]
+            self.misses += 1
+        return None
+
+    def set(self, nim: str, iat, principal: Principal):
+        """Simpan principal, buang entry yang paling lama tidak dipakai jika penuh"""
+        with self._lock:
+            self._entries[(nim, iat)] = (principal, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end((nim, iat))
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, nim: str):
+        """Hapus semua entry untuk NIM (dipanggil setelah data user berubah)"""
+        with self._lock:
+            for key in [key for key in self._entries if key[0] == nim]:
+                del self._entries[key]
+
+    def clear(self):
+        """Hapus semua principal yang di-cache"""
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> dict:
+        """Metrik cache untuk monitoring"""
+        with self._lock:
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "claims_only": AUTH_TRUST_TOKEN_CLAIMS
+            }
+
+principal_cache = PrincipalCache()
+
+def _mark_user_changed(mapper, connection, user: User):
+    """Catat NIM (lama dan baru) user yang diubah/dihapus di session yang sedang flush"""
+    session = object_session(user)
+    if session is not None:
+        nims = session.info.setdefault("principal_cache_invalidate", set())
+        nims.add(user.nim)
+        nims.update(inspect(user).attrs.nim.history.deleted or ())
+
+def _invalidate_changed_users(session):
+    """Setelah commit, buang principal yang di-cache untuk semua user yang berubah"""
+    for nim in session.info.pop("principal_cache_invalidate", ()):
+        principal_cache.invalidate(nim)
+
+# Setiap update/delete User lewat ORM (role, nama, password, hapus akun) membuang
+# principal yang di-cache, di semua session
+event.listen(User, "after_update", _mark_user_changed)
+event.listen(User, "after_delete", _mark_user_changed)
+event.listen(Session, "after_commit", _invalidate_changed_users)
+
+# Mapping kode prodi Departemen Matematika
+PRODI_MAP = {
+    'H011': {
+        'nama': 'Matematika',
+        'jenjang': 'Sarjana',
+        'fakultas': 'MIPA',
+        'range_nomor': r'10[0-9][0-9]'  # 1000-1099 (contoh range)
+    },
+    'H081': {
+        'nama': 'Aktuaria', 
+        'jenjang': 'Sarjana',
+        'fakultas': 'MIPA',
+        'range_nomor': r'10[0-9][0-9]'  # 1000-1099
+    },
+    'H012': {
+        'nama': 'Matematika',
+        'jenjang': 'Magister', 
+        'fakultas': 'MIPA',
+        'range_nomor': r'10[0-9][0-9]'  # 1000-1099
+    },
+    'H013': {
+        'nama': 'Matematika',
+        'jenjang': 'Doktor',
+        'fakultas': 'MIPA', 
+        'range_nomor': r'10[0-9][0-9]'  # 1000-1099
+    },
+    'H071': {
+        'nama': 'Sistem Informasi',
+        'jenjang': 'Sarjana',
+        'fakultas': 'MIPA',
+        'range_nomor': r'(10[0-9][0-9]|109[0-2])'  # 1000-1092
+    }
+}
+
+# Pattern lengkap per prodi, dikompilasi sekali saat import
+NIM_PATTERNS = {
+    kode_prodi: re.compile(f'^{kode_prodi}\\d{{2}}{prodi_info["range_nomor"]}$')
+    for kode_prodi, prodi_info in PRODI_MAP.items()
+}
+
 def validate_nim_format(nim: str) -> dict:
     """
     Validate NIM format for Departemen Matematika UNHAS
@@ -78,40 +347,6 @@ def validate_nim_format(nim: str) -> dict:
         dict: {'valid': bool, 'info': dict} containing validation result and NIM info
     """
     
-    # Mapping kode prodi
-    PRODI_MAP = {
-        'H011': {
-            'nama': 'Matematika',
-            'jenjang': 'Sarjana',
-            'fakultas': 'MIPA',
-            'range_nomor': r'10[0-9][0-9]'  # 1000-1099 (contoh range)
-        },
-        'H081': {
-            'nama': 'Aktuaria', 
-            'jenjang': 'Sarjana',
-            'fakultas': 'MIPA',
-            'range_nomor': r'10[0-9][0-9]'  # 1000-1099
-        },
-        'H012': {
-            'nama': 'Matematika',
-            'jenjang': 'Magister', 
-            'fakultas': 'MIPA',
-            'range_nomor': r'10[0-9][0-9]'  # 1000-1099
-        },
-        'H013': {
-            'nama': 'Matematika',
-            'jenjang': 'Doktor',
-            'fakultas': 'MIPA', 
-            'range_nomor': r'10[0-9][0-9]'  # 1000-1099
-        },
-        'H071': {
-            'nama': 'Sistem Informasi',
-            'jenjang': 'Sarjana',
-            'fakultas': 'MIPA',
-            'range_nomor': r'(10[0-9][0-9]|109[0-2])'  # 1000-1092
-        }
-    }
-    
     # Extract kode prodi
     if len(nim) < 4:
         return {'valid': False, 'info': None, 'error': 'NIM terlalu pendek'}
@@ -127,13 +362,10 @@ def validate_nim_format(nim: str) -> dict:
     
     prodi_info = PRODI_MAP[kode_prodi]
     
-    # Construct full pattern
-    pattern = f'^{kode_prodi}\\d{{2}}{prodi_info["range_nomor"]}$'
-    
-    if not re.match(pattern, nim):
+    if not NIM_PATTERNS[kode_prodi].match(nim):
         return {
             'valid': False,
-            'info': prodi_info,
+            'info': dict(prodi_info),
             'error': f'Format NIM tidak valid untuk {prodi_info["nama"]} {prodi_info["jenjang"]}. Format: {kode_prodi}YYXXXX'
         }
     
@@ -155,23 +387,85 @@ def validate_nim_format(nim: str) -> dict:
         'error': None
     }
 
-def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
-    """Get current authenticated user"""
-    nim = verify_token(token)
-    user = db.query(User).filter(User.nim == nim).first()
-    if user is None:
+def validate_nim_bulk(nims: List[str]) -> dict:
+    """
+    Validasi banyak NIM sekaligus (misal roster mahasiswa baru).
+    
+    Returns:
+        dict: hasil per NIM beserta rekap jumlah NIM valid per prodi dan angkatan
+    """
+    results = []
+    by_prodi = {}
+    by_angkatan = Counter()
+    
+    for nim in nims:
+        nim = nim.strip()
+        result = validate_nim_format(nim)
+        results.append({'nim': nim, **result})
+        
+        if result['valid']:
+            info = result['info']
+            prodi = by_prodi.setdefault(info['kode_prodi'], {
+                'prodi': info['prodi'],
+                'jenjang': info['jenjang'],
+                'jumlah': 0
+            })
+            prodi['jumlah'] += 1
+            by_angkatan[info['angkatan']] += 1
+    
+    total_valid = sum(by_angkatan.values())
+    return {
+        'results': results,
+        'total': len(results),
+        'valid': total_valid,
+        'invalid': len(results) - total_valid,
+        'by_prodi': by_prodi,
+        'by_angkatan': dict(sorted(by_angkatan.items()))
+    }
+
+def load_principal(nim: str) -> Optional[Principal]:
+    """Query user berdasarkan NIM dengan Session sendiri, None jika tidak ada"""
+    with SessionLocal() as db:
+        user = db.query(User).filter(User.nim == nim).first()
+        return Principal.from_user(user) if user else None
+
+async def get_current_user(token: str = Depends(oauth2_scheme)) -> Principal:
+    """
+    Get current authenticated user sebagai Principal.
+    Urutan: claims token (mode claims-only) -> principal_cache -> query users.
+    
+    Dependency async tanpa Session: request yang principal-nya sudah di-cache
+    tidak lewat threadpool sama sekali, hanya cache miss yang query ke
+    database di threadpool.
+    """
+    payload = decode_token(token)
+    nim = payload["sub"]
+    
+    if AUTH_TRUST_TOKEN_CLAIMS:
+        principal = Principal.from_claims(payload)
+        if principal is not None:
+            return principal
+    
+    iat = payload.get("iat")
+    principal = principal_cache.get(nim, iat)
+    if principal is not None:
+        return principal
+    
+    principal = await run_in_threadpool(load_principal, nim)
+    if principal is None:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="User not found",
             headers={"WWW-Authenticate": "Bearer"},
         )
-    return user
+    principal_cache.set(nim, iat, principal)
+    return principal
 
-def get_current_active_user(current_user: User = Depends(get_current_user)):
+async def get_current_active_user(current_user: User = Depends(get_current_user)):
     """Get current active user (for future use if needed)"""
     return current_user
 
-def require_staff(current_user: User = Depends(get_current_user)):
+async def require_staff(current_user: User = Depends(get_current_user)):
     """Require staff role"""
     if current_user.role != "staff":
         raise HTTPException(
@@ -0,0 +1,156 @@
+import asyncio
+import os
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Awaitable, Callable, Hashable, Iterable, Optional
+import orjson
+from fastapi import Response
+from fastapi.encoders import jsonable_encoder
+from pydantic import BaseModel, TypeAdapter
+
+# Jumlah response yang disimpan (LRU) dan batas umur entry (detik).
+# TTL membatasi data basi jika ada beberapa worker, karena versi tabel per proses.
+RESPONSE_CACHE_SIZE = int(os.getenv("RESPONSE_CACHE_SIZE", "256"))
+RESPONSE_CACHE_TTL_SECONDS = int(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "300"))
+
+@lru_cache(maxsize=None)
+def _adapter(response_model) -> TypeAdapter:
+    return TypeAdapter(response_model)
+
+def render_json(content, response_model=None) -> bytes:
+    """
+    Render content menjadi body JSON dengan byte yang sama seperti JSONResponse
+    FastAPI. Model Pydantic (atau content yang divalidasi ke response_model)
+    langsung di-serialize oleh pydantic-core; dict biasa di-encode dengan orjson
+    yang menangani datetime/date/enum secara native. jsonable_encoder hanya
+    dipakai sebagai fallback untuk tipe yang tidak dikenal orjson.
+    """
+    if response_model is not None:
+        adapter = _adapter(response_model)
+        return adapter.dump_json(adapter.validate_python(content, from_attributes=True))
+    if isinstance(content, BaseModel):
+        return content.__pydantic_serializer__.to_json(content)
+    return orjson.dumps(content, default=jsonable_encoder)
+
+def render_rows(rows, schema) -> bytes:
+    """
+    Render baris dari database (dict) dengan row schema TypedDict tanpa
+    validasi. Hanya untuk data yang dibaca langsung dari kolom database, yang
+    tipenya sudah pasti; urutan key JSON mengikuti urutan key dict, dan key di
+    luar schema (misalnya foreign key) tidak ikut di-render.
+    """
+    return _adapter(schema).dump_json(rows)
+
+def json_response(body: bytes) -> Response:
+    """Response dari body JSON yang sudah di-render"""
+    return Response(content=body, media_type="application/json")
+
+class ResponseCache:
+    """
+    Cache body response per (route, parameter), di-invalidate lewat counter
+    versi per tabel: setiap write mem-bump versi tabelnya sehingga key lama
+    tidak pernah cocok lagi. Miss yang bersamaan untuk key yang sama hanya
+    dihitung sekali (single-flight), yang lain menunggu hasilnya.
+    """
+
+    def __init__(self, max_size: int = RESPONSE_CACHE_SIZE, ttl_seconds: float = RESPONSE_CACHE_TTL_SECONDS):
+        self.max_size = max_size
+        self.ttl_seconds = ttl_seconds
+        self._versions = {}
+        self._entries = OrderedDict()
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.evictions = 0
+
+    def version(self, table: str) -> int:
+        """Versi data tabel saat ini"""
+        with self._lock:
+            return self._versions.get(table, 0)
+
+    def bump(self, *tables: str):
+        """Tandai data tabel berubah (panggil setelah commit)"""
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+
+    def _get(self, key) -> Optional[bytes]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > time.monotonic():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            if entry:
+                del self._entries[key]
+        return None
+
+    def _set(self, key, body: bytes):
+        with self._lock:
+            self._entries[key] = (body, time.monotonic() + self.ttl_seconds)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    async def get_or_compute(
+        self,
+        key: Hashable,
+        tables: Iterable[str],
+        compute: Callable[[], Awaitable[bytes]]
+    ) -> bytes:
+        """
+        Ambil body dari cache, atau jalankan compute() sekali untuk semua
+        request bersamaan dengan key dan versi tabel yang sama.
+        """
+        key = (key, tuple((table, self.version(table)) for table in tables))
+        body = self._get(key)
+        if body is not None:
+            return body
+
+        future = self._inflight.get(key)
+        if future is not None:
+            with self._lock:
+                self.coalesced += 1
+            return await asyncio.shield(future)
+
+        with self._lock:
+            self.misses += 1
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[key] = future
+        try:
+            body = await compute()
+            self._set(key, body)
+            future.set_result(body)
+            return body
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Sudah ditangani, jangan di-log sebagai "never retrieved"
+            raise
+        finally:
+            del self._inflight[key]
+
+    def stats(self) -> dict:
+        """Metrik cache untuk monitoring"""
+        with self._lock:
+            lookups = self.hits + self.misses + self.coalesced
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "evictions": self.evictions,
+                "hit_ratio": round((self.hits + self.coalesced) / lookups, 3) if lookups else None,
+                "versions": dict(self._versions),
+            }
+
+response_cache = ResponseCache()
@@ -0,0 +1,86 @@
+from itertools import groupby
+from sqlalchemy import select, func, case
+from sqlalchemy.orm import Session
+from app.models import Absen, StatusBarangEnum
+
+def _summary(sheets: list) -> dict:
+    """Jumlah lembar dan berapa yang masih tersedia"""
+    tersedia = sum(1 for sheet in sheets if sheet["status"] == StatusBarangEnum.tersedia)
+    return {"total": len(sheets), "tersedia": tersedia, "available": tersedia > 0}
+
+# Kolom dan urutan lembar absen, mengikuti index ix_absen_semester_jurusan_matakuliah
+SHEET_COLUMNS = (
+    Absen.id, Absen.semester, Absen.jurusan, Absen.nama_matakuliah,
+    Absen.kelas, Absen.dosen, Absen.status
+)
+SHEET_ORDER = (Absen.semester, Absen.jurusan, Absen.nama_matakuliah, Absen.kelas, Absen.id)
+
+def _group_rows(rows) -> dict:
+    """Groupby berurutan (rows sudah terurut SHEET_ORDER) menjadi semester -> jurusan -> lembar"""
+    semesters = []
+    all_sheets = []
+    for semester, semester_rows in groupby(rows, key=lambda row: row.semester):
+        jurusan_groups = []
+        semester_sheets = []
+        for jurusan, jurusan_rows in groupby(semester_rows, key=lambda row: row.jurusan):
+            sheets = [
+                {
+                    "id": row.id,
+                    "nama_matakuliah": row.nama_matakuliah,
+                    "kelas": row.kelas,
+                    "dosen": row.dosen,
+                    "status": row.status
+                }
+                for row in jurusan_rows
+            ]
+            jurusan_groups.append({"jurusan": jurusan, **_summary(sheets), "sheets": sheets})
+            semester_sheets.extend(sheets)
+        
+        semesters.append({"semester": semester, **_summary(semester_sheets), "jurusan": jurusan_groups})
+        all_sheets.extend(semester_sheets)
+    
+    summary = _summary(all_sheets)
+    return {"total": summary["total"], "tersedia": summary["tersedia"], "semesters": semesters}
+
+def get_absen_grouped(db: Session) -> dict:
+    """
+    Kelompokkan semua absen menjadi semester -> jurusan -> lembar dengan satu
+    query yang sudah terurut lewat index ix_absen_semester_jurusan_matakuliah,
+    lalu groupby berurutan tanpa sorting ulang.
+    """
+    return _group_rows(db.execute(select(*SHEET_COLUMNS).order_by(*SHEET_ORDER)).all())
+
+def get_absen_grouped_page(db: Session, page: int, per_page: int) -> dict:
+    """
+    Satu halaman lembar absen (per_page lembar, urutan SHEET_ORDER) yang
+    dikelompokkan seperti get_absen_grouped, untuk section absen katalog.
+    total/tersedia di level atas dihitung atas semua absen (window function,
+    tetap satu query); total per grup hanya atas lembar di halaman ini, jadi
+    grup yang terpotong di batas halaman muncul lagi di halaman berikutnya.
+    """
+    tersedia = case((Absen.status == StatusBarangEnum.tersedia, 1), else_=0)
+    rows = db.execute(
+        select(
+            *SHEET_COLUMNS,
+            func.count().over().label("_total"),
+            func.sum(tersedia).over().label("_tersedia")
+        )
+        .order_by(*SHEET_ORDER)
+        .offset((page - 1) * per_page)
+        .limit(per_page)
+    ).all()
+    
+    if rows:
+        total, total_tersedia = rows[0]._total, rows[0]._tersedia
+    else:
+        # Halaman kosong/di luar jangkauan: window function tidak mengembalikan baris
+        total, total_tersedia = db.execute(select(func.count(), func.coalesce(func.sum(tersedia), 0))).one()
+    
+    return {
+        **_group_rows(rows),
+        "total": total,
+        "tersedia": total_tersedia,
+        "page": page,
+        "per_page": per_page,
+        "total_pages": (total + per_page - 1) // per_page
+    }
@@ -1,17 +1,31 @@
 from sqlalchemy.orm import Session
-from sqlalchemy import and_, or_
-from typing import Optional, List
+from sqlalchemy import and_, or_, select, func, update, case, values, column, Integer, String
+from sqlalchemy.exc import IntegrityError
+from typing import Dict, Iterator, Optional, List
+from app.database import dialect_insert
 from app.models import Barang, StatusBarangEnum
-from app.schemas.barang import BarangCreate, BarangUpdate
-from datetime import datetime
+from app.schemas.barang import BarangCreate, BarangUpdate, BarangRow
+from app.schemas.base import row_columns
+from app import fts
+from app.crud import barang_availability as crud_availability
+from app.cache import response_cache
+from datetime import date, datetime
+
+# Jumlah baris per statement INSERT ... ON CONFLICT di upsert massal
+BULK_BATCH_SIZE = 500
+BULK_FIELDS = ("nama", "satuan", "stok", "lokasi")
+EXPORT_FIELDS = ("id", "nama", "satuan", "stok", "status", "lokasi", "created_at", "updated_at")
 
 def get_barang(db: Session, barang_id: int) -> Optional[Barang]:
     """Get barang by ID"""
     return db.query(Barang).filter(Barang.id == barang_id).first()
 
 def get_barang_by_nama(db: Session, nama: str) -> Optional[Barang]:
-    """Get barang by nama (case insensitive)"""
-    return db.query(Barang).filter(Barang.nama.ilike(f"%{nama}%")).first()
+    """
+    Get barang by nama persis (case insensitive). lower() di kedua sisi
+    dijalankan database, sama dengan index unik ux_barang_nama_normalized.
+    """
+    return db.query(Barang).filter(func.lower(Barang.nama) == func.lower(nama)).first()
 
 def get_barang_list(
     db: Session, 
@@ -20,12 +34,24 @@ def get_barang_list(
     search: Optional[str] = None,
     status: Optional[StatusBarangEnum] = None,
     lokasi: Optional[str] = None
-) -> tuple[List[Barang], int]:
-    """Get list of barang with filters and pagination"""
-    query = db.query(Barang)
+) -> tuple[list, int]:
+    """
+    Get list of barang with filters and pagination.
+    
+    Search memakai index FTS5 barang_fts (prefix per kata, diurutkan bm25)
+    jika tersedia, selain itu fallback ke ILIKE. Hasilnya Row proyeksi kolom
+    BarangRow (bukan entity ORM), cukup untuk di-serialize tanpa identity map.
+    """
+    query = db.query(*row_columns(BarangRow, Barang))
+    order_by = [Barang.nama]
     
     # Apply filters
-    if search:
+    match = fts.build_match_query(search) if search else None
+    if match and fts.fts_available("barang"):
+        matches = fts.fts_match_subquery("barang")
+        query = query.join(matches, matches.c.id == Barang.id).params(match=match)
+        order_by = [matches.c.rank, Barang.nama]
+    elif search:
         query = query.filter(
             or_(
                 Barang.nama.ilike(f"%{search}%"),
@@ -44,11 +70,11 @@ def get_barang_list(
     total = query.count()
     
     # Apply pagination and ordering
-    items = query.order_by(Barang.nama).offset(skip).limit(limit).all()
+    items = query.order_by(*order_by).offset(skip).limit(limit).all()
     
     return items, total
 
-def get_barang_tersedia(db: Session, skip: int = 0, limit: int = 20) -> tuple[List[Barang], int]:
+def get_barang_tersedia(db: Session, skip: int = 0, limit: int = 20) -> tuple[list, int]:
     """Get only available barang"""
     return get_barang_list(
         db=db, 
@@ -67,7 +93,13 @@ def create_barang(db: Session, barang: BarangCreate) -> Barang:
         status=StatusBarangEnum.tersedia  # Default status
     )
     db.add(db_barang)
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # Nama duplikat yang lolos pre-check (index ux_barang_nama_normalized)
+        db.rollback()
+        raise
+    response_cache.bump("barang")
     db.refresh(db_barang)
     return db_barang
 
@@ -83,7 +115,13 @@ def update_barang(db: Session, barang_id: int, barang_update: BarangUpdate) -> O
         setattr(db_barang, field, value)
     
     db_barang.updated_at = datetime.utcnow()
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        # Nama duplikat yang lolos pre-check (index ux_barang_nama_normalized)
+        db.rollback()
+        raise
+    response_cache.bump("barang")
     db.refresh(db_barang)
     return db_barang
 
@@ -103,6 +141,7 @@ def update_stok_barang(db: Session, barang_id: int, new_stok: int) -> Optional[B
         db_barang.status = StatusBarangEnum.tersedia
     
     db.commit()
+    response_cache.bump("barang")
     db.refresh(db_barang)
     return db_barang
 
@@ -115,6 +154,7 @@ def update_status_barang(db: Session, barang_id: int, new_status: StatusBarangEn
     db_barang.status = new_status
     db_barang.updated_at = datetime.utcnow()
     db.commit()
+    response_cache.bump("barang")
     db.refresh(db_barang)
     return db_barang
 
@@ -127,21 +167,189 @@ def delete_barang(db: Session, barang_id: int) -> bool:
     # For now, we'll do hard delete. In production, consider soft delete
     db.delete(db_barang)
     db.commit()
+    response_cache.bump("barang")
     return True
 
-def check_barang_availability(db: Session, barang_id: int, jumlah_needed: int) -> dict:
-    """Check if barang available for borrowing"""
+def check_barang_availability(db: Session, barang_id: int, jumlah_needed: int, tanggal: Optional[date] = None) -> dict:
+    """
+    Check if barang available for borrowing.
+    
+    Jika tanggal diisi, jumlah yang masih pending untuk tanggal itu ikut
+    diperhitungkan (dari timeline barang_daily_reservation). Peminjaman yang
+    sudah disetujui dilaporkan sebagai committed tapi tidak dikurangkan lagi
+    dari sisa, karena sudah mengurangi stok saat approval.
+    """
     barang = get_barang(db, barang_id)
     if not barang:
         return {'available': False, 'reason': 'Barang tidak ditemukan'}
     
+    if tanggal is None:
+        if barang.status != StatusBarangEnum.tersedia:
+            return {'available': False, 'reason': f'Barang sedang {barang.status.value}'}
+        
+        if barang.stok < jumlah_needed:
+            return {
+                'available': False, 
+                'reason': f'Stok tidak cukup. Tersedia: {barang.stok}, dibutuhkan: {jumlah_needed}'
+            }
+        
+        return {'available': True, 'reason': 'Barang tersedia'}
+    
+    pending = crud_availability.get_pending(db, [barang_id], tanggal).get(barang_id, 0)
+    committed = crud_availability.get_committed(db, [barang_id], tanggal).get(barang_id, 0)
+    sisa = max(0, barang.stok - pending)
+    result = {
+        'tanggal': tanggal,
+        'stok': barang.stok,
+        'pending': pending,
+        'committed': committed,
+        'sisa': sisa
+    }
+    
     if barang.status != StatusBarangEnum.tersedia:
-        return {'available': False, 'reason': f'Barang sedang {barang.status.value}'}
+        return {'available': False, 'reason': f'Barang sedang {barang.status.value}', **result}
     
-    if barang.stok < jumlah_needed:
+    if sisa < jumlah_needed:
         return {
-            'available': False, 
-            'reason': f'Stok tidak cukup. Tersedia: {barang.stok}, dibutuhkan: {jumlah_needed}'
+            'available': False,
+            'reason': f'Stok tidak cukup untuk {tanggal}. Tersedia: {sisa} '
+                      f'({pending} menunggu persetujuan), dibutuhkan: {jumlah_needed}',
+            **result
         }
     
-    return {'available': True, 'reason': 'Barang tersedia'}
\ No newline at end of file
+    return {'available': True, 'reason': 'Barang tersedia', **result}
+
+def reserve_stok(db: Session, jumlah_per_barang: Dict[int, int]) -> List[str]:
+    """
+    Kurangi stok beberapa barang sekaligus dengan satu UPDATE bersyarat
+    (stok = stok - n WHERE stok >= n), status jadi dipinjam jika stok habis.
+    Pengecekan dan pengurangan terjadi atomik di database, jadi approval yang
+    bersamaan tidak bisa membuat stok negatif.
+    Tidak commit - dipanggil sebelum commit di endpoint agar satu transaksi.
+    
+    Returns:
+        list: Pesan error per barang yang stoknya kurang/tidak ditemukan.
+        Jika tidak kosong, barang lain mungkin sudah dikurangi sehingga
+        pemanggil wajib rollback.
+    """
+    if not jumlah_per_barang:
+        return []
+    
+    needed = case(jumlah_per_barang, value=Barang.id)
+    reserved = set(db.scalars(
+        update(Barang)
+        .where(Barang.id.in_(jumlah_per_barang), Barang.stok >= needed)
+        .values(
+            stok=Barang.stok - needed,
+            status=case((Barang.stok - needed <= 0, StatusBarangEnum.dipinjam), else_=Barang.status)
+        )
+        .returning(Barang.id)
+        .execution_options(synchronize_session=False)
+    ))
+    failed = [barang_id for barang_id in jumlah_per_barang if barang_id not in reserved]
+    if not failed:
+        return []
+    
+    # Barang yang gagal tidak ikut ter-update, stoknya masih stok saat ini
+    stok = dict(db.execute(select(Barang.id, Barang.stok).where(Barang.id.in_(failed))).all())
+    return [
+        f"Stok barang dengan ID {barang_id} tidak cukup. Tersedia: {stok[barang_id]}, dibutuhkan: {jumlah_per_barang[barang_id]}"
+        if barang_id in stok else f"Barang dengan ID {barang_id} tidak ditemukan"
+        for barang_id in failed
+    ]
+
+def release_stok(db: Session, jumlah_per_barang: Dict[int, int]):
+    """
+    Kembalikan stok beberapa barang dengan satu UPDATE (stok = stok + n),
+    status kembali tersedia. Tidak commit.
+    """
+    if not jumlah_per_barang:
+        return
+    
+    db.execute(
+        update(Barang)
+        .where(Barang.id.in_(jumlah_per_barang))
+        .values(stok=Barang.stok + case(jumlah_per_barang, value=Barang.id), status=StatusBarangEnum.tersedia)
+        .execution_options(synchronize_session=False)
+    )
+
+def normalize_nama(db: Session, names: List[str], batch_size: int = BULK_BATCH_SIZE) -> List[str]:
+    """
+    Normalisasi nama dengan lower() milik database (lewat CTE VALUES), bukan
+    str.lower() Python: lower() SQLite hanya melipat ASCII, sedangkan
+    ux_barang_nama_normalized dan ON CONFLICT memakai lower() database.
+    """
+    normalized = []
+    for start in range(0, len(names), batch_size):
+        batch = values(column("i", Integer), column("nama", String), name="nama_input").data(
+            list(enumerate(names[start:start + batch_size]))
+        ).cte()
+        normalized.extend(db.scalars(select(func.lower(batch.c.nama)).order_by(batch.c.i)))
+    return normalized
+
+def upsert_barang_bulk(db: Session, items: List[BarangCreate], batch_size: int = BULK_BATCH_SIZE) -> dict:
+    """
+    Upsert banyak barang berdasarkan nama ternormalisasi (lower(nama), index
+    ux_barang_nama_normalized) dengan INSERT ... ON CONFLICT per batch, semuanya
+    dalam satu transaksi. Barang yang sudah ada diperbarui satuan, stok, dan lokasinya.
+    Jika nama yang sama muncul berkali-kali, baris terakhir yang dipakai.
+    """
+    rows = {}
+    for key, item in zip(normalize_nama(db, [item.nama for item in items]), items):
+        rows[key] = item
+    
+    now = datetime.utcnow()
+    keys = list(rows)
+    insert = dialect_insert(db)
+    existing = 0
+    
+    try:
+        for start in range(0, len(keys), batch_size):
+            batch = keys[start:start + batch_size]
+            existing += db.scalar(
+                select(func.count()).select_from(Barang).where(func.lower(Barang.nama).in_(batch))
+            )
+            
+            stmt = insert(Barang).values([
+                {
+                    "nama": rows[key].nama,
+                    "satuan": rows[key].satuan,
+                    "stok": rows[key].stok,
+                    "lokasi": rows[key].lokasi,
+                    "status": StatusBarangEnum.tersedia,
+                    "created_at": now,
+                    "updated_at": now
+                }
+                for key in batch
+            ])
+            db.execute(stmt.on_conflict_do_update(
+                index_elements=[func.lower(Barang.nama)],
+                set_={
+                    "satuan": stmt.excluded.satuan,
+                    "stok": stmt.excluded.stok,
+                    "lokasi": stmt.excluded.lokasi,
+                    "updated_at": stmt.excluded.updated_at
+                }
+            ))
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    response_cache.bump("barang")
+    
+    return {
+        "total": len(items),
+        "created": len(keys) - existing,
+        "updated": existing,
+        "duplicates": len(items) - len(keys)
+    }
+
+def iter_barang_export(db: Session, batch_size: int = 500) -> Iterator[dict]:
+    """Stream semua barang (urut id) per batch dengan yield_per, tanpa memuat semuanya"""
+    result = db.execute(
+        select(*Barang.__table__.columns)
+        .order_by(Barang.id)
+        .execution_options(yield_per=batch_size)
+    )
+    for row in result:
+        yield row._mapping
@@ -0,0 +1,129 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, select, exists
+from typing import Dict, List, Optional
+from datetime import date
+from app.database import dialect_insert
+from app.models import (
+    Peminjaman, PeminjamanDetail, BarangDailyReservation,
+    StatusPeminjamanEnum, ReferenceTypeEnum
+)
+
+# Status peminjaman yang masih memesan barang pada tanggalnya
+RESERVED_STATUSES = (StatusPeminjamanEnum.pending, StatusPeminjamanEnum.disetujui)
+
+def barang_quantities(details) -> Dict[int, int]:
+    """Total jumlah per barang_id dari details (barang yang sama bisa muncul lebih dari sekali)"""
+    jumlah_per_barang = {}
+    for detail in details:
+        if detail.reference_type == ReferenceTypeEnum.barang and detail.jumlah:
+            jumlah_per_barang[detail.reference_id] = jumlah_per_barang.get(detail.reference_id, 0) + detail.jumlah
+    return jumlah_per_barang
+
+def _increment(db: Session, jumlah_per_barang: Dict[int, int], tanggal: date, status: StatusPeminjamanEnum, sign: int):
+    """
+    Tambah/kurangi jumlah pada baris (barang, tanggal, status) dengan satu
+    INSERT ... ON CONFLICT DO UPDATE, sehingga pemesanan pertama yang
+    bersamaan untuk baris yang sama tidak bentrok di primary key.
+    """
+    if tanggal is None or status not in RESERVED_STATUSES or not jumlah_per_barang:
+        return
+    stmt = dialect_insert(db)(BarangDailyReservation).values([
+        {"barang_id": barang_id, "tanggal": tanggal, "status": status, "jumlah": sign * jumlah}
+        for barang_id, jumlah in jumlah_per_barang.items()
+    ])
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[BarangDailyReservation.barang_id, BarangDailyReservation.tanggal, BarangDailyReservation.status],
+        set_={"jumlah": BarangDailyReservation.jumlah + stmt.excluded.jumlah}
+    ))
+
+def record_status_change(
+    db: Session,
+    details,
+    tanggal: date,
+    old_status: Optional[StatusPeminjamanEnum],
+    new_status: Optional[StatusPeminjamanEnum]
+):
+    """
+    Catat perubahan status peminjaman ke timeline barang.
+    old_status None berarti peminjaman baru, new_status None berarti dihapus.
+    Tidak commit - dipanggil sebelum commit di endpoint agar satu transaksi.
+    """
+    if old_status == new_status:
+        return
+    jumlah_per_barang = barang_quantities(details)
+    _increment(db, jumlah_per_barang, tanggal, old_status, -1)
+    _increment(db, jumlah_per_barang, tanggal, new_status, 1)
+
+def record_tanggal_change(db: Session, details, old_tanggal: date, new_tanggal: date, status: StatusPeminjamanEnum):
+    """Pindahkan pesanan barang satu peminjaman dari tanggal lama ke tanggal baru"""
+    if old_tanggal == new_tanggal:
+        return
+    jumlah_per_barang = barang_quantities(details)
+    _increment(db, jumlah_per_barang, old_tanggal, status, -1)
+    _increment(db, jumlah_per_barang, new_tanggal, status, 1)
+
+def rebuild_reservations(db: Session):
+    """Hitung ulang seluruh timeline dari peminjaman pending/disetujui"""
+    rows = db.query(
+        PeminjamanDetail.reference_id,
+        Peminjaman.tanggal_peminjaman,
+        Peminjaman.status,
+        func.sum(PeminjamanDetail.jumlah)
+    ).join(
+        Peminjaman, Peminjaman.id == PeminjamanDetail.peminjaman_id
+    ).filter(
+        PeminjamanDetail.reference_type == ReferenceTypeEnum.barang,
+        PeminjamanDetail.jumlah.isnot(None),
+        Peminjaman.tanggal_peminjaman.isnot(None),
+        Peminjaman.status.in_(RESERVED_STATUSES)
+    ).group_by(
+        PeminjamanDetail.reference_id, Peminjaman.tanggal_peminjaman, Peminjaman.status
+    ).all()
+    
+    db.query(BarangDailyReservation).delete(synchronize_session=False)
+    db.add_all([
+        BarangDailyReservation(barang_id=barang_id, tanggal=tanggal, status=status, jumlah=jumlah)
+        for barang_id, tanggal, status, jumlah in rows
+    ])
+    db.commit()
+
+def ensure_reservations(db: Session) -> bool:
+    """
+    Rebuild timeline hanya jika tabelnya masih kosong padahal sudah ada
+    peminjaman (lihat peminjaman_stats.ensure_daily_stats)
+
+    Returns:
+        bool: True jika rebuild dijalankan
+    """
+    if db.scalar(select(exists().select_from(BarangDailyReservation))):
+        return False
+    if not db.scalar(select(exists().select_from(Peminjaman))):
+        return False
+    rebuild_reservations(db)
+    return True
+
+def _get_reserved(db: Session, barang_ids: List[int], tanggal: date, status: StatusPeminjamanEnum) -> Dict[int, int]:
+    """Jumlah per barang_id dengan status pada tanggal, dari lookup primary key (barang_id, tanggal, status)"""
+    if not barang_ids:
+        return {}
+    timeline = BarangDailyReservation
+    return dict(db.query(timeline.barang_id, timeline.jumlah).filter(
+        timeline.barang_id.in_(barang_ids),
+        timeline.tanggal == tanggal,
+        timeline.status == status
+    ).all())
+
+def get_pending(db: Session, barang_ids: List[int], tanggal: date) -> Dict[int, int]:
+    """
+    Jumlah per barang_id yang masih pending pada tanggal, dari lookup primary
+    key (barang_id, tanggal, status) - tanpa scan peminjaman_detail. Barang
+    yang tidak punya pesanan pending tidak ada di hasil.
+    """
+    return _get_reserved(db, barang_ids, tanggal, StatusPeminjamanEnum.pending)
+
+def get_committed(db: Session, barang_ids: List[int], tanggal: date) -> Dict[int, int]:
+    """
+    Jumlah per barang_id yang sudah disetujui untuk tanggal. Hanya informasi:
+    stok sudah dikurangi saat approval, jadi tidak dikurangkan lagi dari sisa.
+    """
+    return _get_reserved(db, barang_ids, tanggal, StatusPeminjamanEnum.disetujui)
@@ -0,0 +1,66 @@
+from sqlalchemy import select, func
+from sqlalchemy.orm import Session
+from app.models import Barang, Kelas, StatusBarangEnum
+from app.crud import absen as crud_absen
+
+# Proyeksi ringkas per section katalog: (model, kolom, filter, urutan)
+CATALOG_SECTIONS = {
+    "barang": (
+        Barang,
+        (Barang.id, Barang.nama, Barang.satuan, Barang.stok, Barang.lokasi, Barang.status),
+        (Barang.status == StatusBarangEnum.tersedia, Barang.stok > 0),
+        (Barang.nama, Barang.id),
+    ),
+    "kelas": (
+        Kelas,
+        (Kelas.id, Kelas.nama_kelas, Kelas.gedung, Kelas.lantai, Kelas.kapasitas, Kelas.fasilitas),
+        (),
+        (Kelas.id,),
+    ),
+}
+
+# Tabel yang isinya ikut di katalog (untuk invalidasi cache)
+CATALOG_TABLES = [*CATALOG_SECTIONS, "absen"]
+
+def get_catalog_section(db: Session, section: str, page: int, per_page: int) -> dict:
+    """
+    Satu halaman section katalog dalam satu query: total ikut dihitung
+    lewat COUNT(*) OVER () sehingga tidak perlu query count terpisah.
+    """
+    model, columns, filters, order_by = CATALOG_SECTIONS[section]
+    rows = db.execute(
+        select(*columns, func.count().over().label("_total"))
+        .where(*filters)
+        .order_by(*order_by)
+        .offset((page - 1) * per_page)
+        .limit(per_page)
+    ).all()
+    
+    if rows:
+        total = rows[0]._total
+    elif page == 1:
+        total = 0
+    else:
+        # Halaman di luar jangkauan: window function tidak mengembalikan baris
+        total = db.scalar(select(func.count()).select_from(model).where(*filters))
+    
+    return {
+        "items": [{key: value for key, value in row._mapping.items() if key != "_total"} for row in rows],
+        "total": total,
+        "page": page,
+        "per_page": per_page,
+        "total_pages": (total + per_page - 1) // per_page
+    }
+
+def get_catalog(db: Session, pages: dict, per_page: int) -> dict:
+    """
+    Katalog barang tersedia dan kelas, plus absen yang dikelompokkan
+    semester -> jurusan seperti /absen/grouped; satu query per section,
+    semuanya dipaginasi dengan per_page yang sama
+    """
+    catalog = {
+        section: get_catalog_section(db, section, pages[section], per_page)
+        for section in CATALOG_SECTIONS
+    }
+    catalog["absen"] = crud_absen.get_absen_grouped_page(db, pages["absen"], per_page)
+    return catalog
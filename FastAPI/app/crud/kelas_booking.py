@@ -0,0 +1,157 @@
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import and_, or_, exists, select
+from typing import List, Optional, Tuple
+from datetime import date, datetime, time, timedelta
+from app.models import Peminjaman, PeminjamanDetail, Kelas, User, StatusPeminjamanEnum, ReferenceTypeEnum
+
+def _overlap_condition(kelas_id: int, waktu_mulai: datetime, waktu_selesai: datetime):
+    """
+    Kondisi detail kelas yang overlap dengan rentang [waktu_mulai, waktu_selesai).
+    Urutan kolom mengikuti index ix_peminjaman_detail_kelas_waktu.
+    """
+    return and_(
+        PeminjamanDetail.reference_type == ReferenceTypeEnum.kelas,
+        PeminjamanDetail.reference_id == kelas_id,
+        PeminjamanDetail.waktu_mulai < waktu_selesai,
+        PeminjamanDetail.waktu_selesai > waktu_mulai
+    )
+
+def find_conflicts(db: Session, details: list, exclude_peminjaman_id: Optional[int] = None) -> list:
+    """
+    Cari booking kelas yang sudah disetujui dan overlap dengan details,
+    semua dalam satu range query.
+    
+    Args:
+        details: PeminjamanDetail/PeminjamanDetailCreate, yang bukan kelas diabaikan
+        exclude_peminjaman_id: Abaikan booking milik peminjaman ini (saat approve)
+        
+    Returns:
+        list: Row (reference_id, waktu_mulai, waktu_selesai, peminjaman_id) yang bentrok
+    """
+    conditions = [
+        _overlap_condition(detail.reference_id, detail.waktu_mulai, detail.waktu_selesai)
+        for detail in details
+        if detail.reference_type == ReferenceTypeEnum.kelas
+        and detail.waktu_mulai and detail.waktu_selesai
+    ]
+    if not conditions:
+        return []
+    
+    query = db.query(
+        PeminjamanDetail.reference_id,
+        PeminjamanDetail.waktu_mulai,
+        PeminjamanDetail.waktu_selesai,
+        PeminjamanDetail.peminjaman_id
+    ).join(Peminjaman, Peminjaman.id == PeminjamanDetail.peminjaman_id).filter(
+        or_(*conditions),
+        Peminjaman.status == StatusPeminjamanEnum.disetujui
+    )
+    if exclude_peminjaman_id is not None:
+        query = query.filter(PeminjamanDetail.peminjaman_id != exclude_peminjaman_id)
+    return query.all()
+
+def find_internal_conflicts(details: list) -> List[Tuple[int, int]]:
+    """
+    Pasangan index (i, j), i < j, detail kelas di dalam satu request yang
+    membooking kelas yang sama pada waktu yang overlap.
+    """
+    kelas_details = [
+        (i, detail) for i, detail in enumerate(details)
+        if detail.reference_type == ReferenceTypeEnum.kelas
+        and detail.waktu_mulai and detail.waktu_selesai
+    ]
+    return [
+        (i, j)
+        for n, (i, detail) in enumerate(kelas_details)
+        for j, other in kelas_details[n + 1:]
+        if overlaps(detail, other)
+    ]
+
+def lock_kelas(db: Session, details: list):
+    """
+    Kunci baris kelas yang dibooking details (SELECT ... FOR UPDATE), sehingga
+    approval bersamaan untuk kelas yang sama berjalan bergantian. Di SQLite
+    FOR UPDATE diabaikan; di sana penulis sudah serial per database.
+    """
+    kelas_ids = sorted({
+        detail.reference_id for detail in details
+        if detail.reference_type == ReferenceTypeEnum.kelas
+    })
+    if kelas_ids:
+        db.execute(select(Kelas.id).where(Kelas.id.in_(kelas_ids)).order_by(Kelas.id).with_for_update())
+
+def approved_conflict_exists(peminjaman_id: int):
+    """
+    Kondisi EXISTS: ada detail kelas peminjaman ini yang overlap dengan booking
+    peminjaman lain yang sudah disetujui. Dipakai di UPDATE bersyarat saat
+    approve, supaya cek bentrok dan perubahan status terjadi dalam satu statement.
+    """
+    mine, other = aliased(PeminjamanDetail), aliased(PeminjamanDetail)
+    other_peminjaman = aliased(Peminjaman)
+    return exists(
+        select(1)
+        .select_from(mine)
+        .join(other, and_(
+            other.reference_type == ReferenceTypeEnum.kelas,
+            other.reference_id == mine.reference_id,
+            other.waktu_mulai < mine.waktu_selesai,
+            other.waktu_selesai > mine.waktu_mulai,
+            other.peminjaman_id != peminjaman_id
+        ))
+        .join(other_peminjaman, other_peminjaman.id == other.peminjaman_id)
+        .where(
+            mine.peminjaman_id == peminjaman_id,
+            mine.reference_type == ReferenceTypeEnum.kelas,
+            other_peminjaman.status == StatusPeminjamanEnum.disetujui
+        )
+    )
+
+def overlaps(conflict, detail) -> bool:
+    """Cek apakah booking hasil find_conflicts overlap dengan satu detail"""
+    return (
+        conflict.reference_id == detail.reference_id
+        and conflict.waktu_mulai < detail.waktu_selesai
+        and conflict.waktu_selesai > detail.waktu_mulai
+    )
+
+def format_conflict(conflict) -> str:
+    """Pesan error untuk satu booking yang bentrok"""
+    return (
+        f"Kelas dengan ID {conflict.reference_id} sudah dibooking "
+        f"{conflict.waktu_mulai.strftime('%Y-%m-%d %H:%M')}-{conflict.waktu_selesai.strftime('%H:%M')}"
+    )
+
+def get_schedule(db: Session, kelas_id: int, tanggal: date) -> List[dict]:
+    """Jadwal booking kelas yang disetujui pada tanggal tertentu, diurutkan per waktu_mulai"""
+    day_start = datetime.combine(tanggal, time.min)
+    day_end = day_start + timedelta(days=1)
+    
+    rows = db.query(
+        PeminjamanDetail.peminjaman_id,
+        PeminjamanDetail.waktu_mulai,
+        PeminjamanDetail.waktu_selesai,
+        Peminjaman.status,
+        Peminjaman.tanggal_peminjaman,
+        User.name,
+        User.nim
+    ).join(
+        Peminjaman, Peminjaman.id == PeminjamanDetail.peminjaman_id
+    ).outerjoin(
+        User, User.id == Peminjaman.user_id
+    ).filter(
+        _overlap_condition(kelas_id, day_start, day_end),
+        Peminjaman.status == StatusPeminjamanEnum.disetujui
+    ).order_by(PeminjamanDetail.waktu_mulai).all()
+    
+    return [
+        {
+            "peminjaman_id": row.peminjaman_id,
+            "user_name": row.name or "Unknown",
+            "user_nim": row.nim or "Unknown",
+            "waktu_mulai": row.waktu_mulai.strftime("%H:%M"),
+            "waktu_selesai": row.waktu_selesai.strftime("%H:%M"),
+            "status": row.status.value,
+            "tanggal_peminjaman": row.tanggal_peminjaman.isoformat()
+        }
+        for row in rows
+    ]
@@ -0,0 +1,59 @@
+from typing import Iterator, List
+from sqlalchemy import select
+from sqlalchemy.orm import Session, aliased
+from app.models import Peminjaman, PeminjamanDetail, User
+
+# Kolom export: satu baris per detail peminjaman
+EXPORT_FIELDS = (
+    "peminjaman_id", "tanggal_peminjaman", "status", "user_nim", "user_name",
+    "approver_name", "notes", "created_at", "detail_id", "reference_type",
+    "reference_id", "item_name", "jumlah", "waktu_mulai", "waktu_selesai",
+)
+
+def _item_name(item: dict):
+    """Nama item untuk semua reference_type (sama seperti expand_peminjaman_items)"""
+    if not item:
+        return None
+    return item.get('nama') or item.get('nama_kelas') or item.get('nama_matakuliah')
+
+def iter_peminjaman_export(db: Session, filters: List, batch_size: int = 500) -> Iterator[dict]:
+    """
+    Stream riwayat peminjaman (urut created_at DESC, id DESC) satu baris per detail.
+    
+    Baris dibaca lewat yield_per dan diproses per partisi: item yang direferensikan
+    satu partisi di-load sekaligus (satu query IN per reference_type), jadi memory
+    tetap sebesar satu partisi berapa pun panjang rentang tanggalnya.
+    """
+    borrower = aliased(User)
+    approver = aliased(User)
+    query = (
+        select(
+            Peminjaman.id.label("peminjaman_id"),
+            Peminjaman.tanggal_peminjaman,
+            Peminjaman.status,
+            borrower.nim.label("user_nim"),
+            borrower.name.label("user_name"),
+            approver.name.label("approver_name"),
+            Peminjaman.notes,
+            Peminjaman.created_at,
+            PeminjamanDetail.id.label("detail_id"),
+            PeminjamanDetail.reference_type,
+            PeminjamanDetail.reference_id,
+            PeminjamanDetail.jumlah,
+            PeminjamanDetail.waktu_mulai,
+            PeminjamanDetail.waktu_selesai,
+        )
+        .outerjoin(borrower, Peminjaman.user_id == borrower.id)
+        .outerjoin(approver, Peminjaman.approved_by == approver.id)
+        .outerjoin(PeminjamanDetail, PeminjamanDetail.peminjaman_id == Peminjaman.id)
+        .filter(*filters)
+        .order_by(Peminjaman.created_at.desc(), Peminjaman.id.desc(), PeminjamanDetail.id)
+        .execution_options(yield_per=batch_size)
+    )
+    
+    for rows in db.execute(query).partitions():
+        referenced_items = PeminjamanDetail.load_referenced_items(db, rows)
+        for row in rows:
+            record = dict(row._mapping)
+            record["item_name"] = _item_name(referenced_items.get((row.reference_type, row.reference_id)))
+            yield record
@@ -0,0 +1,116 @@
+from sqlalchemy.orm import Session
+from sqlalchemy import func, case, and_, or_, select, exists
+from typing import Optional
+from datetime import date, timedelta
+from app.database import dialect_insert
+from app.models import Peminjaman, PeminjamanDailyStats, StatusPeminjamanEnum
+
+def _increment(db: Session, tanggal: date, status: StatusPeminjamanEnum, delta: int):
+    """
+    Tambah jumlah pada baris rollup (tanggal, status) dengan satu INSERT ...
+    ON CONFLICT DO UPDATE, sehingga peminjaman pertama yang bersamaan untuk
+    tanggal yang sama tidak bentrok di primary key.
+    """
+    stmt = dialect_insert(db)(PeminjamanDailyStats).values(tanggal=tanggal, status=status, jumlah=delta)
+    db.execute(stmt.on_conflict_do_update(
+        index_elements=[PeminjamanDailyStats.tanggal, PeminjamanDailyStats.status],
+        set_={"jumlah": PeminjamanDailyStats.jumlah + stmt.excluded.jumlah}
+    ))
+
+def record_status_change(
+    db: Session,
+    tanggal: date,
+    old_status: Optional[StatusPeminjamanEnum],
+    new_status: Optional[StatusPeminjamanEnum]
+):
+    """
+    Catat perubahan status peminjaman ke rollup harian.
+    old_status None berarti peminjaman baru, new_status None berarti dihapus.
+    Tidak commit - dipanggil sebelum commit di endpoint agar satu transaksi.
+    """
+    if old_status == new_status:
+        return
+    if old_status is not None:
+        _increment(db, tanggal, old_status, -1)
+    if new_status is not None:
+        _increment(db, tanggal, new_status, 1)
+
+def record_tanggal_change(db: Session, old_tanggal: date, new_tanggal: date, status: StatusPeminjamanEnum):
+    """Pindahkan satu peminjaman dari tanggal lama ke tanggal baru di rollup harian"""
+    if old_tanggal == new_tanggal:
+        return
+    _increment(db, old_tanggal, status, -1)
+    _increment(db, new_tanggal, status, 1)
+
+def rebuild_daily_stats(db: Session):
+    """Hitung ulang seluruh rollup harian dari tabel peminjaman"""
+    rows = db.query(
+        Peminjaman.tanggal_peminjaman,
+        Peminjaman.status,
+        func.count(Peminjaman.id)
+    ).filter(
+        Peminjaman.tanggal_peminjaman.isnot(None),
+        Peminjaman.status.isnot(None)
+    ).group_by(Peminjaman.tanggal_peminjaman, Peminjaman.status).all()
+    
+    db.query(PeminjamanDailyStats).delete(synchronize_session=False)
+    db.add_all([
+        PeminjamanDailyStats(tanggal=tanggal, status=status, jumlah=jumlah)
+        for tanggal, status, jumlah in rows
+    ])
+    db.commit()
+
+def ensure_daily_stats(db: Session) -> bool:
+    """
+    Rebuild rollup hanya jika tabelnya masih kosong padahal sudah ada peminjaman
+    (database lama sebelum rollup ada). Dipanggil saat startup; rebuild penuh
+    lewat scripts/rebuild_rollups.py.
+
+    Returns:
+        bool: True jika rebuild dijalankan
+    """
+    if db.scalar(select(exists().select_from(PeminjamanDailyStats))):
+        return False
+    if not db.scalar(select(exists().select_from(Peminjaman))):
+        return False
+    rebuild_daily_stats(db)
+    return True
+
+def get_statistics(db: Session, today: date) -> dict:
+    """Statistik dashboard staff dalam satu query conditional aggregation atas rollup harian"""
+    week_ago = today - timedelta(days=7)
+    month_ago = today - timedelta(days=30)
+    stats = PeminjamanDailyStats
+    
+    def total_where(*conditions):
+        return func.coalesce(func.sum(case((and_(*conditions), stats.jumlah), else_=0)), 0)
+    
+    row = db.query(
+        total_where(stats.tanggal == today),
+        total_where(stats.tanggal == today, stats.status == StatusPeminjamanEnum.pending),
+        total_where(stats.tanggal == today, stats.status == StatusPeminjamanEnum.disetujui),
+        total_where(stats.tanggal >= week_ago),
+        total_where(stats.tanggal >= month_ago),
+        total_where(stats.status == StatusPeminjamanEnum.pending),
+    ).filter(
+        or_(stats.tanggal >= month_ago, stats.status == StatusPeminjamanEnum.pending)
+    ).one()
+    
+    today_total, today_pending, today_approved, week_total, month_total, all_pending = row
+    return {
+        "today": {
+            "total": today_total,
+            "pending": today_pending,
+            "approved": today_approved,
+            "rejected": today_total - today_pending - today_approved
+        },
+        "week": {
+            "total": week_total
+        },
+        "month": {
+            "total": month_total
+        },
+        "overall": {
+            "pending": all_pending
+        }
+    }
@@ -0,0 +1,132 @@
+from typing import Iterator, List, Optional, Tuple
+from sqlalchemy import select, union, insert
+from sqlalchemy.orm import Session
+from app.models import User, RoleEnum
+from app.auth import validate_nim_format, hash_passwords_parallel
+from app import fts
+
+# Jumlah baris roster yang di-hash dan di-insert per batch
+ROSTER_BATCH_SIZE = 500
+ROSTER_FIELDS = ("nim", "name", "kode_akses")
+
+def get_user_by_nim(db: Session, nim: str) -> Optional[User]:
+    """Get user by NIM"""
+    return db.scalar(select(User).where(User.nim == nim))
+
+def create_user(db: Session, nim: str, name: str, role: RoleEnum, hashed_password: str) -> User:
+    """Create user dengan password yang sudah di-hash"""
+    db_user = User(nim=nim, name=name, role=role, kode_akses=hashed_password)
+    db.add(db_user)
+    db.commit()
+    db.refresh(db_user)
+    return db_user
+
+def update_password_hash(db: Session, user_id: int, hashed_password: str):
+    """Simpan hash baru (rehash saat login) lewat ORM, supaya event User tetap jalan"""
+    db_user = db.get(User, user_id)
+    if db_user:
+        db_user.kode_akses = hashed_password
+        db.commit()
+
+def nim_prefix_range(prefix: str) -> tuple:
+    """
+    Batas [lower, upper) untuk NIM yang diawali prefix, supaya pencarian
+    NIM jadi range scan di unique index ix_users_nim (bukan LIKE '%..%')
+    """
+    lower = prefix.upper()
+    upper = lower[:-1] + chr(ord(lower[-1]) + 1)
+    return lower, upper
+
+def search_user_ids(term: str):
+    """
+    Select id user yang NIM-nya diawali term, atau namanya cocok dengan term
+    (prefix per kata lewat index FTS5 users_fts, fallback ke ILIKE).
+    Hasilnya dipakai sebagai subquery IN, tanpa join ke tabel peminjaman.
+    """
+    term = term.strip()
+    lower, upper = nim_prefix_range(term)
+    by_nim = select(User.id).where(User.nim >= lower, User.nim < upper)
+    
+    match = fts.build_match_query(term)
+    if match and fts.fts_available("users"):
+        matches = fts.fts_match_subquery("users")
+        by_name = select(matches.c.id).params(match=match)
+    else:
+        by_name = select(User.id).where(User.name.ilike(f"%{term}%"))
+    
+    return union(by_nim, by_name)
+
+def validate_roster_row(row: dict) -> Tuple[dict, str]:
+    """Validasi satu baris roster dengan aturan yang sama dengan /auth/register"""
+    if row.get("error"):
+        return None, row["error"]
+    
+    nim = str(row.get("nim") or "").strip()
+    name = str(row.get("name") or "").strip()
+    kode_akses = str(row.get("kode_akses") or "")
+    
+    nim_validation = validate_nim_format(nim)
+    if not nim_validation["valid"]:
+        return None, nim_validation["error"]
+    if len(name) < 2:
+        return None, "Nama minimal 2 karakter"
+    if len(kode_akses) < 6:
+        return None, "Kode akses minimal 6 karakter"
+    
+    return {"nim": nim, "name": name.title(), "kode_akses": kode_akses}, None
+
+def _insert_roster_batch(db: Session, batch: List[Tuple[int, dict]], errors: list) -> int:
+    """Cek NIM yang sudah terdaftar, hash password paralel, lalu insert satu batch"""
+    nims = [data["nim"] for _, data in batch]
+    existing = set(db.scalars(select(User.nim).where(User.nim.in_(nims))))
+    
+    new_rows = []
+    for line_num, data in batch:
+        if data["nim"] in existing:
+            errors.append({"row": line_num, "nim": data["nim"], "error": "NIM sudah terdaftar"})
+        else:
+            new_rows.append(data)
+    if not new_rows:
+        return 0
+    
+    hashes = hash_passwords_parallel([data["kode_akses"] for data in new_rows])
+    db.execute(insert(User), [
+        {"nim": data["nim"], "name": data["name"], "role": RoleEnum.mahasiswa, "kode_akses": hashed}
+        for data, hashed in zip(new_rows, hashes)
+    ])
+    db.commit()
+    return len(new_rows)
+
+def import_roster(db: Session, rows: Iterator[Tuple[int, dict]], batch_size: int = ROSTER_BATCH_SIZE) -> dict:
+    """
+    Import roster mahasiswa secara streaming: validasi per baris, lalu hash dan
+    insert per batch (satu commit per batch). Baris yang gagal tidak menghentikan
+    import, tapi dilaporkan di errors.
+    """
+    total = 0
+    created = 0
+    errors = []
+    seen = set()
+    batch = []
+    
+    for line_num, row in rows:
+        total += 1
+        data, error = validate_roster_row(row)
+        if data and data["nim"] in seen:
+            error = "NIM duplikat di dalam file"
+        if error:
+            nim = row.get("nim")
+            errors.append({"row": line_num, "nim": str(nim) if nim is not None else None, "error": error})
+            continue
+        
+        seen.add(data["nim"])
+        batch.append((line_num, data))
+        if len(batch) >= batch_size:
+            created += _insert_roster_batch(db, batch, errors)
+            batch = []
+    
+    if batch:
+        created += _insert_roster_batch(db, batch, errors)
+    
+    errors.sort(key=lambda error: error["row"])
+    return {"total": total, "created": created, "failed": len(errors), "errors": errors}
@@ -1,15 +1,71 @@
-from sqlalchemy import create_engine
+import logging
+import os
+from fastapi.concurrency import run_in_threadpool
+from sqlalchemy import create_engine, event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.schema import CreateIndex
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 
-# Database URL - gunakan SQLite untuk development
-SQLALCHEMY_DATABASE_URL = "sqlite:///./mathrent.db"
+# Pakai logger uvicorn supaya log startup tampil bersama log server
+logger = logging.getLogger("uvicorn.error")
+
+# Database URL - default SQLite untuk development, override lewat env DATABASE_URL
+SQLALCHEMY_DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./mathrent.db")
+
+# Pragma SQLite, di-set di setiap koneksi baru
+SQLITE_PRAGMAS = {
+    "journal_mode": os.getenv("SQLITE_JOURNAL_MODE", "WAL"),  # Reader tidak memblok writer
+    "synchronous": os.getenv("SQLITE_SYNCHRONOUS", "NORMAL"),  # Aman dengan WAL, fsync lebih sedikit
+    "busy_timeout": int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000")),  # Tunggu lock, bukan langsung error
+    "mmap_size": int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024))),
+    "cache_size": int(os.getenv("SQLITE_CACHE_SIZE", "-65536")),  # Negatif = KiB (64 MiB)
+}
+
+# Pool koneksi untuk PostgreSQL (dan backend server lainnya)
+POOL_SETTINGS = {
+    "pool_size": int(os.getenv("DB_POOL_SIZE", "10")),
+    "max_overflow": int(os.getenv("DB_MAX_OVERFLOW", "20")),
+    "pool_pre_ping": os.getenv("DB_POOL_PRE_PING", "true").lower() in ("1", "true", "yes"),
+    "pool_recycle": int(os.getenv("DB_POOL_RECYCLE", "1800")),
+}
+
+def set_sqlite_pragmas(dbapi_connection, connection_record):
+    """Set SQLITE_PRAGMAS di setiap koneksi baru"""
+    cursor = dbapi_connection.cursor()
+    for name, value in SQLITE_PRAGMAS.items():
+        cursor.execute(f"PRAGMA {name}={value}")
+    cursor.close()
+
+def build_engine(url: str = SQLALCHEMY_DATABASE_URL):
+    """Create engine sesuai backend: pragma untuk SQLite, pool settings untuk server DB"""
+    if url.startswith("sqlite"):
+        engine = create_engine(
+            url,
+            connect_args={"check_same_thread": False}  # Needed for SQLite
+        )
+        event.listen(engine, "connect", set_sqlite_pragmas)
+
+        # Baca ulang nilai efektif (misal journal_mode tidak bisa WAL untuk :memory:)
+        with engine.connect() as conn:
+            settings = {
+                name: conn.exec_driver_sql(f"PRAGMA {name}").scalar()
+                for name in SQLITE_PRAGMAS
+            }
+    else:
+        engine = create_engine(url, **POOL_SETTINGS)
+        settings = POOL_SETTINGS
+
+    logger.info(
+        "Database engine: %s (%s)",
+        engine.url.render_as_string(hide_password=True),
+        ", ".join(f"{name}={value}" for name, value in settings.items())
+    )
+    return engine
 
 # Create engine
-engine = create_engine(
-    SQLALCHEMY_DATABASE_URL, 
-    connect_args={"check_same_thread": False}  # Needed for SQLite
-)
+engine = build_engine()
 
 # Create SessionLocal class
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -17,6 +73,39 @@ SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 # Create Base class
 Base = declarative_base()
 
+def create_missing_indexes(metadata):
+    """
+    Buat index yang belum ada di tabel yang sudah terlanjur dibuat.
+    create_all hanya membuat index untuk tabel baru.
+    """
+    for table in metadata.sorted_tables:
+        for index in table.indexes:
+            try:
+                # IF NOT EXISTS, karena checkfirst tidak mengenali index ekspresi di SQLite
+                with engine.begin() as conn:
+                    conn.execute(CreateIndex(index, if_not_exists=True))
+            except IntegrityError:
+                # Unique index gagal karena data lama masih duplikat, jangan gagalkan startup
+                logger.warning("Index %s tidak dibuat: data %s masih duplikat", index.name, table.name)
+
+def dialect_insert(db):
+    """insert() dialect yang mendukung ON CONFLICT (SQLite/PostgreSQL)"""
+    if db.get_bind().dialect.name == "postgresql":
+        return postgresql.insert
+    return sqlite.insert
+
+async def run_with_session(fn, *args, **kwargs):
+    """
+    Jalankan fn(db, *args, **kwargs) dengan Session sync di threadpool, untuk
+    route async (cache miss, di antara await ke hashing pool). Di SQLite ini
+    jauh lebih cepat daripada AsyncSession lewat aiosqlite, jadi app tidak
+    memakai engine async.
+    """
+    def call():
+        with SessionLocal() as db:
+            return fn(db, *args, **kwargs)
+    return await run_in_threadpool(call)
+
 # Dependency untuk mendapatkan database session
 def get_db():
     """
@@ -26,4 +115,4 @@ def get_db():
     try:
         yield db
     finally:
-        db.close()
\ No newline at end of file
+        db.close()
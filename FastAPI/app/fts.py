@@ -0,0 +1,93 @@
+import re
+from typing import Dict, List, Optional
+from sqlalchemy import text, Integer, Float
+from sqlalchemy.exc import OperationalError
+
+# Tabel yang index FTS5-nya berhasil dibuat, diisi oleh setup_fts_index saat startup
+_available: Dict[str, bool] = {}
+
+def fts_table_name(table: str) -> str:
+    """Nama virtual table FTS5 untuk sebuah tabel"""
+    return f"{table}_fts"
+
+def setup_fts_index(engine, table: str, columns: List[str]) -> bool:
+    """
+    Buat virtual table FTS5 (external content) untuk table beserta trigger
+    sinkronisasinya. Tidak melakukan apa-apa di backend selain SQLite atau jika
+    SQLite tidak dikompilasi dengan FTS5, sehingga pemanggil fallback ke LIKE.
+
+    Returns:
+        bool: True jika index FTS tersedia
+    """
+    if engine.dialect.name != "sqlite":
+        _available[table] = False
+        return False
+
+    fts = fts_table_name(table)
+    cols = ", ".join(columns)
+    new_cols = ", ".join(f"new.{c}" for c in columns)
+    old_cols = ", ".join(f"old.{c}" for c in columns)
+
+    try:
+        with engine.begin() as conn:
+            exists = conn.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :name"),
+                {"name": fts}
+            ).first()
+
+            conn.execute(text(
+                f"CREATE VIRTUAL TABLE IF NOT EXISTS {fts} USING fts5("
+                f"{cols}, content='{table}', content_rowid='id', "
+                f"tokenize='unicode61 remove_diacritics 2', prefix='2 3')"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ai AFTER INSERT ON {table} BEGIN "
+                f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_cols}); END"
+            ))
+            conn.execute(text(
+                f"CREATE TRIGGER IF NOT EXISTS {fts}_ad AFTER DELETE ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); END"
+            ))
+            # Hanya saat kolom yang di-index berubah; update stok/status/password tidak menyentuh index.
+            # Trigger lama (AFTER UPDATE tanpa OF) di database yang sudah ada diganti.
+            conn.execute(text(f"DROP TRIGGER IF EXISTS {fts}_au"))
+            conn.execute(text(
+                f"CREATE TRIGGER {fts}_au AFTER UPDATE OF {cols} ON {table} BEGIN "
+                f"INSERT INTO {fts}({fts}, rowid, {cols}) VALUES ('delete', old.id, {old_cols}); "
+                f"INSERT INTO {fts}(rowid, {cols}) VALUES (new.id, {new_cols}); END"
+            ))
+
+            # Index baru: isi dari data yang sudah ada
+            if not exists:
+                conn.execute(text(f"INSERT INTO {fts}({fts}) VALUES ('rebuild')"))
+    except OperationalError:
+        # SQLite tanpa FTS5
+        _available[table] = False
+        return False
+
+    _available[table] = True
+    return True
+
+def fts_available(table: str) -> bool:
+    """Cek apakah index FTS untuk table tersedia"""
+    return _available.get(table, False)
+
+def build_match_query(term: str) -> Optional[str]:
+    """
+    Ubah input user menjadi MATCH query FTS5 dengan prefix per kata,
+    misal 'kabel hd' -> '"kabel"* "hd"*'. None jika tidak ada kata yang bisa dicari.
+    """
+    tokens = re.findall(r"\w+", term or "")
+    if not tokens:
+        return None
+    return " ".join(f'"{token}"*' for token in tokens)
+
+def fts_match_subquery(table: str):
+    """
+    Subquery (id, rank) baris table yang cocok dengan parameter :match,
+    rank adalah skor bm25 (semakin kecil semakin relevan).
+    """
+    fts = fts_table_name(table)
+    return text(
+        f"SELECT rowid AS id, bm25({fts}) AS rank FROM {fts} WHERE {fts} MATCH :match"
+    ).columns(id=Integer, rank=Float).subquery()
@@ -1,3 +1,4 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from app.routes import auth
@@ -5,16 +6,40 @@ from app.routes import barang
 from app.routes import kelas
 from app.routes import absen
 from app.routes import peminjaman
-from app.database import engine
+from app.database import engine, SessionLocal, create_missing_indexes
 from app.models import Base
+from app.crud import peminjaman_stats as crud_stats
+from app.crud import barang_availability as crud_availability
+from app.fts import setup_fts_index
+from app.auth import shutdown_import_hashing_pool
 
 # Create database tables
 Base.metadata.create_all(bind=engine)
+create_missing_indexes(Base.metadata)
+
+# Full-text index (SQLite FTS5), fallback ke LIKE jika tidak tersedia
+setup_fts_index(engine, "barang", ["nama", "lokasi", "satuan"])
+setup_fts_index(engine, "absen", ["nama_matakuliah", "dosen", "jurusan"])
+setup_fts_index(engine, "users", ["name"])
+
+# Isi rollup statistik harian dan timeline barang jika masih kosong (database lama).
+# Setelah itu keduanya di-update di transaksi yang sama dengan peminjaman; rebuild
+# penuh dijalankan manual lewat scripts/rebuild_rollups.py, bukan di setiap worker.
+with SessionLocal() as db:
+    crud_stats.ensure_daily_stats(db)
+    crud_availability.ensure_reservations(db)
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    yield
+    # Proses hashing import roster (jika pernah dipakai) ikut berhenti bersama worker
+    shutdown_import_hashing_pool()
 
 app = FastAPI(
     title="Sistem Peminjaman Depart Math",
     description="API untuk sistem peminjaman barang, kelas, dan absen",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan
 )
 
 # Add CORS middleware
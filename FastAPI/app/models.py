@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Enum, DateTime, ForeignKey, Text, Date, CheckConstraint
+from sqlalchemy import Column, Integer, String, Enum, DateTime, ForeignKey, Text, Date, CheckConstraint, Index, func
 from sqlalchemy.orm import relationship
 from app.database import Base
 import enum
@@ -52,6 +52,11 @@ class Barang(Base):
     lokasi = Column(String)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Nama ternormalisasi unik, target ON CONFLICT untuk upsert massal
+    __table_args__ = (
+        Index('ux_barang_nama_normalized', func.lower(nama), unique=True),
+    )
 
 class Kelas(Base):
     __tablename__ = "kelas"
@@ -78,6 +83,11 @@ class Absen(Base):
     status = Column(Enum(StatusBarangEnum), nullable=False, default=StatusBarangEnum.tersedia)
     created_at = Column(DateTime, default=datetime.utcnow)
     updated_at = Column(DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
+    
+    # Index untuk pengelompokan semester -> jurusan -> mata kuliah (/absen/grouped)
+    __table_args__ = (
+        Index('ix_absen_semester_jurusan_matakuliah', 'semester', 'jurusan', 'nama_matakuliah'),
+    )
 
 class Peminjaman(Base):
     __tablename__ = "peminjaman"
@@ -96,6 +106,31 @@ class Peminjaman(Base):
     user = relationship("User", foreign_keys=[user_id], back_populates="peminjaman_dibuat")
     approver = relationship("User", foreign_keys=[approved_by], back_populates="peminjaman_disetujui")
     details = relationship("PeminjamanDetail", back_populates="peminjaman", cascade="all, delete-orphan")
+    
+    # Index untuk keyset pagination (ORDER BY created_at DESC, id DESC)
+    __table_args__ = (
+        Index('ix_peminjaman_created_at_id', 'created_at', 'id'),
+    )
+
+class PeminjamanDailyStats(Base):
+    """Rollup jumlah peminjaman per tanggal dan status, di-update di transaksi yang sama"""
+    __tablename__ = "peminjaman_daily_stats"
+    
+    tanggal = Column(Date, primary_key=True)
+    status = Column(Enum(StatusPeminjamanEnum), primary_key=True)
+    jumlah = Column(Integer, nullable=False, default=0)
+
+class BarangDailyReservation(Base):
+    """
+    Timeline jumlah barang yang dipesan per tanggal peminjaman (pending dan
+    disetujui), di-update di transaksi yang sama dengan peminjaman
+    """
+    __tablename__ = "barang_daily_reservation"
+    
+    barang_id = Column(Integer, primary_key=True)
+    tanggal = Column(Date, primary_key=True)
+    status = Column(Enum(StatusPeminjamanEnum), primary_key=True)
+    jumlah = Column(Integer, nullable=False, default=0)
 
 class PeminjamanDetail(Base):
     __tablename__ = "peminjaman_detail"
@@ -117,6 +152,8 @@ class PeminjamanDetail(Base):
             "(reference_type = 'absen')",
             name='check_reference_type_constraints'
         ),
+        # Index untuk deteksi overlap booking kelas (range query per kelas)
+        Index('ix_peminjaman_detail_kelas_waktu', 'reference_type', 'reference_id', 'waktu_mulai', 'waktu_selesai'),
     )
     
     # Relationships
@@ -140,14 +177,47 @@ class PeminjamanDetail(Base):
             return db_session.query(Absen).filter(Absen.id == self.reference_id).first()
         return None
     
-    def get_referenced_item_with_type(self, db_session):
+    @staticmethod
+    def load_referenced_items(db_session, details):
+        """
+        Bulk load semua item yang direferensikan oleh sekumpulan detail
+        dengan satu query IN per reference_type
+        
+        Args:
+            db_session: SQLAlchemy database session
+            details: Iterable PeminjamanDetail (atau objek dengan reference_type/reference_id)
+            
+        Returns:
+            dict: {(reference_type, reference_id): dict kolom item}
+        """
+        ids_by_type = {}
+        for detail in details:
+            ids_by_type.setdefault(detail.reference_type, set()).add(detail.reference_id)
+        
+        referenced_items = {}
+        for reference_type, ids in ids_by_type.items():
+            model = REFERENCE_MODELS.get(reference_type)
+            if model is None:
+                continue
+            rows = db_session.query(*model.__table__.columns).filter(model.id.in_(ids)).all()
+            for row in rows:
+                referenced_items[(reference_type, row.id)] = dict(row._mapping)
+        return referenced_items
+    
+    def get_referenced_item_with_type(self, db_session, referenced_items=None):
         """
         Get referenced item with its type information
         
+        Args:
+            db_session: SQLAlchemy database session
+            referenced_items: Optional hasil load_referenced_items, agar tidak query ulang
+        
         Returns:
-            dict: {'type': str, 'item': object, 'details': dict}
+            dict: {'type': str, 'item': dict, 'details': dict}
         """
-        item = self.get_referenced_item(db_session)
+        if referenced_items is None:
+            referenced_items = PeminjamanDetail.load_referenced_items(db_session, [self])
+        item = referenced_items.get((self.reference_type, self.reference_id))
         if not item:
             return None
             
@@ -161,7 +231,7 @@ class PeminjamanDetail(Base):
         if self.reference_type == ReferenceTypeEnum.barang:
             result['details'] = {
                 'jumlah': self.jumlah,
-                'satuan': item.satuan if hasattr(item, 'satuan') else None
+                'satuan': item.get('satuan')
             }
         elif self.reference_type == ReferenceTypeEnum.kelas:
             result['details'] = {
@@ -171,8 +241,8 @@ class PeminjamanDetail(Base):
             }
         elif self.reference_type == ReferenceTypeEnum.absen:
             result['details'] = {
-                'mata_kuliah': item.nama_matakuliah if hasattr(item, 'nama_matakuliah') else None,
-                'kelas': item.kelas if hasattr(item, 'kelas') else None
+                'mata_kuliah': item.get('nama_matakuliah'),
+                'kelas': item.get('kelas')
             }
             
         return result
@@ -197,4 +267,11 @@ class PeminjamanDetail(Base):
     @property
     def is_absen(self):
         """Check if this detail is for absen"""
-        return self.reference_type == ReferenceTypeEnum.absen
\ No newline at end of file
+        return self.reference_type == ReferenceTypeEnum.absen
+
+# Mapping reference_type ke model yang direferensikan PeminjamanDetail
+REFERENCE_MODELS = {
+    ReferenceTypeEnum.barang: Barang,
+    ReferenceTypeEnum.kelas: Kelas,
+    ReferenceTypeEnum.absen: Absen,
+}
\ No newline at end of file
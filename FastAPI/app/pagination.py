@@ -0,0 +1,78 @@
+import base64
+import json
+import time
+import threading
+from datetime import datetime
+from typing import Hashable, Optional, Tuple
+from fastapi import HTTPException, status
+from sqlalchemy import and_, or_
+
+# Berapa lama total count di-cache (detik)
+COUNT_CACHE_TTL_SECONDS = 30
+
+def encode_cursor(created_at: datetime, row_id: int) -> str:
+    """Encode posisi (created_at, id) menjadi cursor opaque"""
+    raw = json.dumps([created_at.isoformat(), row_id]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> Tuple[datetime, int]:
+    """Decode cursor opaque menjadi (created_at, id)"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(padded))
+        return datetime.fromisoformat(created_at), int(row_id)
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor tidak valid"
+        )
+
+def apply_keyset(query, model, cursor: Optional[str]):
+    """
+    Terapkan keyset pagination (created_at DESC, id DESC) pada query.
+
+    Dengan cursor, query langsung melompat ke posisi setelah baris terakhir
+    halaman sebelumnya lewat index (created_at, id), tanpa OFFSET.
+    """
+    if cursor:
+        created_at, row_id = decode_cursor(cursor)
+        query = query.filter(
+            or_(
+                model.created_at < created_at,
+                and_(model.created_at == created_at, model.id < row_id)
+            )
+        )
+    return query.order_by(model.created_at.desc(), model.id.desc())
+
+def next_cursor(rows: list, per_page: int) -> Optional[str]:
+    """Cursor untuk halaman berikutnya, None jika sudah halaman terakhir"""
+    if len(rows) < per_page:
+        return None
+    last = rows[-1]
+    return encode_cursor(last.created_at, last.id)
+
+class CountCache:
+    """Cache total count per kombinasi filter dengan TTL"""
+
+    def __init__(self, ttl_seconds: float = COUNT_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: Hashable) -> Optional[int]:
+        """Ambil total dari cache, None jika belum ada atau sudah kadaluarsa"""
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[1] > time.monotonic():
+                return entry[0]
+        return None
+
+    def set(self, key: Hashable, total: int):
+        """Simpan total yang baru dihitung secara exact"""
+        with self._lock:
+            self._entries[key] = (total, time.monotonic() + self.ttl_seconds)
+
+    def clear(self):
+        """Hapus semua total yang di-cache"""
+        with self._lock:
+            self._entries.clear()
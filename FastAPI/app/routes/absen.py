@@ -1,14 +1,19 @@
 from fastapi import APIRouter, Depends, HTTPException, status, Query
 from sqlalchemy.orm import Session
+from sqlalchemy import select, or_
 from typing import List
-from app.database import get_db
+from app.database import get_db, run_with_session
 from app.models import Absen, User, RoleEnum
 from app.auth import get_current_user
-from app.schemas.absen import AbsenCreate, AbsenResponse, AbsenUpdate
+from app.schemas.absen import AbsenCreate, AbsenResponse, AbsenUpdate, AbsenSearchResponse, AbsenGroupedResponse, AbsenRow
+from app.schemas.base import row_columns
+from app.crud import absen as crud_absen
+from app import fts
+from app.cache import response_cache, render_json, render_rows, json_response
 
 router = APIRouter(prefix="/absen", tags=["Absen"])
 
-def require_staff(current_user: User = Depends(get_current_user)):
+async def require_staff(current_user: User = Depends(get_current_user)):
     """Middleware untuk memastikan user adalah staff"""
     if current_user.role != RoleEnum.staff:
         raise HTTPException(
@@ -28,29 +33,94 @@ def create_absen(
     db.add(db_absen)
     db.commit()
     db.refresh(db_absen)
+    response_cache.bump("absen")
     return db_absen
 
 @router.get("/", response_model=List[AbsenResponse])
-def get_all_absen(
+async def get_all_absen(
     page: int = Query(1, ge=1),
     per_page: int = Query(10, ge=1, le=100),
     semester: int = Query(None, description="Filter by semester"),  # Hapus Optional
     jurusan: str = Query(None, description="Filter by jurusan"),    # Hapus Optional
+    current_user: User = Depends(get_current_user)
+):
+    """Get semua data absen dengan pagination dan filter (di-cache sampai absen berubah)"""
+    def render_page(db: Session) -> bytes:
+        skip = (page - 1) * per_page
+        query = select(*row_columns(AbsenRow, Absen))
+        
+        # Apply filters - FastAPI otomatis handle None
+        if semester:
+            query = query.filter(Absen.semester == semester)
+        if jurusan:
+            query = query.filter(Absen.jurusan.ilike(f"%{jurusan}%"))
+        
+        absen_rows = db.execute(query.offset(skip).limit(per_page)).all()
+        return render_rows([dict(row._mapping) for row in absen_rows], List[AbsenRow])
+    
+    async def compute():
+        return await run_with_session(render_page)
+    
+    key = ("absen", page, per_page, semester, jurusan)
+    return json_response(await response_cache.get_or_compute(key, ["absen"], compute))
+
+@router.get("/search", response_model=AbsenSearchResponse)
+def search_absen(
+    q: str = Query(..., min_length=1, description="Cari di nama mata kuliah, dosen, dan jurusan"),
+    semester: int = Query(None, description="Filter by semester"),
+    page: int = Query(1, ge=1),
+    per_page: int = Query(10, ge=1, le=100),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user)
 ):
-    """Get semua data absen dengan pagination dan filter"""
+    """
+    Search absen lewat index FTS5 absen_fts (prefix per kata, diurutkan
+    berdasarkan relevansi), fallback ke ILIKE jika FTS tidak tersedia
+    """
     skip = (page - 1) * per_page
     query = db.query(Absen)
+    order_by = [Absen.semester, Absen.nama_matakuliah, Absen.kelas]
+    
+    match = fts.build_match_query(q)
+    if match and fts.fts_available("absen"):
+        matches = fts.fts_match_subquery("absen")
+        query = query.join(matches, matches.c.id == Absen.id).params(match=match)
+        order_by = [matches.c.rank] + order_by
+    else:
+        query = query.filter(
+            or_(
+                Absen.nama_matakuliah.ilike(f"%{q}%"),
+                Absen.dosen.ilike(f"%{q}%"),
+                Absen.jurusan.ilike(f"%{q}%")
+            )
+        )
     
-    # Apply filters - FastAPI otomatis handle None
     if semester:
         query = query.filter(Absen.semester == semester)
-    if jurusan:
-        query = query.filter(Absen.jurusan.ilike(f"%{jurusan}%"))
     
-    absen_list = query.offset(skip).limit(per_page).all()
-    return absen_list
+    total = query.count()
+    absen_list = query.order_by(*order_by).offset(skip).limit(per_page).all()
+    
+    return AbsenSearchResponse(
+        items=absen_list,
+        total=total,
+        page=page,
+        per_page=per_page,
+        total_pages=(total + per_page - 1) // per_page
+    )
+
+@router.get("/grouped", response_model=AbsenGroupedResponse)
+async def get_absen_grouped(
+    current_user: User = Depends(get_current_user)
+):
+    """
+    Semua absen dikelompokkan semester -> jurusan -> lembar, dengan jumlah
+    dan status ketersediaan per grup (di-cache sampai absen berubah)
+    """
+    async def compute():
+        return render_json(await run_with_session(crud_absen.get_absen_grouped), AbsenGroupedResponse)
+    
+    return json_response(await response_cache.get_or_compute(("absen_grouped",), ["absen"], compute))
 
 @router.get("/{absen_id}", response_model=AbsenResponse)
 def get_absen_by_id(
@@ -117,6 +187,7 @@ def update_absen(
     
     db.commit()
     db.refresh(db_absen)
+    response_cache.bump("absen")
     return db_absen
 
 @router.delete("/{absen_id}")
@@ -135,4 +206,5 @@ def delete_absen(
     
     db.delete(db_absen)
     db.commit()
+    response_cache.bump("absen")
     return {"message": "Data absen berhasil dihapus"}
\ No newline at end of file
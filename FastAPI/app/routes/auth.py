@@ -1,27 +1,51 @@
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status, UploadFile, File, Query
 from fastapi.security import OAuth2PasswordRequestForm
 from sqlalchemy.orm import Session
 from datetime import timedelta
-from app.database import get_db
+from app.database import get_db, run_with_session
 from app.models import User, RoleEnum
-from app.schemas.auth import UserRegister, UserLogin, Token, UserResponse, ChangePasswordRequest, ChangePasswordResponse 
+from app.schemas.auth import UserRegister, UserLogin, Token, UserResponse, ChangePasswordRequest, ChangePasswordResponse, NIMBulkValidateRequest, NIMBulkValidateResponse, RosterImportResponse
 from app.auth import (
     verify_password, 
     get_password_hash, 
+    get_password_hash_async,
+    verify_and_update_password,
+    hashing_pool,
+    principal_cache,
+    Principal,
     create_access_token, 
     validate_nim_format,
+    validate_nim_bulk,
     get_current_user,
+    require_staff,
     ACCESS_TOKEN_EXPIRE_MINUTES
 )
+from app.throttle import login_throttle
+from app.cache import response_cache
+from app.tabular import FileFormatEnum, detect_format, iter_records
+from app.crud import user as crud_user
 
 router = APIRouter(prefix="/auth", tags=["Authentication"])
 
+def ensure_login_allowed(nim: str, ip: str):
+    """
+    Tolak login (429) yang sedang kena backoff, sebelum query user dan bcrypt.
+    Jika lolos, percobaan ini langsung dihitung (lihat LoginThrottle.check).
+    """
+    retry_after = login_throttle.check(nim, ip)
+    if retry_after:
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Terlalu banyak percobaan login. Coba lagi dalam {retry_after} detik",
+            headers={"Retry-After": str(retry_after)},
+        )
+
 @router.post("/register", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def register_user(user_data: UserRegister, db: Session = Depends(get_db)):
+async def register_user(user_data: UserRegister):
     """Register new mahasiswa Departemen Matematika"""
     
     # Check if NIM already exists
-    existing_user = db.query(User).filter(User.nim == user_data.nim).first()
+    existing_user = await run_with_session(crud_user.get_user_by_nim, user_data.nim)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -37,19 +61,14 @@ def register_user(user_data: UserRegister, db: Session = Depends(get_db)):
         )
     
     # Create new user
-    hashed_password = get_password_hash(user_data.kode_akses)
-    db_user = User(
-        nim=user_data.nim,
-        name=user_data.name,
-        role=RoleEnum.mahasiswa,  # Default role untuk registrasi
-        kode_akses=hashed_password
+    hashed_password = await get_password_hash_async(user_data.kode_akses)
+    return await run_with_session(
+        crud_user.create_user,
+        user_data.nim,
+        user_data.name,
+        RoleEnum.mahasiswa,  # Default role untuk registrasi
+        hashed_password
     )
-    
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    
-    return db_user
 
 @router.get("/validate-nim/{nim}")
 def validate_nim_info(nim: str):
@@ -57,32 +76,50 @@ def validate_nim_info(nim: str):
     result = validate_nim_format(nim)
     return result
 
+@router.post("/validate-nim/bulk", response_model=NIMBulkValidateResponse)
+def validate_nim_bulk_info(request: NIMBulkValidateRequest, current_user: User = Depends(require_staff)):
+    """Validasi roster NIM sekaligus, dengan rekap per prodi dan angkatan (Staff only)"""
+    return validate_nim_bulk(request.nims)
+
 @router.post("/login", response_model=Token)
-def login_user(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
+async def login_user(request: Request, form_data: OAuth2PasswordRequestForm = Depends()):
     """Login mahasiswa/staff"""
     
+    # Tolak lebih dulu jika NIM/IP sedang kena backoff
+    ip = request.client.host if request.client else None
+    ensure_login_allowed(form_data.username, ip)
+    
     # Find user by NIM (using username field from OAuth2PasswordRequestForm)
-    user = db.query(User).filter(User.nim == form_data.username).first()
+    user = await run_with_session(crud_user.get_user_by_nim, form_data.username)
     
     if not user:
+        login_throttle.record_failure(form_data.username, ip)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="NIM atau kode akses salah",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
-    # Verify password
-    if not verify_password(form_data.password, user.kode_akses):
+    # Verify password (di pool bcrypt)
+    valid, new_hash = await verify_and_update_password(form_data.password, user.kode_akses)
+    if not valid:
+        login_throttle.record_failure(form_data.username, ip)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="NIM atau kode akses salah",
             headers={"WWW-Authenticate": "Bearer"},
         )
     
+    login_throttle.record_success(user.nim, ip)
+    
+    # Rehash jika BCRYPT_ROUNDS sudah diubah sejak hash ini dibuat
+    if new_hash:
+        await run_with_session(crud_user.update_password_hash, user.id, new_hash)
+    
     # Create access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.nim, "role": user.role.value}, 
+        data={"sub": user.nim, "role": user.role.value, "uid": user.id, "name": user.name}, 
         expires_delta=access_token_expires
     )
     
@@ -94,29 +131,42 @@ def login_user(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = D
     }
 
 @router.post("/login-simple", response_model=Token)
-def login_simple(user_data: UserLogin, db: Session = Depends(get_db)):
+async def login_simple(user_data: UserLogin, request: Request):
     """Alternative login endpoint with JSON body"""
     
+    # Tolak lebih dulu jika NIM/IP sedang kena backoff
+    ip = request.client.host if request.client else None
+    ensure_login_allowed(user_data.nim, ip)
+    
     # Find user by NIM
-    user = db.query(User).filter(User.nim == user_data.nim).first()
+    user = await run_with_session(crud_user.get_user_by_nim, user_data.nim)
     
     if not user:
+        login_throttle.record_failure(user_data.nim, ip)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="NIM atau kode akses salah"
         )
     
-    # Verify password
-    if not verify_password(user_data.kode_akses, user.kode_akses):
+    # Verify password (di pool bcrypt)
+    valid, new_hash = await verify_and_update_password(user_data.kode_akses, user.kode_akses)
+    if not valid:
+        login_throttle.record_failure(user_data.nim, ip)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="NIM atau kode akses salah"
         )
     
+    login_throttle.record_success(user.nim, ip)
+    
+    # Rehash jika BCRYPT_ROUNDS sudah diubah sejak hash ini dibuat
+    if new_hash:
+        await run_with_session(crud_user.update_password_hash, user.id, new_hash)
+    
     # Create access token
     access_token_expires = timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
-        data={"sub": user.nim, "role": user.role.value}, 
+        data={"sub": user.nim, "role": user.role.value, "uid": user.id, "name": user.name}, 
         expires_delta=access_token_expires
     )
     
@@ -128,8 +178,11 @@ def login_simple(user_data: UserLogin, db: Session = Depends(get_db)):
     }
 
 @router.get("/me", response_model=UserResponse)
-def get_current_user_info(current_user: User = Depends(get_current_user)):
+def get_current_user_info(current_user: Principal = Depends(get_current_user), db: Session = Depends(get_db)):
     """Get current user information"""
+    # Principal dari claims token tidak membawa created_at
+    if current_user.created_at is None:
+        return db.query(User).filter(User.id == current_user.id).first()
     return current_user
 
 @router.post("/logout")
@@ -140,11 +193,11 @@ def logout_user():
 
 
 @router.post("/create-staff", response_model=UserResponse, status_code=status.HTTP_201_CREATED)
-def create_staff_user(user_data: UserRegister, db: Session = Depends(get_db)):
+async def create_staff_user(user_data: UserRegister):
     """Create staff user - FOR TESTING ONLY"""
     
     # Cek NIM sudah ada atau belum
-    existing_user = db.query(User).filter(User.nim == user_data.nim).first()
+    existing_user = await run_with_session(crud_user.get_user_by_nim, user_data.nim)
     if existing_user:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -152,25 +205,42 @@ def create_staff_user(user_data: UserRegister, db: Session = Depends(get_db)):
         )
     
     # Hash password
-    hashed_password = get_password_hash(user_data.kode_akses)
-    db_user = User(
-        nim=user_data.nim,
-        name=user_data.name,
-        role=RoleEnum.staff,  # staff
-        kode_akses=hashed_password
+    hashed_password = await get_password_hash_async(user_data.kode_akses)
+    return await run_with_session(
+        crud_user.create_user,
+        user_data.nim,
+        user_data.name,
+        RoleEnum.staff,  # staff
+        hashed_password
     )
-    
-    db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
-    
-    return db_user
+
+@router.post("/import-roster", response_model=RosterImportResponse)
+def import_roster(
+    file: UploadFile = File(..., description="CSV (header nim,name,kode_akses) atau NDJSON"),
+    format: FileFormatEnum = Query(None, description="Format file, default dari ekstensi"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(require_staff)
+):
+    """Import akun mahasiswa massal dari roster, error dilaporkan per baris (Staff only)"""
+    fmt = format or detect_format(file.filename)
+    rows = iter_records(file.file, fmt, required=crud_user.ROSTER_FIELDS)
+    return crud_user.import_roster(db, rows)
+
+@router.get("/metrics")
+def get_auth_metrics(current_user: User = Depends(require_staff)):
+    """Metrik pool hashing bcrypt untuk monitoring (Staff only)"""
+    return {
+        "hashing": hashing_pool.stats(),
+        "principal_cache": principal_cache.stats(),
+        "login_throttle": login_throttle.stats(),
+        "response_cache": response_cache.stats()
+    }
 
 @router.put("/change-password", response_model=ChangePasswordResponse)
 def change_password(
     request: ChangePasswordRequest,
     db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user)
+    current_user: Principal = Depends(get_current_user)
 ):
     """
     Change password for authenticated user
@@ -178,9 +248,12 @@ def change_password(
     try:
         print(f"🔄 Password change attempt for user: {current_user.name} ({current_user.nim})")
         
+        # current_user adalah Principal (tanpa kode_akses), ambil row user-nya
+        user = db.query(User).filter(User.id == current_user.id).first()
+        
         # Verify current password if provided
         if request.current_password:
-            if not verify_password(request.current_password, current_user.kode_akses):
+            if not verify_password(request.current_password, user.kode_akses):
                 print(f"❌ Current password verification failed for user: {current_user.nim}")
                 raise HTTPException(
                     status_code=status.HTTP_400_BAD_REQUEST,
@@ -208,10 +281,10 @@ def change_password(
         hashed_new_password = get_password_hash(request.new_password)
         
         # Update user password in database
-        current_user.kode_akses = hashed_new_password  # Using kode_akses field like in your models
+        user.kode_akses = hashed_new_password  # Using kode_akses field like in your models
         
+        # Principal yang di-cache untuk user ini dibuang otomatis setelah commit
         db.commit()
-        db.refresh(current_user)
         
         print(f"✅ Password successfully changed for user: {current_user.nim}")
         
@@ -1,68 +1,183 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query
+from fastapi.responses import StreamingResponse
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
+from sqlalchemy.exc import IntegrityError, OperationalError, ProgrammingError
 from typing import Optional
+from datetime import date
+import io
 import math
-from app.database import get_db
+from app.database import get_db, run_with_session, SessionLocal
 from app.models import User, StatusBarangEnum
 from app.schemas.barang import (
     BarangCreate, BarangUpdate, BarangResponse, BarangListResponse,
-    StokUpdateRequest, StatusUpdateRequest
+    StokUpdateRequest, StatusUpdateRequest, BarangBulkResponse, BarangListRows
 )
 from app.crud import barang as crud_barang
 from app.auth import get_current_user, require_staff
+from app.cache import response_cache, render_rows, json_response
+from app.tabular import FileFormatEnum, MEDIA_TYPES, detect_format, iter_records, stream_records
 
 router = APIRouter(prefix="/barang", tags=["Barang"])
 
+# Pesan error database (SQLite, PostgreSQL) jika target ON CONFLICT tidak punya index unik
+MISSING_CONFLICT_INDEX_ERRORS = (
+    "ON CONFLICT clause does not match",
+    "no unique or exclusion constraint matching the ON CONFLICT",
+)
+
 @router.get("/", response_model=BarangListResponse)
-def get_barang_list(
+async def get_barang_list(
     page: int = Query(1, ge=1, description="Page number"),
     per_page: int = Query(20, ge=1, le=100, description="Items per page"),
     search: Optional[str] = Query(None, description="Search by nama, lokasi, or satuan"),
     status: Optional[StatusBarangEnum] = Query(None, description="Filter by status"),
     lokasi: Optional[str] = Query(None, description="Filter by lokasi"),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user)
 ):
-    """Get list of barang with pagination and filters"""
-    skip = (page - 1) * per_page
-    items, total = crud_barang.get_barang_list(
-        db=db, 
-        skip=skip, 
-        limit=per_page,
-        search=search,
-        status=status,
-        lokasi=lokasi
-    )
-    
-    total_pages = math.ceil(total / per_page)
+    """Get list of barang with pagination and filters (di-cache sampai barang berubah)"""
+    async def compute():
+        skip = (page - 1) * per_page
+        items, total = await run_with_session(
+            crud_barang.get_barang_list,
+            skip=skip, 
+            limit=per_page,
+            search=search,
+            status=status,
+            lokasi=lokasi
+        )
+        
+        total_pages = math.ceil(total / per_page)
+        
+        return render_rows({
+            "items": [dict(item._mapping) for item in items],
+            "total": total,
+            "page": page,
+            "per_page": per_page,
+            "total_pages": total_pages
+        }, BarangListRows)
     
-    return BarangListResponse(
-        items=items,
-        total=total,
-        page=page,
-        per_page=per_page,
-        total_pages=total_pages
-    )
+    key = ("barang", page, per_page, search, status, lokasi)
+    return json_response(await response_cache.get_or_compute(key, ["barang"], compute))
 
 @router.get("/tersedia", response_model=BarangListResponse)
-def get_barang_tersedia(
+async def get_barang_tersedia(
     page: int = Query(1, ge=1),
     per_page: int = Query(20, ge=1, le=100),
-    current_user: User = Depends(get_current_user),
-    db: Session = Depends(get_db)
+    current_user: User = Depends(get_current_user)
 ):
     """Get only available barang (for mahasiswa to see what they can borrow)"""
-    skip = (page - 1) * per_page
-    items, total = crud_barang.get_barang_tersedia(db=db, skip=skip, limit=per_page)
+    async def compute():
+        skip = (page - 1) * per_page
+        items, total = await run_with_session(crud_barang.get_barang_tersedia, skip=skip, limit=per_page)
+        
+        total_pages = math.ceil(total / per_page)
+        
+        return render_rows({
+            "items": [dict(item._mapping) for item in items],
+            "total": total,
+            "page": page,
+            "per_page": per_page,
+            "total_pages": total_pages
+        }, BarangListRows)
+    
+    key = ("barang_tersedia", page, per_page)
+    return json_response(await response_cache.get_or_compute(key, ["barang"], compute))
+
+async def read_bulk_records(request: Request, format: Optional[FileFormatEnum]):
+    """
+    Baca body /barang/bulk: JSON array, upload multipart (field "file"),
+    atau body CSV/NDJSON mentah. Return iterator (nomor_baris, record).
+    """
+    content_type = request.headers.get("content-type", "")
+    if content_type.startswith("application/json"):
+        records = await request.json()
+        if not isinstance(records, list):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="Body JSON harus berupa array barang"
+            )
+        return enumerate(records, start=1)
+    
+    if content_type.startswith("multipart/form-data"):
+        form = await request.form()
+        upload = form.get("file")
+        if upload is None or isinstance(upload, str):
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail="File tidak ditemukan di field 'file'"
+            )
+        fmt = format or detect_format(upload.filename)
+        return iter_records(upload.file, fmt, required=crud_barang.BULK_FIELDS)
     
-    total_pages = math.ceil(total / per_page)
+    fmt = format or (FileFormatEnum.ndjson if "ndjson" in content_type else FileFormatEnum.csv)
+    return iter_records(io.BytesIO(await request.body()), fmt, required=crud_barang.BULK_FIELDS)
+
+@router.post("/bulk", response_model=BarangBulkResponse)
+async def bulk_upsert_barang(
+    request: Request,
+    format: Optional[FileFormatEnum] = Query(None, description="Format CSV/NDJSON, default dari ekstensi file atau content-type"),
+    current_user: User = Depends(require_staff)
+):
+    """
+    Import/upsert barang massal dari JSON array atau CSV (kolom nama,satuan,stok,lokasi)
+    (Staff only). Semua baris divalidasi dulu; jika ada yang tidak valid tidak ada yang disimpan.
+    """
+    items = []
+    errors = []
+    for row_num, record in await read_bulk_records(request, format):
+        if not isinstance(record, dict):
+            errors.append({"row": row_num, "nama": None, "error": "Baris harus berupa object"})
+            continue
+        if record.get("error"):
+            errors.append({"row": row_num, "nama": None, "error": record["error"]})
+            continue
+        try:
+            items.append(BarangCreate(**{field: record.get(field) for field in crud_barang.BULK_FIELDS}))
+        except ValidationError as e:
+            errors.append({
+                "row": row_num,
+                "nama": record.get("nama"),
+                "error": "; ".join(error["msg"] for error in e.errors())
+            })
+    
+    if errors:
+        raise HTTPException(
+            status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            detail={"message": "Data barang tidak valid, tidak ada yang disimpan", "errors": errors}
+        )
+    if not items:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Tidak ada barang untuk diimport"
+        )
+    
+    try:
+        return await run_with_session(crud_barang.upsert_barang_bulk, items)
+    except (OperationalError, ProgrammingError) as e:
+        # ON CONFLICT butuh index unik ux_barang_nama_normalized, error lain diteruskan
+        if not any(message in str(e.orig) for message in MISSING_CONFLICT_INDEX_ERRORS):
+            raise
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Index nama barang belum tersedia, bersihkan nama barang yang duplikat terlebih dahulu"
+        )
+
+@router.get("/export")
+def export_barang(
+    format: FileFormatEnum = Query(FileFormatEnum.csv, description="Format file export"),
+    current_user: User = Depends(require_staff)
+):
+    """Export seluruh katalog barang sebagai CSV/NDJSON secara streaming (Staff only)"""
+    def generate():
+        # Session sendiri, karena dipakai selama response di-stream
+        with SessionLocal() as db:
+            yield from stream_records(crud_barang.iter_barang_export(db), format, crud_barang.EXPORT_FIELDS)
     
-    return BarangListResponse(
-        items=items,
-        total=total,
-        page=page,
-        per_page=per_page,
-        total_pages=total_pages
+    return StreamingResponse(
+        generate(),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="barang.{format.value}"'}
     )
 
 @router.get("/{barang_id}", response_model=BarangResponse)
@@ -96,7 +211,13 @@ def create_barang(
             detail=f"Barang dengan nama '{barang_data.nama}' sudah ada"
         )
     
-    return crud_barang.create_barang(db=db, barang=barang_data)
+    try:
+        return crud_barang.create_barang(db=db, barang=barang_data)
+    except IntegrityError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Barang dengan nama '{barang_data.nama}' sudah ada"
+        )
 
 @router.put("/{barang_id}", response_model=BarangResponse)
 def update_barang(
@@ -116,7 +237,13 @@ def update_barang(
                 detail=f"Barang dengan nama '{barang_update.nama}' sudah ada"
             )
     
-    updated_barang = crud_barang.update_barang(db=db, barang_id=barang_id, barang_update=barang_update)
+    try:
+        updated_barang = crud_barang.update_barang(db=db, barang_id=barang_id, barang_update=barang_update)
+    except IntegrityError:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail=f"Barang dengan nama '{barang_update.nama}' sudah ada"
+        )
     if not updated_barang:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND,
@@ -187,6 +314,7 @@ def delete_barang(
 def check_barang_availability(
     barang_id: int,
     jumlah: int = Query(1, ge=1, description="Jumlah yang ingin dipinjam"),
+    tanggal: Optional[date] = Query(None, description="Tanggal peminjaman (YYYY-MM-DD), ikut hitung yang masih pending"),
     current_user: User = Depends(get_current_user),
     db: Session = Depends(get_db)
 ):
@@ -194,6 +322,7 @@ def check_barang_availability(
     result = crud_barang.check_barang_availability(
         db=db, 
         barang_id=barang_id, 
-        jumlah_needed=jumlah
+        jumlah_needed=jumlah,
+        tanggal=tanggal
     )
     return result
\ No newline at end of file
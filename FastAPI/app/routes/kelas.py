@@ -1,43 +1,42 @@
 from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
-from app.database import get_db
+from sqlalchemy import select, func
+from app.database import get_db, run_with_session
 from app.models import Kelas
 from app.schemas.kelas import KelasCreate, KelasUpdate, KelasResponse  # ADD: Import schemas
+from app.cache import response_cache, render_json, json_response
 
 router = APIRouter(prefix="/kelas", tags=["kelas"])
 
 @router.get("/")
-def get_all_kelas(
+async def get_all_kelas(
     page: int = Query(1, ge=1),
-    per_page: int = Query(10, ge=1, le=100),
-    db: Session = Depends(get_db)
+    per_page: int = Query(10, ge=1, le=100)
 ):
-    offset = (page - 1) * per_page
-    
-    kelas_list = db.query(Kelas).offset(offset).limit(per_page).all()
-    total = db.query(Kelas).count()
-    
-    # Transform response - REMOVED status completely
-    kelas_data = []
-    for kelas in kelas_list:
-        kelas_data.append({
-            "id": kelas.id,
-            "nama_kelas": kelas.nama_kelas,
-            "gedung": kelas.gedung,
-            "lantai": kelas.lantai,
-            "kapasitas": kelas.kapasitas,
-            "fasilitas": kelas.fasilitas,
-            "created_at": kelas.created_at,
-            "updated_at": kelas.updated_at
+    def render_page(db: Session) -> bytes:
+        offset = (page - 1) * per_page
+        
+        # Proyeksi kolom -> Row ringan, langsung jadi dict (tanpa entity ORM)
+        kelas_rows = db.execute(
+            select(*Kelas.__table__.columns).offset(offset).limit(per_page)
+        ).all()
+        total = db.scalar(select(func.count()).select_from(Kelas))
+        
+        kelas_data = [dict(row._mapping) for row in kelas_rows]
+        
+        return render_json({
+            "data": kelas_data,
+            "total": total,
+            "page": page,
+            "per_page": per_page,
+            "total_pages": (total + per_page - 1) // per_page
         })
     
-    return {
-        "data": kelas_data,
-        "total": total,
-        "page": page,
-        "per_page": per_page,
-        "total_pages": (total + per_page - 1) // per_page
-    }
+    async def compute():
+        return await run_with_session(render_page)
+    
+    # Di-cache sampai ada perubahan data kelas
+    return json_response(await response_cache.get_or_compute(("kelas", page, per_page), ["kelas"], compute))
 
 @router.get("/{kelas_id}", response_model=KelasResponse)
 def get_kelas(kelas_id: int, db: Session = Depends(get_db)):
@@ -65,6 +64,7 @@ def create_kelas(
     db.add(new_kelas)
     db.commit()
     db.refresh(new_kelas)
+    response_cache.bump("kelas")
     
     return new_kelas  # Return the ORM object, Pydantic will serialize it
 
@@ -85,6 +85,7 @@ def update_kelas(
     
     db.commit()
     db.refresh(kelas)
+    response_cache.bump("kelas")
     
     return kelas  # Return the ORM object, Pydantic will serialize it
 
@@ -96,5 +97,6 @@ def delete_kelas(kelas_id: int, db: Session = Depends(get_db)):
     
     db.delete(kelas)
     db.commit()
+    response_cache.bump("kelas")
     
     return {"message": "Kelas deleted successfully"}
\ No newline at end of file
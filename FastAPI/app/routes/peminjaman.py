@@ -1,26 +1,43 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, status, Query, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy.orm import Session, aliased
+from sqlalchemy import select, func, update
 from typing import List
-from datetime import date, datetime
+from datetime import date
+import hashlib
 import secrets
 import string
-from app.database import get_db
+from app.database import get_db, run_with_session, SessionLocal
 from app.models import (
-    Peminjaman, PeminjamanDetail, User, Barang, Kelas, Absen,
+    Peminjaman, PeminjamanDetail, User, Barang, Absen,
     RoleEnum, StatusPeminjamanEnum, ReferenceTypeEnum, StatusBarangEnum
 )
 from app.auth import get_current_user
+from app.pagination import CountCache, apply_keyset, next_cursor
+from app.crud import peminjaman_stats as crud_stats
+from app.crud import kelas_booking as crud_kelas_booking
+from app.crud import user as crud_user
+from app.crud import peminjaman_export as crud_export
+from app.crud import catalog as crud_catalog
+from app.crud import barang as crud_barang
+from app.crud import barang_availability as crud_availability
+from app.tabular import FileFormatEnum, MEDIA_TYPES, stream_records
+from app.cache import response_cache, render_json, render_rows, json_response
 from app.schemas.peminjaman import (
     PeminjamanCreate, PeminjamanResponse, PeminjamanUpdate,
     PeminjamanApprovalRequest, PeminjamanWithItemsResponse,
-    PeminjamanDetailCreate, 
+    PeminjamanDetailCreate, PeminjamanStaffResponse,
+    PeminjamanRow, PeminjamanStaffRow,
 )
 
 router = APIRouter(prefix="/peminjaman", tags=["Peminjaman"])
 
+# Cache total count untuk pagination history, di-clear setiap ada perubahan peminjaman
+history_count_cache = CountCache()
+
 # Tambahkan ke bagian atas file (setelah imports yang sudah ada)
 
-def require_mahasiswa(current_user: User = Depends(get_current_user)):
+async def require_mahasiswa(current_user: User = Depends(get_current_user)):
     """Middleware untuk memastikan user adalah mahasiswa"""
     if current_user.role != RoleEnum.mahasiswa:
         raise HTTPException(
@@ -29,9 +46,75 @@ def require_mahasiswa(current_user: User = Depends(get_current_user)):
         )
     return current_user
 
-def validate_peminjaman_items(details: List[PeminjamanDetailCreate], db: Session):
-    """Validasi items yang akan dipinjam"""
+def select_peminjaman_list():
+    """
+    Statement select dasar untuk semua listing Peminjaman.
+    
+    Proyeksi kolom Core: kolom peminjaman plus nama/NIM peminjam dan nama
+    approver dari outer join, hasilnya Row ringan tanpa identity map dan
+    instrumentasi atribut. Details diambil dengan load_peminjaman_details,
+    sehingga satu halaman selalu butuh 2 query berapapun jumlah barisnya.
+    """
+    borrower, approver = aliased(User), aliased(User)
+    return (
+        select(
+            *Peminjaman.__table__.columns,
+            borrower.name.label("user_name"),
+            borrower.nim.label("user_nim"),
+            approver.name.label("approver_name"),
+        )
+        .outerjoin(borrower, borrower.id == Peminjaman.user_id)
+        .outerjoin(approver, approver.id == Peminjaman.approved_by)
+    )
+
+def load_peminjaman_details(db: Session, peminjaman_rows) -> dict:
+    """
+    Details (Row proyeksi kolom) untuk satu halaman listing dengan satu query IN,
+    dikelompokkan per peminjaman_id dan diurutkan per id.
+    """
+    details = {row.id: [] for row in peminjaman_rows}
+    if details:
+        rows = db.execute(
+            select(*PeminjamanDetail.__table__.columns)
+            .where(PeminjamanDetail.peminjaman_id.in_(list(details)))
+            .order_by(PeminjamanDetail.id)
+        )
+        for detail in rows:
+            details[detail.peminjaman_id].append(detail)
+    return details
+
+def peminjaman_row_dicts(peminjaman_rows, details: dict, expand_detail=None) -> list:
+    """
+    Baris listing sebagai dict PeminjamanRow untuk render_rows, details dari
+    load_peminjaman_details. Dengan expand_detail (misalnya expand_staff_detail)
+    setiap detail di-expand dan hasilnya berbentuk PeminjamanStaffRow.
+    """
+    expand_detail = expand_detail or (lambda detail: dict(detail._mapping))
+    return [
+        {**row._mapping, "details": [expand_detail(detail) for detail in details[row.id]]}
+        for row in peminjaman_rows
+    ]
+
+def build_peminjaman_response(peminjaman: Peminjaman, user=None) -> PeminjamanResponse:
+    """
+    PeminjamanResponse (tervalidasi) untuk satu peminjaman beserta details-nya.
+    `user` menggantikan relasi peminjaman.user (misalnya current_user).
+    """
+    user = user or peminjaman.user
+    data = PeminjamanResponse.from_orm(peminjaman)
+    data.user_name = user.name if user else None
+    data.user_nim = user.nim if user else None
+    data.approver_name = peminjaman.approver.name if peminjaman.approver else None
+    return data
+
+def validate_peminjaman_items(details: List[PeminjamanDetailCreate], db: Session, tanggal: date = None):
+    """
+    Validasi items yang akan dipinjam. Jika tanggal diisi, stok barang
+    dikurangi jumlah yang masih pending untuk tanggal tersebut. Barang yang
+    sama di beberapa item dicek terhadap total jumlahnya.
+    """
     errors = []
+    barang_items = {}  # barang_id -> (index item pertama, barang)
     
     for i, detail in enumerate(details):
         # Validasi berdasarkan reference_type
@@ -47,8 +130,8 @@ def validate_peminjaman_items(details: List[PeminjamanDetailCreate], db: Session
                 errors.append(f"Item {i+1}: Barang dengan ID {detail.reference_id} tidak ditemukan")
             elif barang.status != StatusBarangEnum.tersedia:
                 errors.append(f"Item {i+1}: Barang '{barang.nama}' tidak tersedia")
-            elif barang.stok < detail.jumlah:
-                errors.append(f"Item {i+1}: Stok barang '{barang.nama}' tidak mencukupi (tersedia: {barang.stok})")
+            elif detail.jumlah:
+                barang_items.setdefault(barang.id, (i, barang))
                 
         elif detail.reference_type == ReferenceTypeEnum.kelas:
             if not detail.waktu_mulai or not detail.waktu_selesai:
@@ -67,6 +150,39 @@ def validate_peminjaman_items(details: List[PeminjamanDetailCreate], db: Session
             if not absen:
                 errors.append(f"Item {i+1}: Data absen dengan ID {detail.reference_id} tidak ditemukan")
     
+    # Cek stok per barang terhadap total jumlah di semua item
+    jumlah_per_barang = crud_availability.barang_quantities(details)
+    pending_per_barang = crud_availability.get_pending(db, list(barang_items), tanggal) if tanggal else {}
+    for barang_id, (i, barang) in barang_items.items():
+        jumlah = jumlah_per_barang[barang_id]
+        pending = pending_per_barang.get(barang_id, 0)
+        sisa = max(0, barang.stok - pending)
+        if sisa < jumlah:
+            errors.append(
+                f"Item {i+1}: Stok barang '{barang.nama}' tidak mencukupi (dibutuhkan: {jumlah}, tersedia: {sisa}"
+                + (f", {pending} menunggu persetujuan pada {tanggal})" if pending else ")")
+            )
+    
+    # Cek bentrok dengan booking kelas yang sudah disetujui (satu range query)
+    kelas_details = [
+        (i, detail) for i, detail in enumerate(details)
+        if detail.reference_type == ReferenceTypeEnum.kelas
+        and detail.waktu_mulai and detail.waktu_selesai
+        and detail.waktu_mulai < detail.waktu_selesai
+    ]
+    conflicts = crud_kelas_booking.find_conflicts(db, [detail for _, detail in kelas_details])
+    for i, detail in kelas_details:
+        for conflict in conflicts:
+            if crud_kelas_booking.overlaps(conflict, detail):
+                errors.append(f"Item {i+1}: {crud_kelas_booking.format_conflict(conflict)}")
+    
+    # Cek bentrok antar item kelas di dalam request ini sendiri
+    for i, j in crud_kelas_booking.find_internal_conflicts([detail for _, detail in kelas_details]):
+        errors.append(
+            f"Item {kelas_details[j][0]+1}: Bentrok dengan item {kelas_details[i][0]+1} "
+            f"(kelas yang sama pada waktu yang overlap)"
+        )
+    
     return errors
 
 # === ENDPOINTS UNTUK MAHASISWA ===
@@ -80,7 +196,7 @@ def create_peminjaman_mahasiswa(
     """Create peminjaman baru (Mahasiswa only)"""
     
     # Validasi items
-    validation_errors = validate_peminjaman_items(peminjaman_data.details, db)
+    validation_errors = validate_peminjaman_items(peminjaman_data.details, db, peminjaman_data.tanggal_peminjaman)
     if validation_errors:
         raise HTTPException(
             status_code=status.HTTP_400_BAD_REQUEST,
@@ -112,16 +228,17 @@ def create_peminjaman_mahasiswa(
         )
         db.add(db_detail)
     
+    crud_stats.record_status_change(db, db_peminjaman.tanggal_peminjaman, None, StatusPeminjamanEnum.pending)
+    crud_availability.record_status_change(
+        db, peminjaman_data.details, db_peminjaman.tanggal_peminjaman, None, StatusPeminjamanEnum.pending
+    )
+    
     db.commit()
     db.refresh(db_peminjaman)
+    history_count_cache.clear()
     
     # Build response
-    data = PeminjamanResponse.from_orm(db_peminjaman)
-    data.user_name = current_user.name
-    data.user_nim = current_user.nim
-    data.details = [detail for detail in db_peminjaman.details]
-    
-    return data
+    return build_peminjaman_response(db_peminjaman, current_user)
 
 @router.get("/my", response_model=List[PeminjamanResponse])
 def get_my_peminjaman(
@@ -133,24 +250,17 @@ def get_my_peminjaman(
 ):
     """Get peminjaman milik mahasiswa yang sedang login"""
     skip = (page - 1) * per_page
-    query = db.query(Peminjaman).filter(Peminjaman.user_id == current_user.id)
+    query = select_peminjaman_list().filter(Peminjaman.user_id == current_user.id)
     
     if status:
         query = query.filter(Peminjaman.status == status)
     
-    peminjaman_list = query.order_by(Peminjaman.created_at.desc()).offset(skip).limit(per_page).all()
-    
-    result = []
-    for p in peminjaman_list:
-        data = PeminjamanResponse.from_orm(p)
-        data.user_name = current_user.name
-        data.user_nim = current_user.nim
-        if p.approver:
-            data.approver_name = p.approver.name
-        data.details = [detail for detail in p.details]
-        result.append(data)
+    peminjaman_rows = db.execute(
+        query.order_by(Peminjaman.created_at.desc()).offset(skip).limit(per_page)
+    ).all()
+    details = load_peminjaman_details(db, peminjaman_rows)
     
-    return result
+    return json_response(render_rows(peminjaman_row_dicts(peminjaman_rows, details), List[PeminjamanRow]))
 
 @router.put("/my/{peminjaman_id}", response_model=PeminjamanResponse)
 def update_my_peminjaman(
@@ -177,21 +287,36 @@ def update_my_peminjaman(
             detail="Hanya peminjaman dengan status pending yang bisa diupdate"
         )
     
+    # Pindah tanggal: pesanan barang harus muat di tanggal baru
+    old_tanggal = peminjaman.tanggal_peminjaman
+    new_tanggal = peminjaman_data.tanggal_peminjaman
+    if new_tanggal and new_tanggal != old_tanggal:
+        barang_details = [d for d in peminjaman.details if d.reference_type == ReferenceTypeEnum.barang]
+        validation_errors = validate_peminjaman_items(barang_details, db, new_tanggal)
+        if validation_errors:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={
+                    "message": "Validasi gagal",
+                    "errors": validation_errors
+                }
+            )
+    
     # Update fields
     for field, value in peminjaman_data.dict(exclude_unset=True).items():
         if field != "status":  # Mahasiswa tidak bisa ubah status
             setattr(peminjaman, field, value)
+    crud_stats.record_tanggal_change(db, old_tanggal, peminjaman.tanggal_peminjaman, peminjaman.status)
+    crud_availability.record_tanggal_change(
+        db, peminjaman.details, old_tanggal, peminjaman.tanggal_peminjaman, peminjaman.status
+    )
     
     db.commit()
     db.refresh(peminjaman)
+    history_count_cache.clear()
     
     # Build response
-    data = PeminjamanResponse.from_orm(peminjaman)
-    data.user_name = current_user.name
-    data.user_nim = current_user.nim
-    data.details = [detail for detail in peminjaman.details]
-    
-    return data
+    return build_peminjaman_response(peminjaman, current_user)
 
 @router.delete("/my/{peminjaman_id}")
 def delete_my_peminjaman(
@@ -217,8 +342,11 @@ def delete_my_peminjaman(
             detail="Hanya peminjaman dengan status pending yang bisa dihapus"
         )
     
+    crud_stats.record_status_change(db, peminjaman.tanggal_peminjaman, peminjaman.status, None)
+    crud_availability.record_status_change(db, peminjaman.details, peminjaman.tanggal_peminjaman, peminjaman.status, None)
     db.delete(peminjaman)
     db.commit()
+    history_count_cache.clear()
     return {"message": "Peminjaman berhasil dihapus"}
 
 # === ENDPOINTS UNTUK MELIHAT ITEM YANG TERSEDIA ===
@@ -233,34 +361,7 @@ def get_kelas_schedule(
     current_user: User = Depends(get_current_user)
 ):
     """Get jadwal booking kelas untuk tanggal tertentu"""
-    
-    # Query peminjaman yang aktif (disetujui) untuk kelas dan tanggal tertentu
-    peminjaman_list = db.query(Peminjaman).filter(
-        Peminjaman.tanggal_peminjaman == tanggal,
-        Peminjaman.status == StatusPeminjamanEnum.disetujui
-    ).all()
-    
-    # Filter yang punya detail kelas sesuai kelas_id
-    jadwal_booking = []
-    
-    for peminjaman in peminjaman_list:
-        for detail in peminjaman.details:
-            if (detail.reference_type == ReferenceTypeEnum.kelas and 
-                detail.reference_id == kelas_id and
-                detail.waktu_mulai and detail.waktu_selesai):
-                
-                jadwal_booking.append({
-                    "peminjaman_id": peminjaman.id,
-                    "user_name": peminjaman.user.name if peminjaman.user else "Unknown",
-                    "user_nim": peminjaman.user.nim if peminjaman.user else "Unknown",
-                    "waktu_mulai": detail.waktu_mulai.strftime("%H:%M"),
-                    "waktu_selesai": detail.waktu_selesai.strftime("%H:%M"),
-                    "status": peminjaman.status.value,
-                    "tanggal_peminjaman": peminjaman.tanggal_peminjaman.isoformat()
-                })
-    
-    # Sort by waktu_mulai
-    jadwal_booking.sort(key=lambda x: x["waktu_mulai"])
+    jadwal_booking = crud_kelas_booking.get_schedule(db, kelas_id, tanggal)
     
     return {
         "kelas_id": kelas_id,
@@ -270,59 +371,38 @@ def get_kelas_schedule(
     }
 
 @router.get("/available-items", response_model=dict)
-def get_available_items(
-    db: Session = Depends(get_db),
+async def get_available_items(
+    request: Request,
+    barang_page: int = Query(1, ge=1),
+    kelas_page: int = Query(1, ge=1),
+    absen_page: int = Query(1, ge=1),
+    per_page: int = Query(100, ge=1, le=500, description="Jumlah item per section"),
     current_user: User = Depends(get_current_user)
 ):
-    """Get semua item yang tersedia untuk dipinjam"""
-    
-    # Barang tersedia
-    barang_list = db.query(Barang).filter(
-        Barang.status == StatusBarangEnum.tersedia,
-        Barang.stok > 0
-    ).all()
-    
-    # Kelas tersedia
-    kelas_list = db.query(Kelas).filter(
-        Kelas.status == StatusBarangEnum.tersedia
-    ).all()
-    
-    # Absen (semua tersedia)
-    absen_list = db.query(Absen).all()
-    
-    return {
-        "barang": [
-            {
-                "id": b.id,
-                "nama": b.nama,
-                "satuan": b.satuan,
-                "stok": b.stok,
-                "lokasi": b.lokasi
-            } for b in barang_list
-        ],
-        "kelas": [
-            {
-                "id": k.id,
-                "nama_kelas": k.nama_kelas,
-                "gedung": k.gedung,
-                "lantai": k.lantai,
-                "kapasitas": k.kapasitas,
-                "fasilitas": k.fasilitas
-            } for k in kelas_list
-        ],
-        "absen": [
-            {
-                "id": a.id,
-                "nama_matakuliah": a.nama_matakuliah,
-                "kelas": a.kelas,
-                "semester": a.semester,
-                "dosen": a.dosen,
-                "jurusan": a.jurusan
-            } for a in absen_list
-        ]
-    }
+    """
+    Katalog untuk dashboard mahasiswa: barang tersedia, kelas, dan absen yang
+    dikelompokkan per semester/jurusan (dipaginasi per section), dalam satu
+    response dengan satu ETag. Di-cache sampai salah satu tabel berubah;
+    If-None-Match yang cocok dijawab 304.
+    """
+    pages = {"barang": barang_page, "kelas": kelas_page, "absen": absen_page}
+    
+    async def compute():
+        return render_json(await run_with_session(crud_catalog.get_catalog, pages, per_page))
+    
+    key = ("catalog", barang_page, kelas_page, absen_page, per_page)
+    body = await response_cache.get_or_compute(key, crud_catalog.CATALOG_TABLES, compute)
+    
+    etag = f'"{hashlib.sha1(body).hexdigest()[:20]}"'
+    headers = {"ETag": etag, "Cache-Control": "private, no-cache"}
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    
+    response = json_response(body)
+    response.headers.update(headers)
+    return response
 
-def require_staff(current_user: User = Depends(get_current_user)):
+async def require_staff(current_user: User = Depends(get_current_user)):
     """Middleware untuk memastikan user adalah staff"""
     if current_user.role != RoleEnum.staff:
         raise HTTPException(
@@ -335,29 +415,55 @@ def generate_verification_code():
     """Generate random verification code untuk peminjaman"""
     return ''.join(secrets.choice(string.ascii_uppercase + string.digits) for _ in range(8))
 
-def expand_peminjaman_items(peminjaman: Peminjaman, db: Session):
+def expand_peminjaman_items(peminjaman: Peminjaman, db: Session, referenced_items: dict = None):
     """Expand peminjaman details dengan info item lengkap"""
+    if referenced_items is None:
+        referenced_items = PeminjamanDetail.load_referenced_items(db, peminjaman.details)
+    
     items = []
     for detail in peminjaman.details:
-        item_info = detail.get_referenced_item_with_type(db)
+        item_info = detail.get_referenced_item_with_type(db, referenced_items)
         if item_info:
             items.append({
                 "detail_id": detail.id,
                 "type": item_info['type'],
                 "item": {
-                    "id": item_info['item'].id,
-                    "name": getattr(item_info['item'], 'nama', None) or 
-                           getattr(item_info['item'], 'nama_kelas', None) or
-                           getattr(item_info['item'], 'nama_matakuliah', None),
-                    "details": item_info['item'].__dict__ if hasattr(item_info['item'], '__dict__') else {}
+                    "id": item_info['item']['id'],
+                    "name": item_info['item'].get('nama') or 
+                           item_info['item'].get('nama_kelas') or
+                           item_info['item'].get('nama_matakuliah'),
+                    "details": item_info['item']
                 },
                 "peminjaman_details": item_info['details']
             })
     return items
 
+# Field item yang ditampilkan di dashboard staff untuk setiap reference_type
+STAFF_ITEM_FIELDS = {
+    ReferenceTypeEnum.barang: ("id", "nama", "stok", "satuan", "lokasi"),
+    ReferenceTypeEnum.kelas: ("id", "nama_kelas", "gedung", "lantai", "kapasitas"),
+    ReferenceTypeEnum.absen: ("id", "nama_matakuliah", "kelas", "dosen", "jurusan", "semester"),
+}
+
+def expand_staff_detail(detail: PeminjamanDetail, referenced_items: dict):
+    """Expand satu detail dengan data item yang sudah di-load oleh load_referenced_items"""
+    detail_dict = {
+        "id": detail.id,
+        "reference_type": detail.reference_type,
+        "reference_id": detail.reference_id,
+        "jumlah": detail.jumlah,
+        "waktu_mulai": detail.waktu_mulai,
+        "waktu_selesai": detail.waktu_selesai,
+    }
+    
+    item = referenced_items.get((detail.reference_type, detail.reference_id))
+    if item:
+        detail_dict[detail.reference_type.value] = {
+            field: item[field] for field in STAFF_ITEM_FIELDS[detail.reference_type]
+        }
+    
+    return detail_dict
 
-# Tambahkan import yang diperlukan di atas
-from datetime import date, datetime, timedelta
 
 # Tambahkan setelah endpoint yang sudah ada, sebelum bagian terakhir
 
@@ -365,7 +471,7 @@ from datetime import date, datetime, timedelta
 # ================= ENDPOINTS KHUSUS UNTUK STAFF DASHBOARD ===========
 # =====================================================================
 
-@router.get("/staff/today", response_model=List[PeminjamanResponse])
+@router.get("/staff/today", response_model=List[PeminjamanStaffResponse])
 def get_today_peminjaman_staff(
     db: Session = Depends(get_db),
     current_user: User = Depends(require_staff)
@@ -373,71 +479,37 @@ def get_today_peminjaman_staff(
     """Get peminjaman hari ini untuk staff dashboard"""
     today = date.today()
     
-    peminjaman_list = db.query(Peminjaman).filter(
-        Peminjaman.tanggal_peminjaman == today
-    ).order_by(Peminjaman.created_at.desc()).all()
-    
-    # Build response dengan data lengkap
-    result = []
-    for p in peminjaman_list:
-        data = PeminjamanResponse.from_orm(p)
-        if p.user:
-            data.user_name = p.user.name
-            data.user_nim = p.user.nim
-        if p.approver:
-            data.approver_name = p.approver.name
-        
-        # Expand details dengan item info
-        expanded_details = []
-        for detail in p.details:
-            detail_dict = {
-                "id": detail.id,
-                "reference_type": detail.reference_type,
-                "reference_id": detail.reference_id,
-                "jumlah": detail.jumlah,
-                "waktu_mulai": detail.waktu_mulai,
-                "waktu_selesai": detail.waktu_selesai,
-            }
-            
-            # Add referenced item data
-            if detail.reference_type == ReferenceTypeEnum.barang:
-                barang = db.query(Barang).filter(Barang.id == detail.reference_id).first()
-                if barang:
-                    detail_dict["barang"] = {
-                        "id": barang.id,
-                        "nama": barang.nama,
-                        "stok": barang.stok,
-                        "satuan": barang.satuan,
-                        "lokasi": barang.lokasi
-                    }
-            elif detail.reference_type == ReferenceTypeEnum.kelas:
-                kelas = db.query(Kelas).filter(Kelas.id == detail.reference_id).first()
-                if kelas:
-                    detail_dict["kelas"] = {
-                        "id": kelas.id,
-                        "nama_kelas": kelas.nama_kelas,
-                        "gedung": kelas.gedung,
-                        "lantai": kelas.lantai,
-                        "kapasitas": kelas.kapasitas
-                    }
-            elif detail.reference_type == ReferenceTypeEnum.absen:
-                absen = db.query(Absen).filter(Absen.id == detail.reference_id).first()
-                if absen:
-                    detail_dict["absen"] = {
-                        "id": absen.id,
-                        "nama_matakuliah": absen.nama_matakuliah,
-                        "kelas": absen.kelas,
-                        "dosen": absen.dosen,
-                        "jurusan": absen.jurusan,
-                        "semester": absen.semester
-                    }
-            
-            expanded_details.append(detail_dict)
-        
-        data.details = expanded_details
-        result.append(data)
+    peminjaman_rows = db.execute(
+        select_peminjaman_list().filter(
+            Peminjaman.tanggal_peminjaman == today
+        ).order_by(Peminjaman.created_at.desc())
+    ).all()
+    details = load_peminjaman_details(db, peminjaman_rows)
+    
+    # Load semua item referensi sekaligus (satu query per reference_type)
+    referenced_items = PeminjamanDetail.load_referenced_items(
+        db, [detail for rows in details.values() for detail in rows]
+    )
     
-    return result
+    # Build response dengan data lengkap, details di-expand dengan item info
+    return json_response(render_rows(
+        peminjaman_row_dicts(peminjaman_rows, details, lambda detail: expand_staff_detail(detail, referenced_items)),
+        List[PeminjamanStaffRow]
+    ))
+
+def history_filters(status, tanggal_mulai, tanggal_akhir, search) -> list:
+    """Filter riwayat peminjaman, dipakai bersama oleh history dan export"""
+    filters = []
+    if status:
+        filters.append(Peminjaman.status == status)
+    if tanggal_mulai:
+        filters.append(Peminjaman.tanggal_peminjaman >= tanggal_mulai)
+    if tanggal_akhir:
+        filters.append(Peminjaman.tanggal_peminjaman <= tanggal_akhir)
+    if search and search.strip():
+        # Prefix NIM (range scan index) atau nama (FTS), tanpa join ke User
+        filters.append(Peminjaman.user_id.in_(crud_user.search_user_ids(search)))
+    return filters
 
 @router.get("/staff/history", response_model=dict)
 def get_history_peminjaman_staff(
@@ -446,166 +518,99 @@ def get_history_peminjaman_staff(
     status: StatusPeminjamanEnum = Query(None, description="Filter by status"),
     tanggal_mulai: date = Query(None, description="Filter from date"),
     tanggal_akhir: date = Query(None, description="Filter to date"),
-    search: str = Query(None, description="Search by user name or nim"),
+    search: str = Query(None, description="Search by user name or nim prefix"),
+    cursor: str = Query(None, description="Cursor dari next_cursor halaman sebelumnya (menggantikan page)"),
     db: Session = Depends(get_db),
     current_user: User = Depends(require_staff)
 ):
-    """Get riwayat peminjaman untuk staff dengan pagination dan filter"""
-    skip = (page - 1) * per_page
-    query = db.query(Peminjaman)
+    """
+    Get riwayat peminjaman untuk staff dengan pagination dan filter.
     
-    # Apply filters
-    if status:
-        query = query.filter(Peminjaman.status == status)
-    if tanggal_mulai:
-        query = query.filter(Peminjaman.tanggal_peminjaman >= tanggal_mulai)
-    if tanggal_akhir:
-        query = query.filter(Peminjaman.tanggal_peminjaman <= tanggal_akhir)
-    if search:
-        # Join dengan User untuk search by name/nim
-        query = query.join(User).filter(
-            (User.name.ilike(f"%{search}%")) | 
-            (User.nim.ilike(f"%{search}%"))
-        )
+    Dengan cursor, halaman diambil lewat keyset (created_at, id) tanpa query
+    count: total hanya diisi dari cache (null jika belum ada), sehingga
+    halaman dalam sama murahnya dengan halaman 1.
+    """
+    skip = (page - 1) * per_page
+    filters = history_filters(status, tanggal_mulai, tanggal_akhir, search)
     
-    # Get total count
-    total = query.count()
+    # Get total count (exact di mode page, dari cache saja di mode cursor)
+    count_key = (status, tanggal_mulai, tanggal_akhir, search)
+    if cursor:
+        total = history_count_cache.get(count_key)
+    else:
+        total = db.scalar(select(func.count(Peminjaman.id)).filter(*filters))
+        history_count_cache.set(count_key, total)
     
     # Get paginated results
-    peminjaman_list = query.order_by(Peminjaman.created_at.desc()).offset(skip).limit(per_page).all()
+    query = apply_keyset(select_peminjaman_list().filter(*filters), Peminjaman, cursor)
+    if not cursor:
+        query = query.offset(skip)
+    peminjaman_rows = db.execute(query.limit(per_page)).all()
+    details = load_peminjaman_details(db, peminjaman_rows)
+    
+    # Load semua item referensi sekaligus (satu query per reference_type)
+    referenced_items = PeminjamanDetail.load_referenced_items(
+        db, [detail for rows in details.values() for detail in rows]
+    )
     
-    # Build response
-    items = []
-    for p in peminjaman_list:
-        data = PeminjamanResponse.from_orm(p)
-        if p.user:
-            data.user_name = p.user.name
-            data.user_nim = p.user.nim
-        if p.approver:
-            data.approver_name = p.approver.name
-        
-        # Expand details dengan item info (sama seperti today endpoint)
-        expanded_details = []
-        for detail in p.details:
-            detail_dict = {
-                "id": detail.id,
-                "reference_type": detail.reference_type,
-                "reference_id": detail.reference_id,
-                "jumlah": detail.jumlah,
-                "waktu_mulai": detail.waktu_mulai,
-                "waktu_selesai": detail.waktu_selesai,
-            }
-            
-            if detail.reference_type == ReferenceTypeEnum.barang:
-                barang = db.query(Barang).filter(Barang.id == detail.reference_id).first()
-                if barang:
-                    detail_dict["barang"] = {
-                        "id": barang.id,
-                        "nama": barang.nama,
-                        "stok": barang.stok,
-                        "satuan": barang.satuan,
-                        "lokasi": barang.lokasi
-                    }
-            elif detail.reference_type == ReferenceTypeEnum.kelas:
-                kelas = db.query(Kelas).filter(Kelas.id == detail.reference_id).first()
-                if kelas:
-                    detail_dict["kelas"] = {
-                        "id": kelas.id,
-                        "nama_kelas": kelas.nama_kelas,
-                        "gedung": kelas.gedung,
-                        "lantai": kelas.lantai,
-                        "kapasitas": kelas.kapasitas
-                    }
-            elif detail.reference_type == ReferenceTypeEnum.absen:
-                absen = db.query(Absen).filter(Absen.id == detail.reference_id).first()
-                if absen:
-                    detail_dict["absen"] = {
-                        "id": absen.id,
-                        "nama_matakuliah": absen.nama_matakuliah,
-                        "kelas": absen.kelas,
-                        "dosen": absen.dosen,
-                        "jurusan": absen.jurusan,
-                        "semester": absen.semester
-                    }
-            
-            expanded_details.append(detail_dict)
-        
-        data.details = expanded_details
-        items.append(data)
+    # Build response, details di-expand dengan item info (sama seperti today endpoint)
+    items = peminjaman_row_dicts(
+        peminjaman_rows, details, lambda detail: expand_staff_detail(detail, referenced_items)
+    )
     
-    return {
+    return json_response(render_json({
         "status": "success",
         "message": "History retrieved successfully",
         "data": {
             "items": items,
             "pagination": {
-                "current_page": page,
+                # Mode cursor tidak tahu posisi absolut halaman
+                "current_page": None if cursor else page,
                 "per_page": per_page,
                 "total": total,
-                "last_page": (total + per_page - 1) // per_page,
-                "from": skip + 1 if items else 0,
-                "to": skip + len(items)
+                "last_page": None if cursor else (total + per_page - 1) // per_page,
+                "from": None if cursor else (skip + 1 if items else 0),
+                "to": None if cursor else skip + len(items),
+                "next_cursor": next_cursor(peminjaman_rows, per_page)
             }
         }
-    }
+    }))
+
+@router.get("/staff/export")
+def export_history_peminjaman_staff(
+    format: FileFormatEnum = Query(FileFormatEnum.csv, description="Format file export"),
+    status: StatusPeminjamanEnum = Query(None, description="Filter by status"),
+    tanggal_mulai: date = Query(None, description="Filter from date"),
+    tanggal_akhir: date = Query(None, description="Filter to date"),
+    search: str = Query(None, description="Search by user name or nim prefix"),
+    current_user: User = Depends(require_staff)
+):
+    """
+    Export riwayat peminjaman (filter sama dengan /staff/history) sebagai
+    CSV/NDJSON secara streaming, satu baris per detail peminjaman.
+    """
+    filters = history_filters(status, tanggal_mulai, tanggal_akhir, search)
+    
+    def generate():
+        # Session sendiri, karena dipakai selama response di-stream
+        with SessionLocal() as db:
+            yield from stream_records(
+                crud_export.iter_peminjaman_export(db, filters), format, crud_export.EXPORT_FIELDS
+            )
+    
+    return StreamingResponse(
+        generate(),
+        media_type=MEDIA_TYPES[format],
+        headers={"Content-Disposition": f'attachment; filename="peminjaman.{format.value}"'}
+    )
 
 @router.get("/staff/statistics", response_model=dict)
 def get_peminjaman_statistics(
     db: Session = Depends(get_db),
     current_user: User = Depends(require_staff)
 ):
-    """Get statistik peminjaman untuk staff dashboard"""
-    today = date.today()
-    week_ago = today - timedelta(days=7)
-    month_ago = today - timedelta(days=30)
-    
-    # Today stats
-    today_total = db.query(Peminjaman).filter(
-        Peminjaman.tanggal_peminjaman == today
-    ).count()
-    
-    today_pending = db.query(Peminjaman).filter(
-        Peminjaman.tanggal_peminjaman == today,
-        Peminjaman.status == StatusPeminjamanEnum.pending
-    ).count()
-    
-    today_approved = db.query(Peminjaman).filter(
-        Peminjaman.tanggal_peminjaman == today,
-        Peminjaman.status == StatusPeminjamanEnum.disetujui
-    ).count()
-    
-    # Weekly stats
-    week_total = db.query(Peminjaman).filter(
-        Peminjaman.tanggal_peminjaman >= week_ago
-    ).count()
-    
-    # Monthly stats
-    month_total = db.query(Peminjaman).filter(
-        Peminjaman.tanggal_peminjaman >= month_ago
-    ).count()
-    
-    # Overall pending
-    all_pending = db.query(Peminjaman).filter(
-        Peminjaman.status == StatusPeminjamanEnum.pending
-    ).count()
-    
-    return {
-        "today": {
-            "total": today_total,
-            "pending": today_pending,
-            "approved": today_approved,
-            "rejected": today_total - today_pending - today_approved
-        },
-        "week": {
-            "total": week_total
-        },
-        "month": {
-            "total": month_total
-        },
-        "overall": {
-            "pending": all_pending
-        }
-    }
+    """Get statistik peminjaman untuk staff dashboard (dari rollup peminjaman_daily_stats)"""
+    return crud_stats.get_statistics(db, date.today())
 
 @router.get("/", response_model=List[PeminjamanResponse])
 def get_all_peminjaman_staff(
@@ -614,12 +619,13 @@ def get_all_peminjaman_staff(
     status: StatusPeminjamanEnum = Query(None, description="Filter by status"),
     tanggal_mulai: date = Query(None, description="Filter from date"),
     tanggal_akhir: date = Query(None, description="Filter to date"),
+    cursor: str = Query(None, description="Cursor dari header X-Next-Cursor (menggantikan page)"),
     db: Session = Depends(get_db),
     current_user: User = Depends(require_staff)
 ):
     """Get semua peminjaman untuk staff dengan filter"""
     skip = (page - 1) * per_page
-    query = db.query(Peminjaman)
+    query = select_peminjaman_list()
     
     # Apply filters
     if status:
@@ -629,21 +635,18 @@ def get_all_peminjaman_staff(
     if tanggal_akhir:
         query = query.filter(Peminjaman.tanggal_peminjaman <= tanggal_akhir)
     
-    peminjaman_list = query.order_by(Peminjaman.created_at.desc()).offset(skip).limit(per_page).all()
-    
-    # Expand dengan user info
-    result = []
-    for p in peminjaman_list:
-        data = PeminjamanResponse.from_orm(p)
-        if p.user:
-            data.user_name = p.user.name
-            data.user_nim = p.user.nim
-        if p.approver:
-            data.approver_name = p.approver.name
-        data.details = [detail for detail in p.details]
-        result.append(data)
-    
-    return result
+    query = apply_keyset(query, Peminjaman, cursor)
+    if not cursor:
+        query = query.offset(skip)
+    peminjaman_rows = db.execute(query.limit(per_page)).all()
+    details = load_peminjaman_details(db, peminjaman_rows)
+    
+    # Nama user/approver sudah ikut di proyeksi
+    response = json_response(render_rows(peminjaman_row_dicts(peminjaman_rows, details), List[PeminjamanRow]))
+    cursor_berikutnya = next_cursor(peminjaman_rows, per_page)
+    if cursor_berikutnya:
+        response.headers["X-Next-Cursor"] = cursor_berikutnya
+    return response
 
 @router.get("/pending", response_model=List[PeminjamanResponse])
 def get_pending_peminjaman(
@@ -654,20 +657,14 @@ def get_pending_peminjaman(
 ):
     """Get peminjaman yang menunggu approval"""
     skip = (page - 1) * per_page
-    peminjaman_list = db.query(Peminjaman).filter(
-        Peminjaman.status == StatusPeminjamanEnum.pending
-    ).order_by(Peminjaman.created_at.asc()).offset(skip).limit(per_page).all()
-    
-    result = []
-    for p in peminjaman_list:
-        data = PeminjamanResponse.from_orm(p)
-        if p.user:
-            data.user_name = p.user.name
-            data.user_nim = p.user.nim
-        data.details = [detail for detail in p.details]
-        result.append(data)
+    peminjaman_rows = db.execute(
+        select_peminjaman_list().filter(
+            Peminjaman.status == StatusPeminjamanEnum.pending
+        ).order_by(Peminjaman.created_at.asc()).offset(skip).limit(per_page)
+    ).all()
+    details = load_peminjaman_details(db, peminjaman_rows)
     
-    return result
+    return json_response(render_rows(peminjaman_row_dicts(peminjaman_rows, details), List[PeminjamanRow]))
 
 @router.get("/{peminjaman_id}", response_model=PeminjamanWithItemsResponse)
 def get_peminjaman_detail(
@@ -692,12 +689,9 @@ def get_peminjaman_detail(
     
     # Build response
     data = PeminjamanWithItemsResponse.from_orm(peminjaman)
-    if peminjaman.user:
-        data.user_name = peminjaman.user.name
-        data.user_nim = peminjaman.user.nim
-    if peminjaman.approver:
-        data.approver_name = peminjaman.approver.name
-    
+    data.user_name = peminjaman.user.name if peminjaman.user else None
+    data.user_nim = peminjaman.user.nim if peminjaman.user else None
+    data.approver_name = peminjaman.approver.name if peminjaman.approver else None
     data.items = expand_peminjaman_items(peminjaman, db)
     return data
 
@@ -735,59 +729,89 @@ def approve_peminjaman(
             detail=f"Tidak bisa mengubah status dari '{peminjaman.status}' ke '{approval_data.status}'"
         )
     
-    # Update peminjaman
+    # Klaim transisi status secara atomik: approval bersamaan untuk peminjaman
+    # yang sama hanya satu yang berhasil (stok tidak terkurangi dua kali).
+    # Saat approve, cek bentrok kelas ikut di UPDATE yang sama, jadi dua booking
+    # pending yang overlap tidak bisa sama-sama disetujui.
     old_status = peminjaman.status
-    peminjaman.status = approval_data.status
-    peminjaman.approved_by = current_user.id
+    approving = old_status == StatusPeminjamanEnum.pending and approval_data.status == StatusPeminjamanEnum.disetujui
+    conditions = [Peminjaman.id == peminjaman.id, Peminjaman.status == old_status]
+    if approving:
+        crud_kelas_booking.lock_kelas(db, peminjaman.details)
+        conditions.append(~crud_kelas_booking.approved_conflict_exists(peminjaman.id))
+    claimed = db.execute(
+        update(Peminjaman)
+        .where(*conditions)
+        .values(status=approval_data.status, approved_by=current_user.id)
+    ).rowcount
+    if not claimed:
+        db.rollback()
+        conflicts = approving and crud_kelas_booking.find_conflicts(
+            db, peminjaman.details, exclude_peminjaman_id=peminjaman.id
+        )
+        if conflicts:
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={
+                    "message": "Booking kelas bentrok dengan peminjaman yang sudah disetujui",
+                    "errors": [crud_kelas_booking.format_conflict(conflict) for conflict in conflicts]
+                }
+            )
+        raise HTTPException(
+            status_code=status.HTTP_409_CONFLICT,
+            detail="Peminjaman sudah diproses oleh staff lain"
+        )
     if approval_data.notes:
         peminjaman.notes = approval_data.notes
     
+    jumlah_per_barang = crud_availability.barang_quantities(peminjaman.details)
+    
     # Generate verification code jika disetujui (dari pending)
-    if old_status == StatusPeminjamanEnum.pending and approval_data.status == StatusPeminjamanEnum.disetujui:
+    if approving:
         peminjaman.verification_code = generate_verification_code()
         
-        # Update status barang/kelas yang dipinjam
+        # Kurangi stok barang dalam satu UPDATE bersyarat, batalkan semua jika ada yang kurang
+        errors = crud_barang.reserve_stok(db, jumlah_per_barang)
+        if errors:
+            db.rollback()
+            raise HTTPException(
+                status_code=status.HTTP_400_BAD_REQUEST,
+                detail={
+                    "message": "Stok barang tidak mencukupi",
+                    "errors": errors
+                }
+            )
+        
+        # Kelas tidak perlu update status (time-based)
         for detail in peminjaman.details:
-            if detail.reference_type == ReferenceTypeEnum.barang:
-                barang = db.query(Barang).filter(Barang.id == detail.reference_id).first()
-                if barang and detail.jumlah:
-                    barang.stok = max(0, barang.stok - detail.jumlah)
-                    if barang.stok == 0:
-                        barang.status = StatusBarangEnum.dipinjam
-            # Kelas tidak perlu update status (time-based)
-            elif detail.reference_type == ReferenceTypeEnum.absen:
+            if detail.reference_type == ReferenceTypeEnum.absen:
                 absen = db.query(Absen).filter(Absen.id == detail.reference_id).first()
                 if absen:
                     absen.status = StatusBarangEnum.dipinjam
     
     # Kembalikan barang/kelas jika dikembalikan
     elif approval_data.status == StatusPeminjamanEnum.dikembalikan:
+        crud_barang.release_stok(db, jumlah_per_barang)
+        
+        # Kelas tidak perlu update status (time-based)
         for detail in peminjaman.details:
-            if detail.reference_type == ReferenceTypeEnum.barang:
-                barang = db.query(Barang).filter(Barang.id == detail.reference_id).first()
-                if barang and detail.jumlah:
-                    barang.stok += detail.jumlah
-                    barang.status = StatusBarangEnum.tersedia
-            # Kelas tidak perlu update status (time-based)
-            elif detail.reference_type == ReferenceTypeEnum.absen:
+            if detail.reference_type == ReferenceTypeEnum.absen:
                 # ADD: Update absen status back to tersedia
                 absen = db.query(Absen).filter(Absen.id == detail.reference_id).first()
                 if absen:
                     absen.status = StatusBarangEnum.tersedia
     
+    crud_stats.record_status_change(db, peminjaman.tanggal_peminjaman, old_status, peminjaman.status)
+    crud_availability.record_status_change(db, peminjaman.details, peminjaman.tanggal_peminjaman, old_status, peminjaman.status)
+    
     db.commit()
     db.refresh(peminjaman)
+    history_count_cache.clear()
+    # Stok/status barang dan status absen ikut berubah
+    response_cache.bump("barang", "absen")
     
     # Build response
-    data = PeminjamanResponse.from_orm(peminjaman)
-    if peminjaman.user:
-        data.user_name = peminjaman.user.name
-        data.user_nim = peminjaman.user.nim
-    if peminjaman.approver:
-        data.approver_name = peminjaman.approver.name
-    data.details = [detail for detail in peminjaman.details]
-    
-    return data
+    return build_peminjaman_response(peminjaman)
 
 @router.delete("/{peminjaman_id}")
 def delete_peminjaman(
@@ -803,6 +827,9 @@ def delete_peminjaman(
             detail="Peminjaman tidak ditemukan"
         )
     
+    crud_stats.record_status_change(db, peminjaman.tanggal_peminjaman, peminjaman.status, None)
+    crud_availability.record_status_change(db, peminjaman.details, peminjaman.tanggal_peminjaman, peminjaman.status, None)
     db.delete(peminjaman)
     db.commit()
+    history_count_cache.clear()
     return {"message": "Peminjaman berhasil dihapus"}
\ No newline at end of file
@@ -1,4 +1,7 @@
 from pydantic import BaseModel, validator
+from typing import List, Optional
+from typing_extensions import TypedDict
+from datetime import datetime
 from app.models import StatusBarangEnum  # Import existing enum
 
 class AbsenCreate(BaseModel):
@@ -38,7 +41,56 @@ class AbsenResponse(BaseModel):
 
     @validator("status", pre=True)
     def serialize_status(cls, v):
-        print("DEBUG STATUS:", v)
         if hasattr(v, "value"):
             return v.value
-        return str(v)
\ No newline at end of file
+        return str(v)
+
+class AbsenRow(TypedDict):
+    """Baris absen dari database untuk list tanpa validasi (lihat render_rows)"""
+    id: int
+    nama_matakuliah: Optional[str]
+    kelas: Optional[str]
+    semester: Optional[int]
+    dosen: Optional[str]
+    jurusan: Optional[str]
+    status: StatusBarangEnum
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+
+class AbsenSearchResponse(BaseModel):
+    """Schema untuk hasil search absen dengan pagination"""
+    items: List[AbsenResponse]
+    total: int
+    page: int
+    per_page: int
+    total_pages: int
+
+class AbsenSheet(BaseModel):
+    """Satu lembar absen di dalam grup"""
+    id: int
+    nama_matakuliah: Optional[str]
+    kelas: Optional[str]
+    dosen: Optional[str]
+    status: StatusBarangEnum
+
+class AbsenJurusanGroup(BaseModel):
+    """Grup absen per jurusan dalam satu semester"""
+    jurusan: Optional[str]
+    total: int
+    tersedia: int
+    available: bool
+    sheets: List[AbsenSheet]
+
+class AbsenSemesterGroup(BaseModel):
+    """Grup absen per semester"""
+    semester: Optional[int]
+    total: int
+    tersedia: int
+    available: bool
+    jurusan: List[AbsenJurusanGroup]
+
+class AbsenGroupedResponse(BaseModel):
+    """Schema untuk absen yang dikelompokkan semester -> jurusan -> lembar"""
+    total: int
+    tersedia: int
+    semesters: List[AbsenSemesterGroup]
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, validator
-from typing import Optional
+from pydantic import BaseModel, Field, validator
+from typing import Dict, List, Optional
 from app.models import RoleEnum
 
 class UserRegister(BaseModel):
@@ -54,6 +54,39 @@ class UserResponse(BaseModel):
             return v.isoformat()
         return str(v)
     
+class NIMBulkValidateRequest(BaseModel):
+    nims: List[str] = Field(..., min_length=1, max_length=10000)
+
+class NIMValidationResult(BaseModel):
+    nim: str
+    valid: bool
+    info: Optional[dict] = None
+    error: Optional[str] = None
+
+class ProdiCount(BaseModel):
+    prodi: str
+    jenjang: str
+    jumlah: int
+
+class NIMBulkValidateResponse(BaseModel):
+    results: List[NIMValidationResult]
+    total: int
+    valid: int
+    invalid: int
+    by_prodi: Dict[str, ProdiCount]
+    by_angkatan: Dict[str, int]
+
+class RosterImportError(BaseModel):
+    row: int
+    nim: Optional[str] = None
+    error: str
+
+class RosterImportResponse(BaseModel):
+    total: int
+    created: int
+    failed: int
+    errors: List[RosterImportError]
+
 class ChangePasswordRequest(BaseModel):
     current_password: str = None  # Optional untuk beberapa kasus
     new_password: str
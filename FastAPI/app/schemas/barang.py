@@ -1,5 +1,6 @@
 from pydantic import BaseModel, validator
-from typing import Optional
+from typing import List, Optional
+from typing_extensions import TypedDict
 from datetime import datetime
 from app.models import StatusBarangEnum
 
@@ -87,6 +88,33 @@ class BarangListResponse(BaseModel):
     per_page: int
     total_pages: int
 
+# === ROW SCHEMAS (response list tanpa validasi, lihat render_rows) ===
+class BarangRow(TypedDict):
+    """Baris barang dari database, field dan urutannya sama dengan BarangResponse"""
+    nama: Optional[str]
+    satuan: Optional[str]
+    stok: Optional[int]
+    lokasi: Optional[str]
+    id: int
+    status: Optional[StatusBarangEnum]
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+
+class BarangListRows(TypedDict):
+    """BarangListResponse dengan items berupa BarangRow"""
+    items: List[BarangRow]
+    total: int
+    page: int
+    per_page: int
+    total_pages: int
+
+class BarangBulkResponse(BaseModel):
+    """Schema untuk hasil upsert barang massal"""
+    total: int
+    created: int
+    updated: int
+    duplicates: int
+
 class StokUpdateRequest(BaseModel):
     """Schema khusus untuk update stok"""
     stok: int
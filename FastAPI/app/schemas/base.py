@@ -0,0 +1,11 @@
+from typing import List
+
+def row_columns(schema, model) -> List:
+    """
+    Kolom tabel `model` untuk field-field row schema (TypedDict), urut sesuai
+    deklarasi field. dict dari Row hasil select() kolom ini sudah berurutan
+    sama dengan JSON response, jadi bisa langsung di-serialize dengan
+    render_rows tanpa dibangun ulang per field.
+    """
+    columns = model.__table__.columns
+    return [columns[name] for name in schema.__annotations__ if name in columns]
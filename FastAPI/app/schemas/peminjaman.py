@@ -1,5 +1,6 @@
 from pydantic import BaseModel, validator
 from typing import List, Optional
+from typing_extensions import TypedDict
 from datetime import date, datetime
 from app.models import StatusPeminjamanEnum, ReferenceTypeEnum
 
@@ -98,4 +99,40 @@ class PeminjamanWithItemsResponse(BaseModel):
     def serialize_datetime(cls, v):
         if v and hasattr(v, "isoformat"):
             return v.isoformat()
-        return str(v) if v else None
\ No newline at end of file
+        return str(v) if v else None
+
+class PeminjamanStaffResponse(PeminjamanResponse):
+    """Peminjaman untuk dashboard staff, details berisi item yang sudah di-expand"""
+    details: List[dict] = []
+
+# === ROW SCHEMAS (response list tanpa validasi, lihat render_rows) ===
+class PeminjamanDetailRow(TypedDict):
+    """Baris detail dari database, field dan urutannya sama dengan PeminjamanDetailResponse"""
+    id: int
+    reference_type: Optional[ReferenceTypeEnum]
+    reference_id: Optional[int]
+    jumlah: Optional[int]
+    waktu_mulai: Optional[datetime]
+    waktu_selesai: Optional[datetime]
+    created_at: Optional[datetime]
+
+class PeminjamanBaseRow(TypedDict):
+    """Baris peminjaman (tanpa details), field dan urutannya sama dengan PeminjamanResponse"""
+    id: int
+    user_id: Optional[int]
+    tanggal_peminjaman: Optional[date]
+    status: Optional[StatusPeminjamanEnum]
+    approved_by: Optional[int]
+    verification_code: Optional[str]
+    notes: Optional[str]
+    created_at: Optional[datetime]
+    updated_at: Optional[datetime]
+    user_name: Optional[str]
+    user_nim: Optional[str]
+    approver_name: Optional[str]
+
+class PeminjamanRow(PeminjamanBaseRow):
+    details: List[PeminjamanDetailRow]
+
+class PeminjamanStaffRow(PeminjamanBaseRow):
+    details: List[dict]
@@ -0,0 +1,89 @@
+import csv
+import enum
+import io
+import json
+from datetime import date, datetime
+from typing import BinaryIO, Iterable, Iterator, Sequence, Tuple
+import orjson
+
+class FileFormatEnum(str, enum.Enum):
+    csv = "csv"
+    ndjson = "ndjson"
+
+MEDIA_TYPES = {
+    FileFormatEnum.csv: "text/csv",
+    FileFormatEnum.ndjson: "application/x-ndjson",
+}
+
+def detect_format(filename: str) -> FileFormatEnum:
+    """Tebak format dari ekstensi file, default CSV"""
+    if (filename or "").lower().endswith((".ndjson", ".jsonl")):
+        return FileFormatEnum.ndjson
+    return FileFormatEnum.csv
+
+def iter_records(file: BinaryIO, fmt: FileFormatEnum, required: Sequence[str] = ()) -> Iterator[Tuple[int, dict]]:
+    """
+    Baca file CSV (dengan header) atau NDJSON baris per baris tanpa memuat
+    seluruh file ke memory.
+    
+    Yields:
+        (nomor_baris, record) - record berisi key "error" jika baris tidak bisa dibaca
+    """
+    text = io.TextIOWrapper(file, encoding="utf-8-sig", newline="")
+    if fmt == FileFormatEnum.csv:
+        reader = csv.DictReader(text)
+        missing = [field for field in required if field not in (reader.fieldnames or [])]
+        if missing:
+            yield 1, {"error": f"Header CSV tidak lengkap, kolom tidak ada: {', '.join(missing)}"}
+            return
+        for record in reader:
+            yield reader.line_num, record
+    else:
+        for line_num, line in enumerate(text, start=1):
+            if not line.strip():
+                continue
+            try:
+                record = json.loads(line)
+            except ValueError:
+                yield line_num, {"error": "JSON tidak valid"}
+                continue
+            if not isinstance(record, dict):
+                yield line_num, {"error": "Baris harus berupa object JSON"}
+                continue
+            yield line_num, record
+
+def to_plain(value):
+    """Ubah enum/datetime menjadi nilai yang bisa ditulis ke CSV/JSON"""
+    if isinstance(value, enum.Enum):
+        return value.value
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    return value
+
+def stream_records(records: Iterable[dict], fmt: FileFormatEnum, fields: Sequence[str], chunk_size: int = 500) -> Iterator[str]:
+    """
+    Tulis record menjadi CSV (dengan header) atau NDJSON secara bertahap,
+    di-yield per `chunk_size` baris untuk StreamingResponse.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer) if fmt == FileFormatEnum.csv else None
+    if writer:
+        writer.writerow(fields)
+    
+    count = 0
+    for record in records:
+        values = [to_plain(record[field]) for field in fields]
+        if writer:
+            writer.writerow(values)
+        else:
+            buffer.write(orjson.dumps(dict(zip(fields, values))).decode())
+            buffer.write("\n")
+        
+        count += 1
+        if count % chunk_size == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    
+    if buffer.tell():
+        yield buffer.getvalue()
@@ -0,0 +1,214 @@
+import math
+import os
+import sqlite3
+import threading
+import time
+from collections import deque
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Konfigurasi throttling login, bisa di-override lewat env
+LOGIN_WINDOW_SECONDS = int(os.getenv("LOGIN_WINDOW_SECONDS", "300"))
+LOGIN_MAX_FAILURES_PER_NIM = int(os.getenv("LOGIN_MAX_FAILURES_PER_NIM", "5"))
+# Per IP jauh lebih longgar: satu lab kampus di belakang NAT berbagi satu IP
+LOGIN_MAX_FAILURES_PER_IP = int(os.getenv("LOGIN_MAX_FAILURES_PER_IP", "200"))
+LOGIN_BACKOFF_BASE_SECONDS = float(os.getenv("LOGIN_BACKOFF_BASE_SECONDS", "1"))
+LOGIN_BACKOFF_MAX_SECONDS = float(os.getenv("LOGIN_BACKOFF_MAX_SECONDS", "900"))
+# Kosong = in-memory (per proses), isi path file untuk store SQLite yang dibagi antar worker
+LOGIN_THROTTLE_SQLITE_PATH = os.getenv("LOGIN_THROTTLE_SQLITE_PATH", "")
+
+class MemoryAttemptStore:
+    """Simpan timestamp percobaan login per key di memory (deque per key)"""
+
+    def __init__(self):
+        self._attempts: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+
+    def _recent(self, key: str, since: float) -> Tuple[int, Optional[float]]:
+        """Jumlah percobaan sejak `since` dan timestamp yang terakhir (dipanggil dengan lock)"""
+        attempts = self._attempts.get(key)
+        if not attempts:
+            return 0, None
+        while attempts and attempts[0] < since:
+            attempts.popleft()
+        if not attempts:
+            del self._attempts[key]
+            return 0, None
+        return len(attempts), attempts[-1]
+
+    def try_add(self, keys: List[str], since: float, now: float, retry_after: Callable) -> float:
+        """
+        Atomik: hitung retry_after(key, count, last) untuk semua key, dan hanya
+        jika semuanya 0 catat percobaan `now` di semua key. Return retry terbesar.
+        """
+        with self._lock:
+            wait = 0
+            for key in keys:
+                wait = max(wait, retry_after(key, *self._recent(key, since)))
+            if wait <= 0:
+                for key in keys:
+                    self._attempts.setdefault(key, deque()).append(now)
+            return wait
+
+    def discard(self, key: str):
+        """Batalkan satu percobaan (yang terakhir) untuk key"""
+        with self._lock:
+            attempts = self._attempts.get(key)
+            if attempts:
+                attempts.pop()
+                if not attempts:
+                    del self._attempts[key]
+
+    def clear(self, key: str):
+        with self._lock:
+            self._attempts.pop(key, None)
+
+    def prune(self, since: float):
+        """Buang key yang semua percobaannya sudah di luar window"""
+        with self._lock:
+            for key in [key for key, attempts in self._attempts.items() if attempts[-1] < since]:
+                del self._attempts[key]
+
+class SQLiteAttemptStore:
+    """Store percobaan login di file SQLite, supaya limit berlaku untuk semua worker"""
+
+    def __init__(self, path: str):
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._lock = threading.Lock()
+        with self._lock:
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA busy_timeout=5000")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS login_attempts (key TEXT NOT NULL, ts REAL NOT NULL)"
+            )
+            self._conn.execute(
+                "CREATE INDEX IF NOT EXISTS ix_login_attempts_key_ts ON login_attempts (key, ts)"
+            )
+
+    def try_add(self, keys: List[str], since: float, now: float, retry_after: Callable) -> float:
+        """Sama dengan MemoryAttemptStore.try_add, atomik antar worker lewat BEGIN IMMEDIATE"""
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                wait = 0
+                for key in keys:
+                    count, last = self._conn.execute(
+                        "SELECT COUNT(*), MAX(ts) FROM login_attempts WHERE key = ? AND ts >= ?",
+                        (key, since)
+                    ).fetchone()
+                    wait = max(wait, retry_after(key, count, last))
+                if wait <= 0:
+                    self._conn.executemany(
+                        "INSERT INTO login_attempts (key, ts) VALUES (?, ?)", [(key, now) for key in keys]
+                    )
+                self._conn.execute("COMMIT")
+            except BaseException:
+                self._conn.execute("ROLLBACK")
+                raise
+            return wait
+
+    def discard(self, key: str):
+        with self._lock:
+            self._conn.execute(
+                "DELETE FROM login_attempts WHERE rowid = "
+                "(SELECT rowid FROM login_attempts WHERE key = ? ORDER BY ts DESC LIMIT 1)",
+                (key,)
+            )
+
+    def clear(self, key: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM login_attempts WHERE key = ?", (key,))
+
+    def prune(self, since: float):
+        with self._lock:
+            self._conn.execute("DELETE FROM login_attempts WHERE ts < ?", (since,))
+
+class LoginThrottle:
+    """
+    Sliding window percobaan login per NIM dan per IP dengan exponential backoff.
+
+    Percobaan dihitung di check() (atomik, sebelum bcrypt), sehingga request
+    paralel tidak bisa lolos semua sebelum kegagalannya tercatat. Login yang
+    berhasil membatalkan hitungannya lewat record_success. Setelah
+    `max_failures` percobaan dalam window, percobaan berikutnya ditolak selama
+    base * 2^(percobaan - max_failures) detik sejak percobaan terakhir
+    (maksimal `backoff_max`).
+    """
+
+    PRUNE_EVERY = 1000
+
+    def __init__(self, store=None):
+        self.store = store or MemoryAttemptStore()
+        self.window = LOGIN_WINDOW_SECONDS
+        self.limits = {"nim": LOGIN_MAX_FAILURES_PER_NIM, "ip": LOGIN_MAX_FAILURES_PER_IP}
+        self.backoff_base = LOGIN_BACKOFF_BASE_SECONDS
+        self.backoff_max = LOGIN_BACKOFF_MAX_SECONDS
+        self._lock = threading.Lock()
+        self._recorded = 0
+        self.rejected = {"nim": 0, "ip": 0}
+        self.failures = 0
+
+    def _retry_after(self, key: str, count: int, last: Optional[float], now: float) -> float:
+        excess = count - self.limits[key.split(":", 1)[0]]
+        if excess < 0:
+            return 0
+        backoff = min(self.backoff_base * (2 ** excess), self.backoff_max)
+        return max(0, last + backoff - now)
+
+    def check(self, nim: str, ip: Optional[str]) -> int:
+        """
+        Cek apakah login boleh diproses, dan jika boleh langsung catat sebagai
+        percobaan untuk NIM dan IP.
+
+        Returns:
+            int: 0 jika boleh, atau jumlah detik sampai boleh mencoba lagi
+        """
+        now = time.time()
+        keys = [f"{scope}:{value}" for scope, value in (("nim", nim), ("ip", ip)) if value]
+        rejected_by = []
+
+        def retry_after(key: str, count: int, last: Optional[float]) -> float:
+            wait = self._retry_after(key, count, last, now)
+            if wait > 0:
+                rejected_by.append(key.split(":", 1)[0])
+            return wait
+
+        wait = self.store.try_add(keys, now - self.window, now, retry_after)
+        if wait > 0:
+            with self._lock:
+                self.rejected[rejected_by[0]] += 1
+            return math.ceil(wait)
+
+        with self._lock:
+            self._recorded += 1
+            prune = self._recorded % self.PRUNE_EVERY == 0
+        if prune:
+            self.store.prune(now - self.window)
+        return 0
+
+    def record_failure(self, nim: str, ip: Optional[str]):
+        """Login gagal: percobaannya sudah dihitung di check(), hanya update metrik"""
+        with self._lock:
+            self.failures += 1
+
+    def record_success(self, nim: str, ip: Optional[str]):
+        """Login berhasil: reset hitungan NIM dan batalkan percobaan ini dari hitungan IP"""
+        self.store.clear(f"nim:{nim}")
+        if ip:
+            self.store.discard(f"ip:{ip}")
+
+    def stats(self) -> dict:
+        """Counter penolakan untuk monitoring"""
+        with self._lock:
+            return {
+                "store": "sqlite" if isinstance(self.store, SQLiteAttemptStore) else "memory",
+                "window_seconds": self.window,
+                "max_failures_per_nim": self.limits["nim"],
+                "max_failures_per_ip": self.limits["ip"],
+                "failures": self.failures,
+                "rejected_nim": self.rejected["nim"],
+                "rejected_ip": self.rejected["ip"],
+            }
+
+login_throttle = LoginThrottle(
+    SQLiteAttemptStore(LOGIN_THROTTLE_SQLITE_PATH) if LOGIN_THROTTLE_SQLITE_PATH else None
+)
@@ -0,0 +1,161 @@
+"""
+Benchmark requests/sec endpoint baca di bawah banyak client bersamaan.
+Database SQLite sementara diisi data contoh, lalu app dijalankan dengan
+uvicorn di subprocess dan dibebani client httpx async.
+
+    python scripts/bench_concurrency.py [--clients 200] [--requests 2000] [--rows 1000]
+
+Untuk membandingkan dengan versi lain (misalnya commit sebelumnya),
+jalankan dengan --app-dir ke checkout lain, contoh lewat git worktree:
+
+    git worktree add /tmp/mathrent-lama <commit>
+    python scripts/bench_concurrency.py --app-dir /tmp/mathrent-lama/FastAPI
+"""
+import argparse
+import asyncio
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from collections import Counter
+import httpx
+
+APP_DIR = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+
+PATHS = [
+    "/kelas/",
+    "/barang/",
+    "/absen/",
+    "/peminjaman/my",
+    "/peminjaman/staff/today",
+    "/peminjaman/staff/history",
+    "/peminjaman/staff/statistics",
+]
+
+# Dijalankan di app dir yang diuji: buat tabel, isi data, cetak token staff/mahasiswa
+SEED_SCRIPT = """
+import json, sys
+from datetime import date, datetime, timedelta
+from sqlalchemy import insert
+from app.database import engine, Base
+from app import models
+from app.auth import get_password_hash, create_access_token
+
+rows = int(sys.argv[1])
+now = datetime.utcnow()
+Base.metadata.create_all(engine)
+hashed = get_password_hash("secret1")
+with engine.begin() as conn:
+    conn.execute(insert(models.User), [
+        {"nim": "STAFF01", "name": "Staff", "role": models.RoleEnum.staff, "kode_akses": hashed},
+        {"nim": "H011211001", "name": "Mahasiswa", "role": models.RoleEnum.mahasiswa, "kode_akses": hashed},
+    ])
+    conn.execute(insert(models.Barang), [
+        {"nama": f"Barang {i}", "satuan": "unit", "stok": 10, "lokasi": "Gudang A",
+         "status": models.StatusBarangEnum.tersedia, "created_at": now, "updated_at": now}
+        for i in range(rows)
+    ])
+    conn.execute(insert(models.Kelas), [
+        {"nama_kelas": f"R{i}", "gedung": "MIPA", "lantai": 1 + i % 4, "kapasitas": 40, "created_at": now, "updated_at": now}
+        for i in range(rows)
+    ])
+    conn.execute(insert(models.Absen), [
+        {"nama_matakuliah": f"Matkul {i}", "kelas": "ABC"[i % 3], "semester": 1 + i % 8, "dosen": "Dr X",
+         "jurusan": "Matematika", "status": models.StatusBarangEnum.tersedia, "created_at": now, "updated_at": now}
+        for i in range(rows)
+    ])
+    conn.execute(insert(models.Peminjaman), [
+        {"user_id": 2, "tanggal_peminjaman": date.today() - timedelta(days=i % 30),
+         "status": models.StatusPeminjamanEnum.pending, "created_at": now - timedelta(seconds=i), "updated_at": now}
+        for i in range(rows)
+    ])
+    conn.execute(insert(models.PeminjamanDetail), [
+        {"peminjaman_id": i + 1, "reference_type": models.ReferenceTypeEnum.barang, "reference_id": 1 + i, "jumlah": 1, "created_at": now}
+        for i in range(rows)
+    ])
+print(json.dumps({
+    role: create_access_token({"sub": nim, "uid": uid, "role": role, "name": name})
+    for role, nim, uid, name in [("staff", "STAFF01", 1, "Staff"), ("mahasiswa", "H011211001", 2, "Mahasiswa")]
+}))
+"""
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+async def wait_ready(base_url: str, timeout: float = 30):
+    async with httpx.AsyncClient() as client:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            try:
+                await client.get(f"{base_url}/")
+                return
+            except httpx.HTTPError:
+                await asyncio.sleep(0.2)
+    raise RuntimeError("Server tidak siap")
+
+async def measure(client: httpx.AsyncClient, path: str, headers: dict, clients: int, requests: int) -> tuple:
+    """Return (req/s, Counter status code) untuk `requests` request dengan `clients` koneksi bersamaan"""
+    semaphore = asyncio.Semaphore(clients)
+    codes = Counter()
+
+    async def one():
+        async with semaphore:
+            try:
+                response = await client.get(path, headers=headers)
+                codes[response.status_code] += 1
+            except httpx.HTTPError as e:
+                codes[type(e).__name__] += 1
+
+    await one()  # Pemanasan (cache, koneksi pool)
+    codes.clear()
+    start = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(requests)))
+    return requests / (time.perf_counter() - start), codes
+
+async def run(args, base_url: str, tokens: dict):
+    limits = httpx.Limits(max_connections=args.clients, max_keepalive_connections=args.clients)
+    async with httpx.AsyncClient(base_url=base_url, limits=limits, timeout=120) as client:
+        print(f"{'endpoint':32s} {'req/s':>8s}  status")
+        for path in args.paths:
+            role = "mahasiswa" if path == "/peminjaman/my" else "staff"
+            headers = {"Authorization": f"Bearer {tokens[role]}"}
+            rate, codes = await measure(client, path, headers, args.clients, args.requests)
+            print(f"{path:32s} {rate:8.0f}  {dict(codes)}")
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--app-dir", default=APP_DIR, help="Direktori FastAPI yang diuji")
+    parser.add_argument("--clients", type=int, default=200)
+    parser.add_argument("--requests", type=int, default=2000, help="Jumlah request per endpoint")
+    parser.add_argument("--rows", type=int, default=1000, help="Jumlah baris contoh per tabel")
+    parser.add_argument("--paths", nargs="+", default=PATHS)
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp()
+    env = dict(os.environ, DATABASE_URL=f"sqlite:///{workdir}/bench.db", BCRYPT_ROUNDS="4", PYTHONPATH=args.app_dir)
+    seeded = subprocess.run(
+        [sys.executable, "-c", SEED_SCRIPT, str(args.rows)],
+        cwd=args.app_dir, env=env, check=True, capture_output=True, text=True
+    )
+    tokens = json.loads(seeded.stdout.strip().splitlines()[-1])
+
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(port), "--log-level", "warning"],
+        cwd=args.app_dir, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+    try:
+        base_url = f"http://127.0.0.1:{port}"
+        asyncio.run(wait_ready(base_url))
+        asyncio.run(run(args, base_url, tokens))
+    finally:
+        server.terminate()
+        server.wait()
+
+if __name__ == "__main__":
+    main()
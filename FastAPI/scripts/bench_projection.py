@@ -0,0 +1,105 @@
+"""
+Benchmark listing peminjaman: proyeksi kolom Core (select_peminjaman_list +
+load_peminjaman_details + render_rows) vs loading entity ORM lama
+(joinedload user/approver + selectinload details, divalidasi
+PeminjamanResponse). Diukur satu halaman besar, waktu terbaik dan puncak
+alokasi memori (tracemalloc).
+
+    python scripts/bench_projection.py [--rows 10000] [--repeat 3]
+"""
+import argparse
+import gc
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_projection.db"
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from datetime import date, datetime, timedelta
+from typing import List
+from pydantic import TypeAdapter
+from sqlalchemy import insert
+from sqlalchemy.orm import joinedload, selectinload
+from app import models
+from app.cache import render_rows
+from app.database import engine, Base, SessionLocal
+from app.models import Peminjaman
+from app.routes.peminjaman import (
+    select_peminjaman_list, load_peminjaman_details, peminjaman_row_dicts, build_peminjaman_response
+)
+from app.schemas.peminjaman import PeminjamanResponse, PeminjamanRow
+
+def seed(rows: int):
+    now = datetime.utcnow()
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(models.User), [
+            {"nim": "STAFF01", "name": "Staff", "role": models.RoleEnum.staff, "kode_akses": "-"},
+            {"nim": "H011211001", "name": "Mahasiswa", "role": models.RoleEnum.mahasiswa, "kode_akses": "-"},
+        ])
+        conn.execute(insert(models.Peminjaman), [
+            {"user_id": 2, "tanggal_peminjaman": date.today() - timedelta(days=i % 30),
+             "status": models.StatusPeminjamanEnum.disetujui if i % 2 else models.StatusPeminjamanEnum.pending,
+             "approved_by": 1 if i % 2 else None, "created_at": now - timedelta(seconds=i), "updated_at": now}
+            for i in range(rows)
+        ])
+        mulai = now.replace(hour=8, minute=0, second=0, microsecond=0)
+        details = [
+            {"reference_type": models.ReferenceTypeEnum.barang, "jumlah": 1, "waktu_mulai": None, "waktu_selesai": None},
+            {"reference_type": models.ReferenceTypeEnum.kelas, "jumlah": None,
+             "waktu_mulai": mulai, "waktu_selesai": mulai + timedelta(hours=2)},
+            {"reference_type": models.ReferenceTypeEnum.absen, "jumlah": None, "waktu_mulai": None, "waktu_selesai": None},
+        ]
+        conn.execute(insert(models.PeminjamanDetail), [
+            {"peminjaman_id": i + 1, "reference_id": 1, "created_at": now, **detail}
+            for i in range(rows) for detail in details
+        ])
+
+def orm_page(rows: int) -> bytes:
+    with SessionLocal() as db:
+        peminjaman = db.query(Peminjaman).options(
+            joinedload(Peminjaman.user), joinedload(Peminjaman.approver), selectinload(Peminjaman.details)
+        ).order_by(Peminjaman.created_at.desc()).limit(rows).all()
+        return TypeAdapter(List[PeminjamanResponse]).dump_json([build_peminjaman_response(p) for p in peminjaman])
+
+def core_page(rows: int) -> bytes:
+    with SessionLocal() as db:
+        peminjaman_rows = db.execute(
+            select_peminjaman_list().order_by(Peminjaman.created_at.desc()).limit(rows)
+        ).all()
+        details = load_peminjaman_details(db, peminjaman_rows)
+        return render_rows(peminjaman_row_dicts(peminjaman_rows, details), List[PeminjamanRow])
+
+def measure(page, rows: int, repeat: int) -> tuple:
+    """Return (detik terbaik, puncak MiB)"""
+    best = float("inf")
+    for _ in range(repeat):
+        gc.collect()
+        start = time.perf_counter()
+        page(rows)
+        best = min(best, time.perf_counter() - start)
+    gc.collect()
+    tracemalloc.start()
+    page(rows)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return best, peak / 2**20
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=10000, help="Jumlah peminjaman (masing-masing 3 detail)")
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    seed(args.rows)
+    assert orm_page(100) == core_page(100), "Output proyeksi Core berbeda dari output ORM"
+    print(f"{args.rows} peminjaman x 3 detail, satu halaman")
+    for name, page in (("orm", orm_page), ("core", core_page)):
+        best, peak = measure(page, args.rows, args.repeat)
+        print(f"{name:6s} {best * 1000:7.0f} ms  {args.rows / best:8.0f} rows/s  peak {peak:6.1f} MiB")
+
+if __name__ == "__main__":
+    main()
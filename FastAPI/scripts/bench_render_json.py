@@ -0,0 +1,84 @@
+"""
+Micro-benchmark render_json (pydantic-core/orjson) vs jsonable_encoder +
+JSONResponse bawaan FastAPI untuk payload list endpoint.
+
+    python scripts/bench_render_json.py [--rows 100] [--repeat 200]
+"""
+import argparse
+import os
+import sys
+import timeit
+from datetime import date, datetime, timedelta
+
+os.environ.setdefault("DATABASE_URL", "sqlite://")
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from typing import List
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from app.cache import render_json
+from app.models import StatusBarangEnum, StatusPeminjamanEnum, ReferenceTypeEnum
+from app.schemas.absen import AbsenResponse
+from app.schemas.barang import BarangListResponse
+from app.schemas.peminjaman import PeminjamanResponse
+
+def payloads(rows: int) -> dict:
+    now = datetime(2025, 3, 1, 8, 30, 15, 123456)
+    barang = BarangListResponse.model_validate({
+        "items": [
+            {"id": i, "nama": f"Barang {i}", "satuan": "unit", "stok": i, "lokasi": "Gudang A",
+             "status": StatusBarangEnum.tersedia, "created_at": now, "updated_at": now}
+            for i in range(rows)
+        ],
+        "total": rows, "page": 1, "per_page": rows, "total_pages": 1
+    })
+    absen = [
+        AbsenResponse.model_validate({
+            "id": i, "nama_matakuliah": "Aljabar", "kelas": "A", "semester": 3, "dosen": "Dr X",
+            "jurusan": "Matematika", "status": StatusBarangEnum.tersedia, "created_at": now, "updated_at": now
+        })
+        for i in range(rows)
+    ]
+    peminjaman = [
+        PeminjamanResponse.model_validate({
+            "id": i, "user_id": 1, "tanggal_peminjaman": date(2025, 3, 3), "status": StatusPeminjamanEnum.pending,
+            "created_at": now, "updated_at": now, "user_name": "Mahasiswa", "user_nim": "H011211001",
+            "details": [
+                {"id": j, "reference_type": ReferenceTypeEnum.kelas, "reference_id": 1,
+                 "waktu_mulai": now, "waktu_selesai": now + timedelta(hours=2), "created_at": now}
+                for j in range(3)
+            ]
+        })
+        for i in range(rows)
+    ]
+    kelas = {
+        "data": [
+            {"id": i, "nama_kelas": str(200 + i), "gedung": "MIPA", "lantai": 2, "kapasitas": 40,
+             "fasilitas": None, "created_at": now, "updated_at": now}
+            for i in range(rows)
+        ],
+        "total": rows, "page": 1, "per_page": rows, "total_pages": 1
+    }
+    return {
+        "/barang/": (barang, None),
+        "/absen/": (absen, List[AbsenResponse]),
+        "/peminjaman/my": (peminjaman, List[PeminjamanResponse]),
+        "/kelas/": (kelas, None),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100)
+    parser.add_argument("--repeat", type=int, default=200)
+    args = parser.parse_args()
+
+    print(f"{'endpoint':18s} {'jsonable_encoder':>17s} {'render_json':>12s} {'speedup':>8s}  identik")
+    for endpoint, (content, model) in payloads(args.rows).items():
+        baseline = lambda: JSONResponse(jsonable_encoder(content)).body
+        rendered = lambda: render_json(content, model)
+        old = min(timeit.repeat(baseline, number=args.repeat, repeat=3)) / args.repeat * 1000
+        new = min(timeit.repeat(rendered, number=args.repeat, repeat=3)) / args.repeat * 1000
+        print(f"{endpoint:18s} {old:14.3f} ms {new:9.3f} ms {old / new:7.1f}x  {baseline() == rendered()}")
+
+if __name__ == "__main__":
+    main()
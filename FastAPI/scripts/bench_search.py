@@ -0,0 +1,73 @@
+"""
+Benchmark search barang lewat index FTS5 barang_fts vs scan ILIKE lama
+(fallback get_barang_list saat FTS tidak tersedia). Tiap search menghitung
+total dan mengambil halaman pertama, sama seperti GET /barang/?search=...
+
+    python scripts/bench_search.py [--rows 100000] [--repeat 5]
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/bench_search.db"
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from datetime import datetime
+from sqlalchemy import insert
+from app import fts, models
+from app.crud import barang as crud_barang
+from app.database import engine, Base, SessionLocal
+
+NAMA = ["Proyektor", "Kabel HDMI", "Speaker", "Laptop", "Pointer", "Papan Tulis", "Terminal", "Mikrofon"]
+LOKASI = ["Gudang A", "Gudang B", "Lab Komputer", "Ruang Dosen"]
+SATUAN = ["unit", "buah", "set"]
+SEARCHES = ["proyektor", "kabel hd", "lab", "speaker 12", "gudang b", "mik", "unit", "laptop 99", "tidak ada", "set"]
+
+def seed(rows: int):
+    now = datetime.utcnow()
+    rng = random.Random(0)
+    Base.metadata.create_all(engine)
+    with engine.begin() as conn:
+        conn.execute(insert(models.Barang), [
+            {"nama": f"{rng.choice(NAMA)} {i}", "satuan": rng.choice(SATUAN), "stok": 10,
+             "lokasi": rng.choice(LOKASI), "status": models.StatusBarangEnum.tersedia,
+             "created_at": now, "updated_at": now}
+            for i in range(rows)
+        ])
+    # Index dibuat setelah data ada, jadi terisi lewat 'rebuild'
+    if not fts.setup_fts_index(engine, "barang", ["nama", "lokasi", "satuan"]):
+        sys.exit("SQLite ini tidak mendukung FTS5")
+
+def run_searches(repeat: int) -> float:
+    """Return rata-rata milidetik per search"""
+    with SessionLocal() as db:
+        start = time.perf_counter()
+        for _ in range(repeat):
+            for search in SEARCHES:
+                crud_barang.get_barang_list(db, skip=0, limit=20, search=search)
+        return (time.perf_counter() - start) * 1000 / (repeat * len(SEARCHES))
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100000, help="Jumlah baris barang")
+    parser.add_argument("--repeat", type=int, default=5, help="Pengulangan tiap daftar search")
+    args = parser.parse_args()
+
+    seed(args.rows)
+    run_searches(1)  # Pemanasan (page cache SQLite)
+
+    results = {}
+    for mode, available in (("fts5", True), ("ilike", False)):
+        fts._available["barang"] = available
+        results[mode] = run_searches(args.repeat)
+
+    print(f"{args.rows} barang, {len(SEARCHES)} search x {args.repeat}")
+    for mode, ms in results.items():
+        print(f"{mode:8s} {ms:8.2f} ms/search")
+    print(f"speedup  {results['ilike'] / results['fts5']:8.1f}x")
+
+if __name__ == "__main__":
+    main()
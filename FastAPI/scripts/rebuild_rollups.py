@@ -0,0 +1,25 @@
+"""
+Hitung ulang rollup statistik harian (peminjaman_daily_stats) dan timeline
+barang (barang_daily_reservation) dari tabel peminjaman. Jalankan sekali
+setelah import/perbaikan data manual; app sendiri hanya mengisi tabel yang
+masih kosong saat startup.
+
+    python scripts/rebuild_rollups.py
+"""
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), ".."))
+
+from app.crud import barang_availability as crud_availability
+from app.crud import peminjaman_stats as crud_stats
+from app.database import SessionLocal
+
+def main():
+    with SessionLocal() as db:
+        crud_stats.rebuild_daily_stats(db)
+        crud_availability.rebuild_reservations(db)
+    print("Rollup statistik harian dan timeline barang sudah dihitung ulang")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,116 @@
+import os
+import tempfile
+
+# Database test sendiri (file SQLite sementara), di-set sebelum app di-import
+os.environ["DATABASE_URL"] = f"sqlite:///{tempfile.mkdtemp()}/test.db"
+os.environ.setdefault("BCRYPT_ROUNDS", "4")
+
+import pytest
+from datetime import date, datetime, time
+from fastapi.testclient import TestClient
+from app.main import app
+from app.database import SessionLocal, engine
+from app.models import (
+    Base, User, Barang, Kelas, Absen, Peminjaman, PeminjamanDetail,
+    RoleEnum, StatusBarangEnum, StatusPeminjamanEnum, ReferenceTypeEnum
+)
+from app.auth import get_password_hash, create_access_token, principal_cache
+from app.cache import response_cache
+from app.throttle import login_throttle, MemoryAttemptStore
+from app.routes.peminjaman import history_count_cache
+
+PASSWORD = "secret1"
+
+@pytest.fixture(autouse=True)
+def clean_state():
+    """Kosongkan semua tabel dan cache sebelum setiap test"""
+    with engine.begin() as conn:
+        for table in reversed(Base.metadata.sorted_tables):
+            conn.execute(table.delete())
+    response_cache.bump(*Base.metadata.tables)
+    principal_cache.clear()
+    history_count_cache.clear()
+    login_throttle.store = MemoryAttemptStore()
+    yield
+
+@pytest.fixture
+def client():
+    return TestClient(app)
+
+@pytest.fixture
+def db():
+    with SessionLocal() as session:
+        yield session
+
+def auth_headers(user: User) -> dict:
+    token = create_access_token({"sub": user.nim, "uid": user.id, "role": user.role.value, "name": user.name})
+    return {"Authorization": f"Bearer {token}"}
+
+@pytest.fixture
+def users(db):
+    """Satu staff dan satu mahasiswa"""
+    hashed = get_password_hash(PASSWORD)
+    staff = User(nim="STAFF01", name="Staff", role=RoleEnum.staff, kode_akses=hashed)
+    mahasiswa = User(nim="H011211001", name="Mahasiswa", role=RoleEnum.mahasiswa, kode_akses=hashed)
+    db.add_all([staff, mahasiswa])
+    db.commit()
+    return staff, mahasiswa
+
+@pytest.fixture
+def staff_headers(users):
+    return auth_headers(users[0])
+
+@pytest.fixture
+def mahasiswa_headers(users):
+    return auth_headers(users[1])
+
+@pytest.fixture
+def catalog(db):
+    """Barang, kelas dan absen contoh"""
+    db.add_all([
+        Barang(nama=f"Barang {i}", satuan="unit", stok=10, lokasi="Gudang A", status=StatusBarangEnum.tersedia)
+        for i in range(5)
+    ])
+    db.add(Kelas(nama_kelas="204", gedung="MIPA", lantai=2, kapasitas=40))
+    db.add(Absen(nama_matakuliah="Aljabar", kelas="A", semester=3, dosen="Dr X", jurusan="Matematika"))
+    db.commit()
+
+def make_peminjaman(db, count: int, mahasiswa: User, approver: User = None, tanggal: date = None) -> list:
+    """
+    `count` peminjaman milik mahasiswa, masing-masing satu detail barang,
+    kelas dan absen. Yang bernomor genap disetujui oleh approver (jika ada).
+    """
+    tanggal = tanggal or date.today()
+    barang = db.query(Barang).order_by(Barang.id).all()
+    kelas = db.query(Kelas).first()
+    absen = db.query(Absen).first()
+    created = []
+    for i in range(count):
+        approved = approver is not None and i % 2 == 0
+        peminjaman = Peminjaman(
+            user_id=mahasiswa.id,
+            tanggal_peminjaman=tanggal,
+            status=StatusPeminjamanEnum.disetujui if approved else StatusPeminjamanEnum.pending,
+            approved_by=approver.id if approved else None,
+            verification_code=f"KODE{i:04d}" if approved else None,
+            notes=f"Catatan {i}" if i % 3 else None,
+            created_at=datetime(2025, 3, 1, 8, 0, i % 60, 1000 * i),
+            details=[
+                PeminjamanDetail(reference_type=ReferenceTypeEnum.barang, reference_id=barang[i % len(barang)].id, jumlah=1),
+                PeminjamanDetail(
+                    reference_type=ReferenceTypeEnum.kelas, reference_id=kelas.id,
+                    waktu_mulai=datetime.combine(tanggal, time(8)), waktu_selesai=datetime.combine(tanggal, time(10))
+                ),
+                PeminjamanDetail(reference_type=ReferenceTypeEnum.absen, reference_id=absen.id),
+            ]
+        )
+        db.add(peminjaman)
+        created.append(peminjaman)
+    db.commit()
+    return created
+
+@pytest.fixture
+def peminjaman(db, users, catalog):
+    """Lima peminjaman hari ini milik mahasiswa, sebagian disetujui staff"""
+    staff, mahasiswa = users
+    return make_peminjaman(db, 5, mahasiswa, staff)
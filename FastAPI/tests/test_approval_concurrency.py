@@ -0,0 +1,93 @@
+import threading
+from datetime import date, timedelta
+from app.models import Barang, Kelas, Peminjaman, StatusBarangEnum, StatusPeminjamanEnum
+
+def create_peminjaman(client, headers, details, tanggal: date) -> int:
+    response = client.post("/peminjaman/", headers=headers, json={
+        "tanggal_peminjaman": tanggal.isoformat(), "details": details
+    })
+    assert response.status_code == 201, response.text
+    return response.json()["id"]
+
+def approve_concurrently(client, headers, peminjaman_ids) -> list:
+    """Approve semua peminjaman dari thread terpisah yang dilepas bersamaan lewat barrier"""
+    barrier = threading.Barrier(len(peminjaman_ids))
+    codes = [None] * len(peminjaman_ids)
+
+    def approve(index, peminjaman_id):
+        barrier.wait()
+        codes[index] = client.put(
+            f"/peminjaman/{peminjaman_id}/approve", headers=headers, json={"status": "disetujui"}
+        ).status_code
+
+    threads = [threading.Thread(target=approve, args=item) for item in enumerate(peminjaman_ids)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return codes
+
+def test_concurrent_approvals_never_oversell_stock(client, db, staff_headers, mahasiswa_headers, catalog):
+    barang = db.query(Barang).order_by(Barang.id).first()  # stok 10
+    # Tanggal berbeda supaya semuanya lolos cek ketersediaan saat dibuat
+    ids = [
+        create_peminjaman(client, mahasiswa_headers, [
+            {"reference_type": "barang", "reference_id": barang.id, "jumlah": 3}
+        ], date.today() + timedelta(days=i))
+        for i in range(8)
+    ]
+
+    codes = approve_concurrently(client, staff_headers, ids)
+
+    db.expire_all()
+    approved = db.query(Peminjaman).filter(Peminjaman.status == StatusPeminjamanEnum.disetujui).count()
+    assert approved == codes.count(200) == 3
+    assert codes.count(400) == 5
+    assert db.get(Barang, barang.id).stok == 1
+
+def test_concurrent_double_approval_has_single_winner(client, db, staff_headers, mahasiswa_headers, catalog):
+    barang = db.query(Barang).order_by(Barang.id).first()
+    peminjaman_id = create_peminjaman(client, mahasiswa_headers, [
+        {"reference_type": "barang", "reference_id": barang.id, "jumlah": 10}
+    ], date.today())
+
+    codes = approve_concurrently(client, staff_headers, [peminjaman_id] * 4)
+
+    assert codes.count(200) == 1
+    db.expire_all()
+    barang = db.get(Barang, barang.id)
+    assert barang.stok == 0
+    assert barang.status == StatusBarangEnum.dipinjam
+
+def kelas_item(kelas_id: int, tanggal: date, mulai: int, selesai: int) -> dict:
+    return {
+        "reference_type": "kelas", "reference_id": kelas_id,
+        "waktu_mulai": f"{tanggal.isoformat()}T{mulai:02d}:00:00",
+        "waktu_selesai": f"{tanggal.isoformat()}T{selesai:02d}:00:00",
+    }
+
+def test_overlapping_kelas_items_in_one_request_are_rejected(client, db, mahasiswa_headers, catalog):
+    kelas = db.query(Kelas).first()
+    tanggal = date.today() + timedelta(days=1)
+    response = client.post("/peminjaman/", headers=mahasiswa_headers, json={
+        "tanggal_peminjaman": tanggal.isoformat(),
+        "details": [kelas_item(kelas.id, tanggal, 8, 10), kelas_item(kelas.id, tanggal, 9, 11)]
+    })
+    assert response.status_code == 400
+    assert "Bentrok dengan item 1" in response.json()["detail"]["errors"][0]
+
+def test_concurrent_approvals_of_overlapping_kelas_have_single_winner(client, db, staff_headers, mahasiswa_headers, catalog):
+    kelas = db.query(Kelas).first()
+    tanggal = date.today() + timedelta(days=1)
+    # Semua masih pending, jadi semuanya lolos saat dibuat
+    ids = [
+        create_peminjaman(client, mahasiswa_headers, [kelas_item(kelas.id, tanggal, 8 + i % 2, 10 + i % 2)], tanggal)
+        for i in range(6)
+    ]
+
+    codes = approve_concurrently(client, staff_headers, ids)
+
+    assert codes.count(200) == 1
+    assert codes.count(400) == 5
+    db.expire_all()
+    assert db.query(Peminjaman).filter(Peminjaman.status == StatusPeminjamanEnum.disetujui).count() == 1
@@ -0,0 +1,24 @@
+from passlib.context import CryptContext
+from app.models import User, RoleEnum
+from conftest import PASSWORD
+
+def test_register_then_login(client):
+    response = client.post("/auth/register", json={"nim": "H011211002", "name": "Sari", "kode_akses": PASSWORD})
+    assert response.status_code == 201
+    assert response.json()["nim"] == "H011211002"
+
+    assert client.post("/auth/register", json={"nim": "H011211002", "name": "Sari", "kode_akses": PASSWORD}).status_code == 400
+    response = client.post("/auth/login-simple", json={"nim": "H011211002", "kode_akses": PASSWORD})
+    assert response.status_code == 200
+    assert response.json()["user"]["name"] == "Sari"
+
+def test_login_rehashes_outdated_hash(client, db):
+    # Hash dengan rounds lama (5), BCRYPT_ROUNDS test adalah 4
+    outdated = CryptContext(schemes=["bcrypt"], bcrypt__rounds=5).hash(PASSWORD)
+    db.add(User(nim="H011211003", name="Budi", role=RoleEnum.mahasiswa, kode_akses=outdated))
+    db.commit()
+
+    response = client.post("/auth/login", data={"username": "H011211003", "password": PASSWORD})
+    assert response.status_code == 200
+    db.expire_all()
+    assert db.query(User).filter(User.nim == "H011211003").one().kode_akses.startswith("$2b$04$")
@@ -0,0 +1,85 @@
+import threading
+from datetime import date, timedelta
+from app.crud import barang_availability as crud_availability
+from app.models import Barang, BarangDailyReservation, StatusPeminjamanEnum
+
+def barang_item(barang_id: int, jumlah: int) -> dict:
+    return {"reference_type": "barang", "reference_id": barang_id, "jumlah": jumlah}
+
+def pinjam(client, headers, details, tanggal: date):
+    return client.post("/peminjaman/", headers=headers, json={
+        "tanggal_peminjaman": tanggal.isoformat(), "details": details
+    })
+
+def timeline(db) -> list:
+    db.expire_all()
+    return sorted(
+        (row.barang_id, row.tanggal, row.status, row.jumlah)
+        for row in db.query(BarangDailyReservation) if row.jumlah
+    )
+
+def test_same_barang_twice_is_checked_against_combined_quantity(client, db, mahasiswa_headers, catalog):
+    barang = db.query(Barang).order_by(Barang.id).first()  # stok 10
+    response = pinjam(client, mahasiswa_headers, [barang_item(barang.id, 6), barang_item(barang.id, 6)], date.today())
+    assert response.status_code == 400
+    assert "dibutuhkan: 12" in response.json()["detail"]["errors"][0]
+
+    response = pinjam(client, mahasiswa_headers, [barang_item(barang.id, 4), barang_item(barang.id, 6)], date.today())
+    assert response.status_code == 201
+
+def test_moving_onto_fully_booked_date_is_rejected(client, db, mahasiswa_headers, catalog):
+    barang = db.query(Barang).order_by(Barang.id).first()
+    penuh, kosong = date.today() + timedelta(days=1), date.today() + timedelta(days=2)
+    assert pinjam(client, mahasiswa_headers, [barang_item(barang.id, 10)], penuh).status_code == 201
+    peminjaman = pinjam(client, mahasiswa_headers, [barang_item(barang.id, 5)], date.today()).json()
+
+    response = client.put(f"/peminjaman/my/{peminjaman['id']}", headers=mahasiswa_headers, json={
+        "tanggal_peminjaman": penuh.isoformat()
+    })
+    assert response.status_code == 400
+
+    response = client.put(f"/peminjaman/my/{peminjaman['id']}", headers=mahasiswa_headers, json={
+        "tanggal_peminjaman": kosong.isoformat()
+    })
+    assert response.status_code == 200
+    assert timeline(db) == [
+        (barang.id, penuh, StatusPeminjamanEnum.pending, 10),
+        (barang.id, kosong, StatusPeminjamanEnum.pending, 5),
+    ]
+
+def test_concurrent_first_bookings_share_timeline_row(client, db, mahasiswa_headers, catalog):
+    barang = db.query(Barang).order_by(Barang.id).first()
+    tanggal = date.today() + timedelta(days=3)
+    barrier = threading.Barrier(4)
+    codes = []
+
+    def book():
+        barrier.wait()
+        codes.append(pinjam(client, mahasiswa_headers, [barang_item(barang.id, 1)], tanggal).status_code)
+
+    threads = [threading.Thread(target=book) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert codes == [201] * 4
+    assert timeline(db) == [(barang.id, tanggal, StatusPeminjamanEnum.pending, 4)]
+    crud_availability.rebuild_reservations(db)
+    assert timeline(db) == [(barang.id, tanggal, StatusPeminjamanEnum.pending, 4)]
+
+def test_availability_reports_pending_and_committed_for_date(client, db, staff_headers, mahasiswa_headers, catalog):
+    barang = db.query(Barang).order_by(Barang.id).first()
+    tanggal = date.today() + timedelta(days=1)
+    disetujui = pinjam(client, mahasiswa_headers, [barang_item(barang.id, 2)], tanggal).json()
+    assert client.put(
+        f"/peminjaman/{disetujui['id']}/approve", headers=staff_headers, json={"status": "disetujui"}
+    ).status_code == 200
+    pinjam(client, mahasiswa_headers, [barang_item(barang.id, 7)], tanggal)
+
+    result = client.get(
+        f"/barang/{barang.id}/availability", params={"jumlah": 4, "tanggal": tanggal.isoformat()}, headers=staff_headers
+    ).json()
+    assert result["available"] is False
+    # Yang disetujui sudah mengurangi stok (10 - 2), tidak dikurangkan lagi dari sisa
+    assert (result["stok"], result["pending"], result["committed"], result["sisa"]) == (8, 7, 2, 1)
@@ -0,0 +1,87 @@
+import pytest
+from sqlalchemy import text, update
+from sqlalchemy.exc import OperationalError
+from app.crud import barang as crud_barang
+from app.models import Barang
+
+BARANG = {"satuan": "unit", "stok": 3, "lokasi": "Gudang A"}
+
+def create(client, headers, nama):
+    return client.post("/barang/", json={"nama": nama, **BARANG}, headers=headers)
+
+def test_create_rejects_case_insensitive_duplicate(client, staff_headers):
+    assert create(client, staff_headers, "Proyektor").status_code == 201
+    response = create(client, staff_headers, "PROYEKTOR")
+    assert response.status_code == 400
+
+def test_create_allows_name_containing_existing_name(client, staff_headers):
+    assert create(client, staff_headers, "Proyektor").status_code == 201
+    assert create(client, staff_headers, "Proyektor Mini").status_code == 201
+
+def test_rename_onto_existing_name_returns_400(client, staff_headers):
+    lama = create(client, staff_headers, "Proyektor Lama").json()
+    create(client, staff_headers, "Proyektor")
+
+    response = client.put(f"/barang/{lama['id']}", json={"nama": "proyektor"}, headers=staff_headers)
+    assert response.status_code == 400
+
+def test_rename_to_own_name_is_not_a_duplicate(client, staff_headers):
+    barang = create(client, staff_headers, "Proyektor").json()
+    response = client.put(f"/barang/{barang['id']}", json={"nama": "PROYEKTOR", "stok": 5}, headers=staff_headers)
+    assert response.status_code == 200
+    assert response.json()["stok"] == 5
+
+def test_unique_index_violation_returns_400(client, db, staff_headers, monkeypatch):
+    # Pre-check yang kalah race (atau beda lower()) tetap dijaga index unik
+    lama = create(client, staff_headers, "Proyektor Lama").json()
+    create(client, staff_headers, "Proyektor")
+    monkeypatch.setattr(crud_barang, "get_barang_by_nama", lambda db, nama: None)
+
+    assert create(client, staff_headers, "proyektor").status_code == 400
+    response = client.put(f"/barang/{lama['id']}", json={"nama": "proyektor"}, headers=staff_headers)
+    assert response.status_code == 400
+    assert db.query(Barang).count() == 2
+
+def raise_operational(message):
+    def upsert(*args, **kwargs):
+        raise OperationalError("INSERT INTO barang ...", {}, Exception(message))
+    return upsert
+
+def test_bulk_missing_conflict_index_returns_409(client, staff_headers, monkeypatch):
+    monkeypatch.setattr(
+        crud_barang, "upsert_barang_bulk",
+        raise_operational("ON CONFLICT clause does not match any PRIMARY KEY or UNIQUE constraint")
+    )
+    response = client.post("/barang/bulk", json=[{"nama": "Proyektor", **BARANG}], headers=staff_headers)
+    assert response.status_code == 409
+
+def test_bulk_other_database_errors_are_not_translated(client, staff_headers, monkeypatch):
+    monkeypatch.setattr(crud_barang, "upsert_barang_bulk", raise_operational("database is locked"))
+    with pytest.raises(OperationalError):
+        client.post("/barang/bulk", json=[{"nama": "Proyektor", **BARANG}], headers=staff_headers)
+
+def changes_made_by(db, statement):
+    """Jumlah baris yang diubah statement termasuk oleh trigger"""
+    before = db.execute(text("SELECT total_changes()")).scalar()
+    db.execute(statement)
+    return db.execute(text("SELECT total_changes()")).scalar() - before
+
+def test_fts_index_untouched_by_non_indexed_update(client, db, catalog):
+    barang = db.query(Barang).first()
+    assert changes_made_by(db, update(Barang).where(Barang.id == barang.id).values(stok=1)) == 1
+    assert changes_made_by(db, update(Barang).where(Barang.id == barang.id).values(nama="Kabel Baru")) > 1
+    db.commit()
+
+    items, total = crud_barang.get_barang_list(db, skip=0, limit=20, search="kabel baru")
+    assert [item.id for item in items] == [barang.id]
+
+def test_bulk_counts_non_ascii_names_like_the_database(client, staff_headers):
+    # Kunci dedupe dari lower() database (SQLite hanya melipat ASCII), sama dengan ON CONFLICT
+    assert create(client, staff_headers, "Äpfel").status_code == 201
+    response = client.post(
+        "/barang/bulk", json=[{"nama": nama, **BARANG} for nama in ("ÄPFEL", "äpfel", "Proyektor")], headers=staff_headers
+    )
+
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["created"], result["updated"], result["duplicates"]) == (1, 1, 1)
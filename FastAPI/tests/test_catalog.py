@@ -0,0 +1,62 @@
+from app.models import Absen
+
+def test_absen_grouped_allows_null_columns(client, db, mahasiswa_headers, catalog):
+    db.add(Absen(nama_matakuliah=None, kelas=None, semester=None, dosen=None, jurusan=None))
+    db.commit()
+
+    response = client.get("/absen/grouped", headers=mahasiswa_headers)
+    assert response.status_code == 200
+    sheets = [sheet for semester in response.json()["semesters"] for group in semester["jurusan"] for sheet in group["sheets"]]
+    assert {"nama_matakuliah": None, "kelas": None, "dosen": None} in [
+        {key: sheet[key] for key in ("nama_matakuliah", "kelas", "dosen")} for sheet in sheets
+    ]
+
+def test_catalog_includes_grouped_absen(client, mahasiswa_headers, catalog):
+    catalog_body = client.get("/peminjaman/available-items", headers=mahasiswa_headers).json()
+    grouped = client.get("/absen/grouped", headers=mahasiswa_headers).json()
+
+    absen = catalog_body["absen"]
+    assert {key: absen[key] for key in grouped} == grouped
+    assert (absen["page"], absen["total_pages"]) == (1, 1)
+    assert catalog_body["barang"]["total"] == 5
+    assert catalog_body["kelas"]["total"] == 1
+
+def test_catalog_refreshes_when_absen_changes(client, staff_headers, mahasiswa_headers, catalog):
+    before = client.get("/peminjaman/available-items", headers=mahasiswa_headers).json()["absen"]["total"]
+    client.post("/absen/", headers=staff_headers, json={
+        "nama_matakuliah": "Statistika", "kelas": "B", "semester": 5, "dosen": "Dr Y", "jurusan": "Statistika"
+    })
+
+    after = client.get("/peminjaman/available-items", headers=mahasiswa_headers).json()["absen"]["total"]
+    assert after == before + 1
+
+def test_catalog_sections_page_independently(client, mahasiswa_headers, catalog):
+    pages = [
+        client.get("/peminjaman/available-items", params={"per_page": 2, "barang_page": page}, headers=mahasiswa_headers).json()
+        for page in (1, 2, 3)
+    ]
+
+    assert [page["barang"]["total_pages"] for page in pages] == [3, 3, 3]
+    assert sum(len(page["barang"]["items"]) for page in pages) == 5
+    assert all(page["kelas"]["items"] == pages[0]["kelas"]["items"] for page in pages)
+
+def test_catalog_absen_section_is_paged(client, db, mahasiswa_headers, catalog):
+    db.add_all([
+        Absen(nama_matakuliah=f"Matkul {i}", kelas="A", semester=3, dosen="Dr X", jurusan="Matematika")
+        for i in range(4)
+    ])
+    db.commit()
+
+    pages = [
+        client.get("/peminjaman/available-items", params={"per_page": 2, "absen_page": page}, headers=mahasiswa_headers).json()["absen"]
+        for page in (1, 2, 3)
+    ]
+
+    assert [(page["total"], page["total_pages"]) for page in pages] == [(5, 3)] * 3
+    sheets = [
+        sheet["id"] for page in pages for semester in page["semesters"]
+        for group in semester["jurusan"] for sheet in group["sheets"]
+    ]
+    assert sorted(sheets) == sorted(absen.id for absen in db.query(Absen))
+    # Grup yang terpotong batas halaman muncul lagi di halaman berikutnya
+    assert [page["semesters"][0]["jurusan"][0]["total"] for page in pages] == [2, 2, 1]
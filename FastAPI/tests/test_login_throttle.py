@@ -0,0 +1,48 @@
+import threading
+import pytest
+from app.throttle import LoginThrottle, MemoryAttemptStore, SQLiteAttemptStore
+
+@pytest.fixture(params=["memory", "sqlite"])
+def throttle(request, tmp_path):
+    store = MemoryAttemptStore() if request.param == "memory" else SQLiteAttemptStore(str(tmp_path / "throttle.db"))
+    throttle = LoginThrottle(store)
+    throttle.limits = {"nim": 5, "ip": 200}
+    return throttle
+
+def test_parallel_attempts_are_counted_before_hashing(throttle):
+    barrier = threading.Barrier(20)
+    results = []
+
+    def attempt():
+        barrier.wait()
+        results.append(throttle.check("H011211001", "10.0.0.1"))
+
+    threads = [threading.Thread(target=attempt) for _ in range(20)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert results.count(0) == 5
+    assert throttle.stats()["rejected_nim"] == 15
+
+def test_successful_logins_do_not_use_ip_budget(throttle):
+    throttle.limits["ip"] = 3
+    for i in range(10):
+        nim = f"H0112110{i:02d}"
+        assert throttle.check(nim, "10.0.0.1") == 0
+        throttle.record_success(nim, "10.0.0.1")
+
+    assert throttle.check("H011211099", "10.0.0.1") == 0
+
+def test_shared_ip_is_not_locked_by_one_student(throttle):
+    for _ in range(6):
+        throttle.check("H011211001", "10.0.0.1")
+    assert throttle.check("H011211001", "10.0.0.1") > 0
+    assert throttle.check("H011211002", "10.0.0.1") == 0
+
+def test_login_route_rejects_after_limit(client, users):
+    form = {"username": "H011211001", "password": "salah123"}
+    codes = [client.post("/auth/login", data=form).status_code for _ in range(7)]
+    assert codes[:5] == [401] * 5
+    assert codes[5:] == [429, 429]
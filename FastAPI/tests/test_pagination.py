@@ -0,0 +1,33 @@
+from app.routes.peminjaman import history_count_cache
+from test_query_count import count_queries
+
+def history(client, headers, **params) -> dict:
+    response = client.get("/peminjaman/staff/history", params=params, headers=headers)
+    assert response.status_code == 200
+    return response.json()["data"]
+
+def test_history_page_mode_reports_range(client, staff_headers, peminjaman):
+    pagination = history(client, staff_headers, per_page=2, page=2)["pagination"]
+    assert (pagination["from"], pagination["to"]) == (3, 4)
+
+def test_history_cursor_mode_omits_range(client, staff_headers, peminjaman):
+    first = history(client, staff_headers, per_page=2)
+    second = history(client, staff_headers, per_page=2, cursor=first["pagination"]["next_cursor"])
+
+    assert len(second["items"]) == 2
+    assert second["items"][0]["id"] not in [item["id"] for item in first["items"]]
+    pagination = second["pagination"]
+    assert (pagination["current_page"], pagination["last_page"]) == (None, None)
+    assert (pagination["from"], pagination["to"]) == (None, None)
+    # Total dari cache hasil count halaman pertama
+    assert pagination["total"] == 5
+
+def test_history_cursor_mode_skips_count_query(client, staff_headers, peminjaman):
+    cursor = history(client, staff_headers, per_page=2)["pagination"]["next_cursor"]
+    history_count_cache.clear()
+
+    with count_queries() as statements:
+        pagination = history(client, staff_headers, per_page=2, cursor=cursor)["pagination"]
+
+    assert pagination["total"] is None
+    assert not [statement for statement in statements if "count(" in statement.lower()]
@@ -0,0 +1,33 @@
+from app.auth import principal_cache
+from app.models import RoleEnum, User
+
+def test_role_change_invalidates_cached_principal(client, db, users, staff_headers):
+    staff, _ = users
+    assert client.get("/peminjaman/staff/statistics", headers=staff_headers).status_code == 200
+    assert principal_cache.stats()["size"] == 1
+
+    staff.role = RoleEnum.mahasiswa
+    db.commit()
+
+    assert principal_cache.stats()["size"] == 0
+    assert client.get("/peminjaman/staff/statistics", headers=staff_headers).status_code == 403
+
+def test_user_deletion_invalidates_cached_principal(client, db, users, mahasiswa_headers):
+    _, mahasiswa = users
+    assert client.get("/peminjaman/my", headers=mahasiswa_headers).status_code == 200
+
+    db.delete(mahasiswa)
+    db.commit()
+
+    assert client.get("/peminjaman/my", headers=mahasiswa_headers).status_code == 401
+
+def test_rolled_back_change_keeps_cache_consistent(client, db, users, staff_headers):
+    staff, _ = users
+    client.get("/peminjaman/staff/statistics", headers=staff_headers)
+
+    staff.role = RoleEnum.mahasiswa
+    db.flush()
+    db.rollback()
+
+    assert db.get(User, staff.id).role == RoleEnum.staff
+    assert client.get("/peminjaman/staff/statistics", headers=staff_headers).status_code == 200
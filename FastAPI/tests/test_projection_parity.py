@@ -0,0 +1,52 @@
+from fastapi.encoders import jsonable_encoder
+from sqlalchemy.orm import joinedload, selectinload
+from app.models import Kelas, Peminjaman, PeminjamanDetail, StatusPeminjamanEnum
+from app.routes.peminjaman import build_peminjaman_response, expand_staff_detail
+from app.schemas.peminjaman import PeminjamanStaffResponse
+from conftest import make_peminjaman
+
+def orm_peminjaman(db, *filters, order_by):
+    """Loading lama: entity ORM dengan relasi user, approver dan details"""
+    db.expire_all()
+    return db.query(Peminjaman).options(
+        joinedload(Peminjaman.user), joinedload(Peminjaman.approver), selectinload(Peminjaman.details)
+    ).filter(*filters).order_by(*order_by).all()
+
+def test_pending_matches_orm_output(client, db, users, staff_headers, catalog):
+    staff, mahasiswa = users
+    make_peminjaman(db, 12, mahasiswa, staff)
+    expected = [
+        build_peminjaman_response(p)
+        for p in orm_peminjaman(db, Peminjaman.status == StatusPeminjamanEnum.pending, order_by=[Peminjaman.created_at.asc()])
+    ]
+
+    response = client.get("/peminjaman/pending", params={"per_page": 100}, headers=staff_headers)
+    assert response.json() == jsonable_encoder(expected)
+
+def test_staff_history_matches_orm_output(client, db, users, staff_headers, catalog):
+    staff, mahasiswa = users
+    make_peminjaman(db, 12, mahasiswa, staff)
+    newest_first = orm_peminjaman(db, order_by=[Peminjaman.created_at.desc(), Peminjaman.id.desc()])
+    referenced_items = PeminjamanDetail.load_referenced_items(db, [d for p in newest_first for d in p.details])
+    expected = []
+    for p in newest_first:
+        data = PeminjamanStaffResponse.model_validate(build_peminjaman_response(p).model_dump(exclude={"details"}))
+        data.details = [expand_staff_detail(detail, referenced_items) for detail in p.details]
+        expected.append(data)
+
+    response = client.get("/peminjaman/staff/history", params={"per_page": 100}, headers=staff_headers)
+    assert response.json()["data"]["items"] == jsonable_encoder(expected)
+
+def test_kelas_list_matches_orm_output(client, db, catalog):
+    db.add_all([Kelas(nama_kelas=f"R{i}", gedung="MIPA", lantai=1, kapasitas=40) for i in range(3)])
+    db.commit()
+    expected = [
+        {
+            "id": kelas.id, "nama_kelas": kelas.nama_kelas, "gedung": kelas.gedung, "lantai": kelas.lantai,
+            "kapasitas": kelas.kapasitas, "fasilitas": kelas.fasilitas,
+            "created_at": kelas.created_at, "updated_at": kelas.updated_at
+        }
+        for kelas in db.query(Kelas).all()
+    ]
+
+    assert client.get("/kelas/").json()["data"] == jsonable_encoder(expected)
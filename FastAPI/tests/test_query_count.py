@@ -0,0 +1,43 @@
+from contextlib import contextmanager
+import pytest
+from sqlalchemy import event
+from app.database import engine
+from conftest import make_peminjaman
+
+LIST_ENDPOINTS = [
+    ("/peminjaman/my", "mahasiswa"),
+    ("/peminjaman/", "staff"),
+    ("/peminjaman/pending", "staff"),
+    ("/peminjaman/staff/today", "staff"),
+    ("/peminjaman/staff/history", "staff"),
+]
+
+@contextmanager
+def count_queries():
+    statements = []
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    try:
+        yield statements
+    finally:
+        event.remove(engine, "before_cursor_execute", before_cursor_execute)
+
+def queries_for(client, path, headers) -> int:
+    client.get(path, headers=headers)  # Pemanasan: principal cache
+    with count_queries() as statements:
+        response = client.get(path, headers=headers)
+    assert response.status_code == 200
+    return len(statements)
+
+@pytest.mark.parametrize("path,role", LIST_ENDPOINTS)
+def test_list_query_count_does_not_grow_with_rows(client, db, users, catalog, staff_headers, mahasiswa_headers, path, role):
+    staff, mahasiswa = users
+    headers = staff_headers if role == "staff" else mahasiswa_headers
+
+    make_peminjaman(db, 1, mahasiswa)
+    single = queries_for(client, path, headers)
+    make_peminjaman(db, 9, mahasiswa, staff)
+    many = queries_for(client, path, headers)
+
+    assert single == many, f"{single} query untuk 1 baris, {many} untuk 10 baris"
@@ -0,0 +1,95 @@
+from datetime import date, datetime
+from types import SimpleNamespace
+from typing import List
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from app.cache import render_json
+from app.models import StatusBarangEnum, StatusPeminjamanEnum, ReferenceTypeEnum
+from app.schemas.absen import AbsenResponse, AbsenGroupedResponse
+from app.schemas.barang import BarangResponse, BarangListResponse
+from app.schemas.peminjaman import PeminjamanResponse, PeminjamanDetailResponse
+
+CREATED = datetime(2025, 3, 1, 8, 30, 15, 123456)
+UPDATED = datetime(2025, 3, 2, 9, 0)  # Tanpa mikrodetik
+
+def fastapi_body(content) -> bytes:
+    """Body yang dihasilkan FastAPI dengan jsonable_encoder + JSONResponse"""
+    return JSONResponse(jsonable_encoder(content)).body
+
+def barang_list() -> BarangListResponse:
+    items = [
+        BarangResponse.model_validate({
+            "id": i, "nama": nama, "satuan": "unit", "stok": i, "lokasi": "Gudang A",
+            "status": StatusBarangEnum.tersedia, "created_at": CREATED, "updated_at": UPDATED
+        })
+        for i, nama in enumerate(["Proyektor", "Kabel HDMI – 2m", "Spidol \"Biru\""])
+    ]
+    return BarangListResponse.model_validate({"items": items, "total": 3, "page": 1, "per_page": 20, "total_pages": 1})
+
+def absen_rows() -> list:
+    return [
+        SimpleNamespace(
+            id=i, nama_matakuliah="Aljabar Linear", kelas="A", semester=3, dosen="Dr. É", jurusan="Matematika",
+            status=StatusBarangEnum.dipinjam if i % 2 else StatusBarangEnum.tersedia,
+            created_at=CREATED, updated_at=UPDATED
+        )
+        for i in range(4)
+    ]
+
+def peminjaman_list() -> List[PeminjamanResponse]:
+    details = [
+        PeminjamanDetailResponse.model_validate({
+            "id": 1, "reference_type": ReferenceTypeEnum.barang, "reference_id": 2, "jumlah": 3,
+            "waktu_mulai": None, "waktu_selesai": None, "created_at": CREATED
+        }),
+        PeminjamanDetailResponse.model_validate({
+            "id": 2, "reference_type": ReferenceTypeEnum.kelas, "reference_id": 1, "jumlah": None,
+            "waktu_mulai": datetime(2025, 3, 3, 8), "waktu_selesai": datetime(2025, 3, 3, 10), "created_at": CREATED
+        }),
+    ]
+    return [
+        PeminjamanResponse.model_validate({
+            "id": i, "user_id": 7, "tanggal_peminjaman": date(2025, 3, 3), "status": StatusPeminjamanEnum.pending,
+            "approved_by": None, "verification_code": None, "notes": "Untuk praktikum ✓",
+            "created_at": CREATED, "updated_at": UPDATED,
+            "user_name": "Mahasiswa", "user_nim": "H011211001", "approver_name": None, "details": details
+        })
+        for i in range(3)
+    ]
+
+def test_barang_list_matches_jsonable_encoder():
+    content = barang_list()
+    assert render_json(content) == fastapi_body(content)
+
+def test_absen_list_with_response_model_matches_jsonable_encoder():
+    rows = absen_rows()
+    expected = fastapi_body([AbsenResponse.model_validate(row) for row in rows])
+    assert render_json(rows, List[AbsenResponse]) == expected
+
+def test_peminjaman_list_matches_jsonable_encoder():
+    content = peminjaman_list()
+    assert render_json(content, List[PeminjamanResponse]) == fastapi_body(content)
+
+def test_absen_grouped_matches_jsonable_encoder():
+    content = AbsenGroupedResponse.model_validate({
+        "total": 1, "tersedia": 1,
+        "semesters": [{
+            "semester": 3, "total": 1, "tersedia": 1, "available": True,
+            "jurusan": [{
+                "jurusan": "Matematika", "total": 1, "tersedia": 1, "available": True,
+                "sheets": [{"id": 1, "nama_matakuliah": "Aljabar", "kelas": "A", "dosen": "Dr X",
+                            "status": StatusBarangEnum.tersedia}]
+            }]
+        }]
+    })
+    assert render_json(content, AbsenGroupedResponse) == fastapi_body(content)
+
+def test_plain_dict_matches_jsonable_encoder():
+    # Bentuk response kelas dan katalog: dict biasa berisi datetime, enum, None, unicode
+    content = {
+        "data": [{"id": 1, "nama_kelas": "204", "fasilitas": None, "created_at": CREATED, "updated_at": UPDATED}],
+        "barang": {"items": [{"id": 1, "nama": "Kabel – 2m", "status": StatusBarangEnum.tersedia}], "total": 1},
+        "tanggal": date(2025, 3, 3),
+        "total": 1,
+    }
+    assert render_json(content) == fastapi_body(content)
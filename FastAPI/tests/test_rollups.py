@@ -0,0 +1,51 @@
+import threading
+from datetime import date, timedelta
+from app.crud import barang_availability as crud_availability
+from app.crud import peminjaman_stats as crud_stats
+from app.models import Barang, BarangDailyReservation, PeminjamanDailyStats, StatusPeminjamanEnum
+from conftest import make_peminjaman
+
+def test_concurrent_first_peminjaman_share_stats_row(client, db, mahasiswa_headers, catalog):
+    barang = db.query(Barang).order_by(Barang.id).first()
+    tanggal = date.today() + timedelta(days=5)
+    barrier = threading.Barrier(4)
+    codes = []
+
+    def pinjam():
+        barrier.wait()
+        codes.append(client.post("/peminjaman/", headers=mahasiswa_headers, json={
+            "tanggal_peminjaman": tanggal.isoformat(),
+            "details": [{"reference_type": "barang", "reference_id": barang.id, "jumlah": 1}]
+        }).status_code)
+
+    threads = [threading.Thread(target=pinjam) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert codes == [201] * 4
+    db.expire_all()
+    assert db.get(PeminjamanDailyStats, (tanggal, StatusPeminjamanEnum.pending)).jumlah == 4
+
+def test_ensure_rebuilds_only_empty_tables(db, users, catalog):
+    _, mahasiswa = users
+    make_peminjaman(db, 3, mahasiswa)
+    db.query(PeminjamanDailyStats).delete()
+    db.query(BarangDailyReservation).delete()
+    db.commit()
+
+    assert crud_stats.ensure_daily_stats(db)
+    assert crud_availability.ensure_reservations(db)
+    assert db.get(PeminjamanDailyStats, (date.today(), StatusPeminjamanEnum.pending)).jumlah == 3
+
+    # Tabel sudah terisi: tidak disentuh lagi saat startup berikutnya
+    db.get(PeminjamanDailyStats, (date.today(), StatusPeminjamanEnum.pending)).jumlah = 99
+    db.commit()
+    assert not crud_stats.ensure_daily_stats(db)
+    assert not crud_availability.ensure_reservations(db)
+    assert db.get(PeminjamanDailyStats, (date.today(), StatusPeminjamanEnum.pending)).jumlah == 99
+
+def test_ensure_skips_database_without_peminjaman(db, catalog):
+    assert not crud_stats.ensure_daily_stats(db)
+    assert not crud_availability.ensure_reservations(db)
@@ -0,0 +1,29 @@
+import json
+from fastapi.testclient import TestClient
+from app import auth
+from app.main import app
+
+def upload(client, headers, rows: list):
+    content = "\n".join(json.dumps(row) for row in rows).encode()
+    return client.post("/auth/import-roster", headers=headers, files={"file": ("roster.ndjson", content)})
+
+def test_integer_nim_is_reported_as_string(client, staff_headers):
+    response = upload(client, staff_headers, [
+        {"nim": 12345, "name": "Budi", "kode_akses": "rahasia1"},
+        {"nim": "H011211002", "name": "Sari", "kode_akses": "rahasia1"},
+    ])
+
+    assert response.status_code == 200
+    result = response.json()
+    assert (result["created"], result["failed"]) == (1, 1)
+    assert result["errors"][0]["nim"] == "12345"
+
+def test_import_pool_is_created_lazily_and_shut_down_with_app(staff_headers):
+    auth.shutdown_import_hashing_pool()
+    with TestClient(app) as client:
+        assert auth._import_hashing_pool is None
+        upload(client, staff_headers, [{"nim": "H011211002", "name": "Sari", "kode_akses": "rahasia1"}])
+        assert auth._import_hashing_pool is not None
+        # Worker di-spawn, bukan fork dari proses server yang sudah punya thread
+        assert auth._import_hashing_pool._mp_context.get_start_method() == "spawn"
+    assert auth._import_hashing_pool is None
@@ -0,0 +1,70 @@
+from datetime import datetime
+from typing import List
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from app.cache import render_json, render_rows
+from app.models import Absen, Barang, Peminjaman, PeminjamanDetail, StatusBarangEnum
+from app.routes.peminjaman import build_peminjaman_response, expand_staff_detail
+from app.schemas.absen import AbsenResponse, AbsenRow
+from app.schemas.barang import BarangResponse, BarangListResponse
+from app.schemas.peminjaman import PeminjamanStaffResponse
+
+def validated_body(content) -> bytes:
+    """Body lama: model publik tervalidasi, di-encode oleh FastAPI"""
+    return JSONResponse(jsonable_encoder(content)).body
+
+def test_barang_list_matches_validated_models(client, db, staff_headers, catalog):
+    barang = db.query(Barang).order_by(Barang.nama).all()
+    expected = BarangListResponse(
+        items=[BarangResponse.model_validate(item) for item in barang],
+        total=len(barang), page=1, per_page=20, total_pages=1
+    )
+    assert client.get("/barang/", headers=staff_headers).content == validated_body(expected)
+
+def test_absen_list_matches_validated_models(client, db, staff_headers, catalog):
+    expected = [AbsenResponse.model_validate(absen) for absen in db.query(Absen).all()]
+    assert client.get("/absen/", headers=staff_headers).content == validated_body(expected)
+
+def test_peminjaman_lists_match_validated_models(client, db, users, staff_headers, mahasiswa_headers, peminjaman):
+    newest_first = db.query(Peminjaman).order_by(Peminjaman.created_at.desc(), Peminjaman.id.desc()).all()
+    expected = validated_body([build_peminjaman_response(p) for p in newest_first])
+
+    assert client.get("/peminjaman/my", headers=mahasiswa_headers).content == expected
+    assert client.get("/peminjaman/", headers=staff_headers).content == expected
+
+def test_staff_today_matches_validated_models(client, db, staff_headers, peminjaman):
+    newest_first = db.query(Peminjaman).order_by(Peminjaman.created_at.desc()).all()
+    referenced_items = PeminjamanDetail.load_referenced_items(db, [d for p in newest_first for d in p.details])
+    expected = []
+    for p in newest_first:
+        data = PeminjamanStaffResponse.model_validate(build_peminjaman_response(p).model_dump(exclude={"details"}))
+        data.details = [expand_staff_detail(detail, referenced_items) for detail in p.details]
+        expected.append(data)
+
+    assert client.get("/peminjaman/staff/today", headers=staff_headers).content == validated_body(expected)
+
+def test_next_cursor_header_on_rendered_response(client, staff_headers, peminjaman):
+    response = client.get("/peminjaman/", params={"per_page": 2}, headers=staff_headers)
+    assert len(response.json()) == 2
+    assert response.headers["X-Next-Cursor"]
+
+def absen_rows(count: int) -> list:
+    now = datetime(2025, 3, 1, 8, 30, 15, 123456)
+    return [
+        {"id": i, "nama_matakuliah": "Aljabar", "kelas": "A", "semester": 3, "dosen": "Dr X",
+         "jurusan": "Matematika", "status": StatusBarangEnum.tersedia, "created_at": now, "updated_at": now}
+        for i in range(count)
+    ]
+
+def test_render_rows_matches_validated_output():
+    rows = absen_rows(50)
+    assert render_rows(rows, List[AbsenRow]) == render_json(rows, List[AbsenResponse])
+
+def test_render_rows_skips_validation():
+    # Nilai yang akan dikoersi/ditolak validasi lolos apa adanya: tidak ada validasi sama sekali
+    row = {**absen_rows(1)[0], "semester": "tiga"}
+    assert b'"semester":"tiga"' in render_rows([row], List[AbsenRow])
+
+def test_render_rows_accepts_null_columns():
+    row = {**absen_rows(1)[0], "nama_matakuliah": None, "kelas": None, "dosen": None, "created_at": None}
+    assert b'"nama_matakuliah":null' in render_rows([row], List[AbsenRow])